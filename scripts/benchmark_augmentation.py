@@ -0,0 +1,178 @@
+"""
+EcoSight Augmentation Benchmark
+Compares waveform augmentation (audio_augmentation.py) with SpecAugment on
+YAMNet log-mel patches (spec_augment.py): augmentation + embedding throughput,
+and the accuracy of a classifier trained on each mode's embeddings.
+
+Usage:
+    YAMNET_KERAS_DIR=/path/to/models/research/audioset/yamnet \\
+        python scripts/benchmark_augmentation.py --files-per-class 20
+
+Originals are split into train/test by file; the test set is never augmented,
+so every mode is scored on the same clean embeddings.
+"""
+
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import librosa
+import tensorflow_hub as hub
+from pathlib import Path
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from audio_augmentation import iter_augmented_audio, file_seed
+from embedding_pipeline import PipelinedEmbeddingExtractor
+from spec_augment import SpecAugmentEmbedder, keras_yamnet_available
+
+BASE_DIR = Path("/app") if Path("/app").exists() else Path(__file__).parent.parent
+SAMPLE_RATE = 16000
+YAMNET_MODEL_URL = 'https://tfhub.dev/google/yamnet/1'
+
+
+def load_clips(data_dir, files_per_class, seed):
+    """Decode up to files_per_class originals per class; returns (clips, labels, names, class_names)"""
+    rng = np.random.RandomState(seed)
+    clips, labels, names = [], [], []
+    class_names = sorted(d.name for d in Path(data_dir).iterdir() if d.is_dir())
+    for class_idx, class_name in enumerate(class_names):
+        class_dir = Path(data_dir) / class_name
+        files = sorted(list(class_dir.glob("*.wav")) + list(class_dir.glob("*.mp3")))
+        if files_per_class and len(files) > files_per_class:
+            files = [files[i] for i in sorted(rng.choice(len(files), files_per_class, replace=False))]
+        for audio_file in files:
+            audio, _ = librosa.load(str(audio_file), sr=SAMPLE_RATE, duration=4)
+            clips.append(audio)
+            labels.append(class_idx)
+            names.append((class_name, audio_file.name))
+    return clips, np.array(labels), names, class_names
+
+
+def embed_arrays(yamnet_model, clips):
+    """Mean YAMNet embeddings for decoded clips via the pipelined extractor"""
+    extractor = PipelinedEmbeddingExtractor(yamnet_model)
+    results = list(extractor.extract((i, clip) for i, clip in enumerate(clips)))
+    return np.stack([embedding for _, embedding, _ in results])
+
+
+def waveform_mode(yamnet_model, clips, labels, names, augmentations, seed):
+    """Waveform variants -> hub YAMNet; returns (X, y, seconds)"""
+    start = time.perf_counter()
+    variants, y = [], []
+    for clip, label, (class_name, file_name) in zip(clips, labels, names):
+        for _, audio in iter_augmented_audio(clip, SAMPLE_RATE, augmentations,
+                                             seed=file_seed(seed, class_name, file_name)):
+            variants.append(audio[:4 * SAMPLE_RATE].astype(np.float32))
+            y.append(label)
+    X = embed_arrays(yamnet_model, variants)
+    return X, np.array(y), time.perf_counter() - start
+
+
+def spec_augment_mode(embedder, clips, labels, names, augmentations, seed, chunk_size=32):
+    """SpecAugment variants of log-mel patches -> Keras YAMNet; returns (X, y, seconds)"""
+    start = time.perf_counter()
+    X, y = [], []
+    for offset in range(0, len(clips), chunk_size):
+        chunk = [
+            (clip, file_seed(seed, class_name, file_name))
+            for clip, (class_name, file_name) in zip(clips[offset:offset + chunk_size],
+                                                     names[offset:offset + chunk_size])
+        ]
+        for label, embeddings in zip(labels[offset:offset + chunk_size],
+                                     embedder.embed_clips(chunk, augmentations)):
+            X.extend(embeddings)
+            y.extend([label] * len(embeddings))
+    return np.stack(X), np.array(y), time.perf_counter() - start
+
+
+def score(X_train, y_train, X_test, y_test):
+    """Accuracy and macro F1 of a linear probe trained on the given embeddings"""
+    scaler = StandardScaler().fit(X_train)
+    clf = LogisticRegression(max_iter=2000).fit(scaler.transform(X_train), y_train)
+    y_pred = clf.predict(scaler.transform(X_test))
+    return accuracy_score(y_test, y_pred), f1_score(y_test, y_pred, average='macro')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark waveform vs SpecAugment augmentation")
+    parser.add_argument("--data-dir", default=str(BASE_DIR / "extracted_audio"))
+    parser.add_argument("--files-per-class", type=int, default=20, help="0 = all files")
+    parser.add_argument("--augmentations", type=int, default=5, help="Variants per original")
+    parser.add_argument("--test-size", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("AUGMENTATION BENCHMARK")
+    print("=" * 70)
+
+    clips, labels, names, class_names = load_clips(args.data_dir, args.files_per_class, args.seed)
+    print(f"📂 {len(clips)} originals across {len(class_names)} classes")
+
+    train_idx, test_idx = train_test_split(
+        np.arange(len(clips)), test_size=args.test_size, stratify=labels, random_state=args.seed
+    )
+    train = ([clips[i] for i in train_idx], labels[train_idx], [names[i] for i in train_idx])
+
+    print("🔄 Loading YAMNet...")
+    yamnet_model = hub.load(YAMNET_MODEL_URL)
+    X_test = embed_arrays(yamnet_model, [clips[i] for i in test_idx])
+    y_test = labels[test_idx]
+
+    results = {}
+
+    start = time.perf_counter()
+    X_orig = embed_arrays(yamnet_model, train[0])
+    results["none"] = {"seconds": time.perf_counter() - start, "samples": len(X_orig),
+                       "X": X_orig, "y": train[1]}
+
+    print(f"🎵 Waveform augmentation ({args.augmentations} variants/file)...")
+    X, y, seconds = waveform_mode(yamnet_model, *train, args.augmentations, args.seed)
+    results["waveform"] = {"seconds": seconds, "samples": len(X), "X": X, "y": y}
+
+    if keras_yamnet_available():
+        print(f"🎛️  SpecAugment ({args.augmentations} variants/file)...")
+        embedder = SpecAugmentEmbedder()
+        X, y, seconds = spec_augment_mode(embedder, *train, args.augmentations, args.seed)
+        results["specaugment"] = {"seconds": seconds, "samples": len(X), "X": X, "y": y}
+    else:
+        print("⚠️  Skipping SpecAugment: set YAMNET_KERAS_DIR to the Keras YAMNet sources and weights")
+
+    print("")
+    print(f"{'mode':<12} {'samples':>8} {'seconds':>9} {'samples/s':>10} {'s/original':>11} "
+          f"{'accuracy':>9} {'macro F1':>9}")
+    print("-" * 74)
+    report = {}
+    for mode, r in results.items():
+        accuracy, macro_f1 = score(r["X"], r["y"], X_test, y_test)
+        report[mode] = {
+            "samples": r["samples"],
+            "seconds": round(r["seconds"], 3),
+            "samples_per_s": round(r["samples"] / r["seconds"], 2),
+            "seconds_per_original": round(r["seconds"] / len(train_idx), 4),
+            "accuracy": round(accuracy, 4),
+            "macro_f1": round(macro_f1, 4)
+        }
+        m = report[mode]
+        print(f"{mode:<12} {m['samples']:>8} {m['seconds']:>9.2f} {m['samples_per_s']:>10.1f} "
+              f"{m['seconds_per_original']:>11.4f} {m['accuracy']:>9.4f} {m['macro_f1']:>9.4f}")
+    print("-" * 74)
+    if "specaugment" in report:
+        speedup = report["waveform"]["seconds"] / report["specaugment"]["seconds"]
+        print(f"✓ SpecAugment is {speedup:.1f}x the waveform augmentation throughput")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"originals": len(clips), "train": len(train_idx), "test": len(test_idx),
+                       "augmentations_per_file": args.augmentations, "results": report}, f, indent=2)
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+EcoSight Retraining Benchmark
+Compares end-to-end retraining time (decode + augment + YAMNet + training)
+and held-out accuracy for different mixes of waveform augmentation,
+embedding-space mixup and near-duplicate pruning.
+
+Usage:
+    python scripts/benchmark_retraining.py --configs 5 5:dedup 0:mixup 2:mixup
+
+Each config is "<waveform variants per file>[:mixup][:dedup]". Originals are
+split into train/val/test by file before augmenting, and validation/test use
+the clean originals only, so every config is scored on the same data. Mixup
+settings come from MIXUP_ALPHA / MIXUP_EXPANSION / EMBEDDING_NOISE_STD; dedup
+drops same-class training embeddings at or above DEDUP_THRESHOLD cosine
+similarity before training.
+"""
+
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import librosa
+import tensorflow_hub as hub
+from pathlib import Path
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+from tensorflow.keras.utils import to_categorical
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+from audio_augmentation import iter_augmented_audio, file_seed
+from embedding_pipeline import PipelinedEmbeddingExtractor
+from ann_index import near_duplicates
+from retrain_model import (
+    ModelRetrainingPipeline, BASE_DIR, SAMPLE_RATE, YAMNET_MODEL_URL, BATCH_SIZE,
+    MIXUP_ALPHA, MIXUP_EXPANSION, EMBEDDING_NOISE_STD, DEDUP_THRESHOLD, DEDUP_NPROBE
+)
+
+
+def parse_config(spec):
+    """'5' -> (5, False, False); '2:mixup' -> (2, True, False); '5:dedup' -> (5, False, True)"""
+    augmentations, *flags = spec.split(":")
+    unknown = set(flags) - {"mixup", "dedup"}
+    if unknown:
+        raise ValueError(f"Unknown config flag(s) in '{spec}': {', '.join(sorted(unknown))}")
+    return int(augmentations), "mixup" in flags, "dedup" in flags
+
+
+def load_originals(data_dir, files_per_class, seed):
+    """List (path, class_idx, class_name) for up to files_per_class originals per class"""
+    rng = np.random.RandomState(seed)
+    items = []
+    class_names = sorted(d.name for d in Path(data_dir).iterdir() if d.is_dir())
+    for class_idx, class_name in enumerate(class_names):
+        class_dir = Path(data_dir) / class_name
+        files = sorted(list(class_dir.glob("*.wav")) + list(class_dir.glob("*.mp3")))
+        if files_per_class and len(files) > files_per_class:
+            files = [files[i] for i in sorted(rng.choice(len(files), files_per_class, replace=False))]
+        items.extend((audio_file, class_idx, class_name) for audio_file in files)
+    return items, class_names
+
+
+def decode(items):
+    """Decode originals at 16 kHz (first 4 s, as in retraining)"""
+    return [librosa.load(str(path), sr=SAMPLE_RATE, duration=4)[0] for path, _, _ in items]
+
+
+def embed(yamnet_model, clips):
+    """Mean YAMNet embeddings for decoded clips"""
+    extractor = PipelinedEmbeddingExtractor(yamnet_model)
+    return np.stack([embedding for _, embedding, _ in
+                     extractor.extract((i, clip) for i, clip in enumerate(clips))])
+
+
+def run_config(yamnet_model, augmentations, embedding_mixup, dedup, train_items, train_clips,
+               X_val, y_val, X_test, y_test, num_classes, epochs, seed):
+    """Augment + embed the training originals and train the classifier; returns a result row"""
+    timings = {}
+
+    start = time.perf_counter()
+    variants, labels = [], []
+    for (path, class_idx, class_name), clip in zip(train_items, train_clips):
+        for _, audio in iter_augmented_audio(clip, SAMPLE_RATE, augmentations,
+                                             seed=file_seed(seed, class_name, path.name)):
+            variants.append(audio[:4 * SAMPLE_RATE].astype(np.float32))
+            labels.append(class_idx)
+    timings["augment"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    X_train = embed(yamnet_model, variants)
+    labels = np.array(labels)
+    timings["embed"] = time.perf_counter() - start
+
+    pruned = 0
+    if dedup:
+        start = time.perf_counter()
+        duplicate_mask, _ = near_duplicates(X_train, threshold=DEDUP_THRESHOLD, labels=labels,
+                                            nprobe=DEDUP_NPROBE, seed=seed)
+        X_train, labels = X_train[~duplicate_mask], labels[~duplicate_mask]
+        pruned = int(duplicate_mask.sum())
+        timings["dedup"] = time.perf_counter() - start
+
+    # Same scalar normalisation as retrain_model, fitted on the training embeddings
+    mean, std = X_train.mean(), X_train.std()
+    normalize = lambda X: (X - mean) / std
+    y_train = to_categorical(labels, num_classes=num_classes)
+
+    start = time.perf_counter()
+    model = ModelRetrainingPipeline.build_model(input_dim=X_train.shape[1], num_classes=num_classes)
+    callbacks = [
+        EarlyStopping(monitor='val_loss', patience=15, restore_best_weights=True, verbose=0),
+        ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=7, min_lr=1e-7, verbose=0)
+    ]
+    history = ModelRetrainingPipeline.fit_model(
+        model, normalize(X_train), y_train, normalize(X_val), to_categorical(y_val, num_classes),
+        epochs=epochs, batch_size=BATCH_SIZE, callbacks=callbacks,
+        embedding_mixup=embedding_mixup, verbose=0
+    )
+    timings["train"] = time.perf_counter() - start
+
+    y_pred = np.argmax(model.predict(normalize(X_test), verbose=0), axis=1)
+    return {
+        "augmentations_per_file": augmentations,
+        "embedding_mixup": embedding_mixup,
+        "dedup": dedup,
+        "train_samples": len(X_train),
+        "pruned_samples": pruned,
+        "epochs_trained": len(history.history['loss']),
+        "seconds": {k: round(v, 2) for k, v in timings.items()},
+        "accuracy": round(accuracy_score(y_test, y_pred), 4),
+        "macro_f1": round(f1_score(y_test, y_pred, average='macro'), 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark waveform augmentation vs embedding mixup")
+    parser.add_argument("--data-dir", default=str(BASE_DIR / "extracted_audio"))
+    parser.add_argument("--files-per-class", type=int, default=0, help="0 = all files")
+    parser.add_argument("--configs", nargs="+", default=["5", "0:mixup", "2:mixup"],
+                        help="<waveform variants per file>[:mixup][:dedup]")
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("RETRAINING BENCHMARK")
+    print("=" * 70)
+
+    items, class_names = load_originals(args.data_dir, args.files_per_class, args.seed)
+    labels = np.array([class_idx for _, class_idx, _ in items])
+    print(f"📂 {len(items)} originals across {len(class_names)} classes")
+    print(f"🔀 Mixup: alpha {MIXUP_ALPHA}, {MIXUP_EXPANSION:g}x synthetic, noise std {EMBEDDING_NOISE_STD}")
+    print(f"🔎 Dedup: cosine >= {DEDUP_THRESHOLD}, nprobe {DEDUP_NPROBE}")
+
+    # 70/15/15 split by original file
+    train_idx, holdout_idx = train_test_split(
+        np.arange(len(items)), test_size=0.3, stratify=labels, random_state=args.seed
+    )
+    val_idx, test_idx = train_test_split(
+        holdout_idx, test_size=0.5, stratify=labels[holdout_idx], random_state=args.seed
+    )
+
+    start = time.perf_counter()
+    clips = decode(items)
+    decode_seconds = time.perf_counter() - start
+
+    print("🔄 Loading YAMNet...")
+    yamnet_model = hub.load(YAMNET_MODEL_URL)
+    X_val = embed(yamnet_model, [clips[i] for i in val_idx])
+    X_test = embed(yamnet_model, [clips[i] for i in test_idx])
+
+    rows = []
+    for spec in args.configs:
+        augmentations, embedding_mixup, dedup = parse_config(spec)
+        print(f"▶️  {spec}: {augmentations} waveform variants/file, mixup {'on' if embedding_mixup else 'off'}, "
+              f"dedup {'on' if dedup else 'off'}")
+        row = run_config(
+            yamnet_model, augmentations, embedding_mixup, dedup,
+            [items[i] for i in train_idx], [clips[i] for i in train_idx],
+            X_val, labels[val_idx], X_test, labels[test_idx],
+            len(class_names), args.epochs, args.seed
+        )
+        # Every config decodes the same training originals
+        row["seconds"]["decode"] = round(decode_seconds * len(train_idx) / len(items), 2)
+        row["seconds"]["total"] = round(sum(row["seconds"].values()), 2)
+        row["config"] = spec
+        rows.append(row)
+
+    print("")
+    print(f"{'config':<14} {'samples':>8} {'pruned':>7} {'augment':>8} {'embed':>8} {'dedup':>7} "
+          f"{'train':>8} {'total':>8} {'epochs':>7} {'accuracy':>9} {'macro F1':>9}")
+    print("-" * 105)
+    for row in rows:
+        s = row["seconds"]
+        print(f"{row['config']:<14} {row['train_samples']:>8} {row['pruned_samples']:>7} "
+              f"{s['augment']:>8.1f} {s['embed']:>8.1f} {s.get('dedup', 0.0):>7.1f} "
+              f"{s['train']:>8.1f} {s['total']:>8.1f} {row['epochs_trained']:>7} "
+              f"{row['accuracy']:>9.4f} {row['macro_f1']:>9.4f}")
+    print("-" * 105)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                "originals": len(items), "train": len(train_idx), "val": len(val_idx), "test": len(test_idx),
+                "mixup": {"alpha": MIXUP_ALPHA, "expansion": MIXUP_EXPANSION, "noise_std": EMBEDDING_NOISE_STD},
+                "dedup": {"threshold": DEDUP_THRESHOLD, "nprobe": DEDUP_NPROBE},
+                "results": rows
+            }, f, indent=2)
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+EcoSight Storage Backend Benchmark
+Times the operations the API and retraining pipeline perform against each
+storage backend on a synthetic dataset: batch upload, a cold and a warm
+sync of extracted_audio/, a model sync, a sharded upload and per-sample
+reads from the shards.
+
+Usage:
+    python scripts/benchmark_storage.py --classes 5 --files-per-class 200
+
+    # Also benchmark S3 (use a scratch bucket or MinIO: the standard keys are overwritten)
+    S3_BUCKET=ecosight-scratch S3_ENDPOINT_URL=http://localhost:9000 \\
+        AWS_ACCESS_KEY_ID=minioadmin AWS_SECRET_ACCESS_KEY=minioadmin \\
+        python scripts/benchmark_storage.py --s3
+
+The local backend reports how many files it placed by hardlink, reflink
+and copy. Put --work-dir on the same filesystem as --local-root for
+hardlinks; reflinks need XFS or Btrfs.
+"""
+
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import numpy as np
+import soundfile as sf
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from local_storage import LocalStorage
+
+SAMPLE_RATE = 16000
+
+
+def make_dataset(data_dir, classes, files_per_class, seconds, seed):
+    """Write classes x files_per_class synthetic WAV clips; returns (path, key) pairs"""
+    rng = np.random.RandomState(seed)
+    files = []
+    for c in range(classes):
+        class_dir = Path(data_dir) / f"class_{c:02d}"
+        class_dir.mkdir(parents=True, exist_ok=True)
+        for i in range(files_per_class):
+            path = class_dir / f"clip_{i:05d}.wav"
+            sf.write(str(path), (0.1 * rng.randn(int(seconds * SAMPLE_RATE))).astype(np.float32), SAMPLE_RATE)
+            files.append((str(path), f"extracted_audio/{class_dir.name}/{path.name}"))
+    return files
+
+
+def make_models(models_dir, model_mb, seed):
+    """Write a fake set of model artifacts of roughly model_mb megabytes"""
+    rng = np.random.RandomState(seed)
+    models_dir = Path(models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+    (models_dir / "yamnet_classifier_v2.keras").write_bytes(rng.bytes(int(model_mb * 1e6)))
+    (models_dir / "class_names.json").write_text(json.dumps([f"class_{c:02d}" for c in range(5)]))
+    (models_dir / "model_metadata.json").write_text(json.dumps({"version": "benchmark"}))
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_backend(storage, files, data_dir, models_dir, work_dir, sample_reads, seed):
+    """Run every benchmarked operation against one backend; returns {operation: seconds}"""
+    results = {}
+    sync_dir = Path(work_dir) / f"sync-{storage.name.replace(' ', '_')}"
+    live_models = Path(work_dir) / f"models-{storage.name.replace(' ', '_')}"
+    shutil.rmtree(sync_dir, ignore_errors=True)
+    shutil.rmtree(live_models, ignore_errors=True)
+
+    _, results["upload_files"] = timed(storage.upload_files, files)
+    stats, results["sync_cold"] = timed(storage.sync_extracted_audio, str(sync_dir))
+    print(f"  cold sync: {stats['downloaded']} fetched, {stats['unchanged']} unchanged")
+    stats, results["sync_warm"] = timed(storage.sync_extracted_audio, str(sync_dir))
+    print(f"  warm sync: {stats['downloaded']} fetched, {stats['unchanged']} unchanged")
+
+    _, results["upload_model"] = timed(storage.upload_model, str(models_dir), version="benchmark")
+    _, results["sync_model"] = timed(storage.sync_model, str(live_models))
+
+    _, results["upload_sharded"] = timed(storage.upload_training_data, str(data_dir), sharded=True)
+    members = storage.list_shard_samples("augmented_audio")
+    rng = np.random.RandomState(seed)
+    names = [members[i]["name"] for i in rng.randint(0, len(members), size=sample_reads)]
+    start = time.perf_counter()
+    for name in names:
+        storage.fetch_sample("augmented_audio", name)
+    results["fetch_sample_avg"] = (time.perf_counter() - start) / max(1, len(names))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local vs S3 storage backends")
+    parser.add_argument("--classes", type=int, default=5)
+    parser.add_argument("--files-per-class", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=2.0, help="Clip length")
+    parser.add_argument("--model-mb", type=float, default=20.0, help="Size of the fake model file")
+    parser.add_argument("--sample-reads", type=int, default=200, help="Random fetch_sample calls")
+    parser.add_argument("--local-root", help="LocalStorage root (default: inside --work-dir)")
+    parser.add_argument("--work-dir", help="Scratch directory (default: a temporary directory)")
+    parser.add_argument("--s3", action="store_true", help="Also benchmark the S3 backend (writes to S3_BUCKET)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("STORAGE BACKEND BENCHMARK")
+    print("=" * 70)
+
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="ecosight-storage-bench-"))
+    data_dir, models_dir = work_dir / "data", work_dir / "models"
+    files = make_dataset(data_dir, args.classes, args.files_per_class, args.seconds, args.seed)
+    make_models(models_dir, args.model_mb, args.seed)
+    total_mb = sum(Path(path).stat().st_size for path, _ in files) / 1e6
+    print(f"📂 {len(files)} clips ({total_mb:.1f} MB) + {args.model_mb:.0f} MB model in {work_dir}")
+
+    report = {}
+    print("💾 Local backend...")
+    local = LocalStorage(args.local_root or str(work_dir / "store"))
+    report["local"] = run_backend(local, files, data_dir, models_dir, work_dir, args.sample_reads, args.seed)
+    print(f"  placed by: {local.place_counts}")
+
+    if args.s3:
+        from s3_storage import S3Storage
+        print("☁️  S3 backend...")
+        report["s3"] = run_backend(S3Storage(), files, data_dir, models_dir, work_dir,
+                                   args.sample_reads, args.seed)
+
+    print("")
+    backends = list(report)
+    print(f"{'operation':<18}" + "".join(f"{b + ' (s)':>14}" for b in backends)
+          + (f"{'speedup':>10}" if len(backends) == 2 else ""))
+    print("-" * (18 + 14 * len(backends) + (10 if len(backends) == 2 else 0)))
+    for operation in report["local"]:
+        row = f"{operation:<18}" + "".join(f"{report[b][operation]:>14.4f}" for b in backends)
+        if len(backends) == 2:
+            row += f"{report['s3'][operation] / max(report['local'][operation], 1e-9):>9.1f}x"
+        print(row)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"files": len(files), "dataset_mb": round(total_mb, 2), "model_mb": args.model_mb,
+                       "local_place_counts": local.place_counts,
+                       "results": {b: {op: round(s, 4) for op, s in r.items()} for b, r in report.items()}},
+                      f, indent=2)
+        print(f"💾 Results saved to {args.output}")
+
+    if not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+EcoSight Feature Extraction Worker
+Claims shards of distributed extraction jobs from the lease table on
+shared storage, embeds their clips with YAMNet and writes embedding
+shards for the retraining coordinator to merge. Start any number of
+these, on any host that mounts the shared directories.
+
+Usage:
+    # Coordinator (retraining) side
+    DISTRIBUTED_EXTRACTION=true EXTRACTION_WORK_DIR=/shared/ecosight/distributed \\
+        python scripts/retrain_model.py
+
+    # Each worker
+    python scripts/extraction_worker.py --work-dir /shared/ecosight/distributed \\
+        --data-root /mnt/ecosight/augmented_audio
+
+    # Jobs and shard progress
+    python scripts/extraction_worker.py --work-dir /shared/ecosight/distributed --status
+
+--data-root is where this host mounts the coordinator's augmented_audio
+directory (clip paths are stored relative to it). Workers load the YAMNet
+version recorded in the job. A worker that stops renewing its lease (crash,
+network partition) loses the shard to the next worker after --lease-seconds.
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from distributed_extraction import LeaseTable, run_worker, default_worker_id, LEASE_SECONDS, POLL_SECONDS
+
+BASE_DIR = Path("/app") if Path("/app").exists() else Path(__file__).parent.parent
+DEFAULT_WORK_DIR = os.getenv("EXTRACTION_WORK_DIR", str(BASE_DIR / "features" / "distributed"))
+
+
+def print_status(table):
+    """Print every open job with its shard counts"""
+    jobs = table.open_jobs()
+    if not jobs:
+        print("ℹ️  No open extraction jobs")
+        return
+    for job in jobs:
+        counts = table.progress(job["job_id"])
+        print(f"📦 {job['job_id']} ({job['created_at']}): {job['num_items']:,} clips, "
+              f"{job['num_shards']} shards - {counts['done']} done, {counts['leased']} leased, "
+              f"{counts['pending']} pending, {counts['failed']} failed, {counts['embedded']:,} clips embedded")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed shards of distributed feature extraction jobs")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="Shared extraction directory (lease table)")
+    parser.add_argument("--data-root", help="Local mount of the coordinator's augmented_audio directory")
+    parser.add_argument("--worker-id", default=default_worker_id(), help="Lease owner name (default: host-pid)")
+    parser.add_argument("--lease-seconds", type=float, default=float(os.getenv("EXTRACTION_LEASE_SECONDS", LEASE_SECONDS)))
+    parser.add_argument("--poll-seconds", type=float, default=POLL_SECONDS)
+    parser.add_argument("--idle-exit", type=float, help="Exit after this many seconds without work (default: never)")
+    parser.add_argument("--decode-workers", type=int, default=int(os.getenv("DECODE_WORKERS", "0")))
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("EMBEDDING_BATCH_SIZE", "0")))
+    parser.add_argument("--status", action="store_true", help="Print open jobs and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    table = LeaseTable(Path(args.work_dir))
+    if args.status:
+        print_status(table)
+        return
+
+    models = {}
+
+    def get_model(model_version):
+        # Loaded on the first shard of a job, then reused
+        if model_version not in models:
+            import tensorflow_hub as hub
+            print(f"📥 Loading {model_version}...")
+            models[model_version] = hub.load(model_version)
+            print("✓ Model loaded")
+        return models[model_version]
+
+    print("=" * 70)
+    print(f"⚙️  Extraction worker {args.worker_id}")
+    print(f"   Work dir:  {args.work_dir}")
+    print(f"   Data root: {args.data_root or '(as recorded by the coordinator)'}")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    try:
+        stats = run_worker(
+            table, get_model,
+            worker_id=args.worker_id,
+            data_root=Path(args.data_root) if args.data_root else None,
+            lease_seconds=args.lease_seconds,
+            poll_seconds=args.poll_seconds,
+            idle_exit_seconds=args.idle_exit,
+            decode_workers=args.decode_workers or None,
+            batch_size=args.batch_size or None
+        )
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopped (the shard in progress went back to the pool)")
+        return
+    finally:
+        table.close()
+
+    print(f"✓ Done in {time.perf_counter() - start:.0f}s: {stats['completed']} shards completed, "
+          f"{stats['lost']} lost to other workers, {stats['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
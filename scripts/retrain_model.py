@@ -9,6 +9,7 @@ Date: 2025-11-19
 import os
 import sys
 import json
+import time
 import pickle
 import numpy as np
 import librosa
@@ -17,32 +18,55 @@ import tensorflow_hub as hub
 from pathlib import Path
 from datetime import datetime
 from tqdm import tqdm
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import precision_recall_fscore_support, confusion_matrix
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Dropout, BatchNormalization
 from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
+from tensorflow.keras.callbacks import Callback, EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
 from tensorflow.keras.utils import to_categorical
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 warnings.filterwarnings('ignore')
 
-# Import S3 storage utility and audio augmentation
+# Import storage backend and audio augmentation
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 try:
-    from s3_storage import get_s3_storage
-    S3_AVAILABLE = True
+    from storage import get_storage, storage_configured, STORAGE_BACKEND
+    STORAGE_AVAILABLE = True
 except ImportError:
-    print("⚠️  S3 storage not available (boto3 not installed)")
-    S3_AVAILABLE = False
+    print("⚠️  Storage backend not available")
+    STORAGE_AVAILABLE = False
 
 try:
-    from audio_augmentation import augment_directory
+    from audio_augmentation import (
+        augment_directory, stream_augmented_audio, planned_variants, file_seed, AUGMENTATION_NAMES,
+        AUGMENTATION_VERSION
+    )
     AUGMENTATION_AVAILABLE = True
 except ImportError:
     print("⚠️  Audio augmentation not available")
     AUGMENTATION_AVAILABLE = False
 
+try:
+    from spec_augment import (
+        SpecAugmentEmbedder, spec_variant_names, keras_yamnet_available, SPEC_AUGMENT_VERSION
+    )
+    SPEC_AUGMENT_AVAILABLE = keras_yamnet_available()
+except ImportError:
+    SPEC_AUGMENT_AVAILABLE = False
+
+from audio_store import hash_file
+from sample_manifest import SampleManifest, default_manifest_path, ORIGINAL_SOURCES
+from model_manifest import build_manifest, write_manifest
+from feature_store import EmbeddingFeatureStore, EMBEDDING_DIM
+from embedding_loader import EmbeddingBatchLoader, streaming_statistics, split_indices
+from ann_index import near_duplicates
+from distributed_extraction import extract_distributed
+from pcm_cache import PCMCache
+from embedding_pipeline import PipelinedEmbeddingExtractor, available_cores
+from embedding_augmentation import mixup_batches, steps_per_epoch
+from linear_head import fit_linear_head, predict_proba, log_loss
+
 # Configure paths
 BASE_DIR = Path("/app") if Path("/app").exists() else Path(__file__).parent.parent
 EXTRACTED_AUDIO_DIR = BASE_DIR / "extracted_audio"
@@ -59,18 +83,141 @@ SAMPLE_RATE = 16000  # YAMNet uses 16kHz
 EPOCHS = 100
 BATCH_SIZE = 64
 MIN_NEW_SAMPLES = 100  # Trigger retraining after 100 new samples
+YAMNET_MODEL_URL = 'https://tfhub.dev/google/yamnet/1'
+FEATURE_STORE_DTYPE = os.getenv("FEATURE_STORE_DTYPE", "float32")  # or "float16"
+# Decoded 16 kHz PCM of every original, so retrains stop re-decoding MP3/WAV files
+PCM_CACHE = os.getenv("PCM_CACHE", "true").lower() == "true"
+PCM_CACHE_DTYPE = os.getenv("PCM_CACHE_DTYPE", "float32")  # or "int16"
+# Feature extraction pipeline (0 = auto-tune to available cores)
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", "0"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "0"))
+# Augmentation: worker processes (0 = one per core) and run seed for reproducible variants
+AUGMENTATION_WORKERS = int(os.getenv("AUGMENTATION_WORKERS", "0")) or (os.cpu_count() or 1)
+AUGMENTATION_SEED = int(os.getenv("AUGMENTATION_SEED", "42"))
+AUGMENTATIONS_PER_FILE = int(os.getenv("AUGMENTATIONS_PER_FILE", "5"))  # 0 = originals only
+# "files": augment to augmented_audio/*.wav, then embed those files
+# "stream": augment in memory and feed variants straight into YAMNet
+# "specaugment": mask/warp YAMNet's log-mel patches instead of the waveform (needs YAMNET_KERAS_DIR)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "files")
+SPEC_AUGMENTATIONS_PER_FILE = int(os.getenv("SPEC_AUGMENTATIONS_PER_FILE", "5"))
+# Embedding-space mixup: synthetic samples generated per batch from cached embeddings
+EMBEDDING_MIXUP = os.getenv("EMBEDDING_MIXUP", "false").lower() == "true"
+MIXUP_ALPHA = float(os.getenv("MIXUP_ALPHA", "0.2"))
+MIXUP_EXPANSION = float(os.getenv("MIXUP_EXPANSION", "1.0"))  # synthetic samples per real sample
+EMBEDDING_NOISE_STD = float(os.getenv("EMBEDDING_NOISE_STD", "0.05"))
+# "incremental": fine-tune the current model on new samples + replay when possible; "full": always retrain
+RETRAIN_MODE = os.getenv("RETRAIN_MODE", "incremental")
+INCREMENTAL_EPOCHS = int(os.getenv("INCREMENTAL_EPOCHS", "10"))
+INCREMENTAL_LEARNING_RATE = float(os.getenv("INCREMENTAL_LEARNING_RATE", "0.0001"))
+INCREMENTAL_MAX_NEW_FRACTION = float(os.getenv("INCREMENTAL_MAX_NEW_FRACTION", "0.5"))
+REPLAY_SAMPLES_PER_CLASS = int(os.getenv("REPLAY_SAMPLES_PER_CLASS", "200"))
+DRIFT_THRESHOLD = float(os.getenv("DRIFT_THRESHOLD", "0.1"))  # cosine distance between class centroids
+DRIFT_MIN_SAMPLES = 5
+SPLIT_SCHEME = "key-hash"  # recorded in training_state.json; incremental runs need a matching split
+# Classifier head: "mlp", "linear" (linear head only, for urgent re-deployments)
+# or "auto" (fit both, keep the linear head if its accuracy is within HEAD_TOLERANCE of the MLP)
+HEAD_MODE = os.getenv("HEAD_MODE", "mlp")
+LINEAR_HEAD = os.getenv("LINEAR_HEAD", "logistic")  # or "ridge" (closed form)
+HEAD_TOLERANCE = float(os.getenv("HEAD_TOLERANCE", "0.01"))
+STREAM_WRITE_WAVS = os.getenv("STREAM_WRITE_WAVS", "false").lower() == "true"
+# "memory": gather all embeddings into one array; "stream": train out-of-core on batches read
+# from the feature store's shards (memory independent of dataset size, full MLP retraining only)
+TRAINING_DATA_MODE = os.getenv("TRAINING_DATA_MODE", "memory")
+STREAM_SHUFFLE_BUFFER = int(os.getenv("STREAM_SHUFFLE_BUFFER", "8192"))
+STREAM_PREFETCH_BATCHES = int(os.getenv("STREAM_PREFETCH_BATCHES", "8"))
+# Near-duplicate embeddings (IVF index, same class, cosine >= threshold):
+# "off", "flag" (report only) or "prune" (drop them from the training/validation data)
+DEDUP_MODE = os.getenv("DEDUP_MODE", "off")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.98"))
+DEDUP_NPROBE = int(os.getenv("DEDUP_NPROBE", "8"))
+# Distributed feature extraction (files mode): uncached clips are split into shards leased to
+# extraction workers (scripts/extraction_worker.py) through a SQLite table on shared storage
+DISTRIBUTED_EXTRACTION = os.getenv("DISTRIBUTED_EXTRACTION", "false").lower() == "true"
+EXTRACTION_WORK_DIR = Path(os.getenv("EXTRACTION_WORK_DIR", str(FEATURES_DIR / "distributed")))
+EXTRACTION_SHARD_SIZE = int(os.getenv("EXTRACTION_SHARD_SIZE", "512"))
+EXTRACTION_LEASE_SECONDS = int(os.getenv("EXTRACTION_LEASE_SECONDS", "300"))
+# The coordinator embeds shards too unless this is false (then it only waits for workers)
+EXTRACTION_COORDINATOR_WORKS = os.getenv("EXTRACTION_COORDINATOR_WORKS", "true").lower() == "true"
+
+
+class RetrainingCancelled(Exception):
+    """Raised inside the pipeline when the caller requested cancellation"""
+
+
+class TrainingProgressCallback(Callback):
+    """Report Keras training progress to the pipeline (and honour cancellation between batches)"""
+    
+    def __init__(self, pipeline, epochs):
+        super().__init__()
+        self.pipeline = pipeline
+        self.epochs = epochs
+        self.epoch = 0
+    
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch = epoch
+    
+    def on_train_batch_end(self, batch, logs=None):
+        steps = self.params.get("steps") or 1
+        fraction = (self.epoch + (batch + 1) / steps) / self.epochs
+        self.pipeline.report_progress("training", fraction, f"epoch {self.epoch + 1}/{self.epochs}")
+    
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        message = f"epoch {epoch + 1}/{self.epochs}"
+        if "val_accuracy" in logs:
+            message += f", val_accuracy {logs['val_accuracy']:.4f}"
+        self.pipeline.report_progress("training", (epoch + 1) / self.epochs, message)
 
 
 class ModelRetrainingPipeline:
     """Automated model retraining pipeline"""
     
-    def __init__(self, models_dir, augmented_audio_dir):
+    def __init__(self, models_dir, augmented_audio_dir, feature_store=None, streaming=False,
+                 spec_augment=False, progress_callback=None, cancel_check=None, pcm_cache=None,
+                 out_of_core=False):
+        """
+        Args:
+            models_dir: Where models and training artifacts are written
+            augmented_audio_dir: Augmented training audio (files mode)
+            feature_store: Optional EmbeddingFeatureStore for cached embeddings
+            pcm_cache: Optional PCMCache of decoded originals (augmentation reads from it)
+            out_of_core: Train on batches streamed from the feature store (needs feature_store)
+            streaming: Augment in memory instead of writing augmented WAVs
+            spec_augment: Use SpecAugment on log-mel patches (needs the Keras YAMNet)
+            progress_callback: Called as progress_callback(stage, fraction, message)
+            cancel_check: Returns True when the run should stop (raises RetrainingCancelled)
+        """
+        self.progress_callback = progress_callback
+        self.cancel_check = cancel_check
         self.models_dir = Path(models_dir)
         self.augmented_audio_dir = Path(augmented_audio_dir)
         self.retraining_log_path = self.models_dir / "retraining_log.json"
+        self.training_state_path = self.models_dir / "training_state.json"
+        self.sample_keys = []  # feature keys of the last extracted dataset, in X order
+        self.store_watermark = None  # feature store end when the dataset was assembled
+        self.feature_store = feature_store
+        self.pcm_cache = pcm_cache
+        self.out_of_core = out_of_core and feature_store is not None
+        if out_of_core and not self.out_of_core:
+            print("⚠️  Out-of-core training needs the feature store; falling back to in-memory training")
+        self.original_digests = None  # path -> content hash of every original, once ingested
+        # Indexed record of every training sample (counts and trigger checks are queries)
+        self.manifest = SampleManifest(default_manifest_path(EXTRACTED_AUDIO_DIR))
+        self.s3_synced = False
+        # Streaming mode augments originals in memory during feature extraction
+        self.streaming = streaming and AUGMENTATION_AVAILABLE
+        # SpecAugment mode augments log-mel patches during feature extraction
+        self.spec_augment = spec_augment and SPEC_AUGMENT_AVAILABLE and AUGMENTATION_AVAILABLE
+        if spec_augment and not self.spec_augment:
+            print("⚠️  SpecAugment mode needs TensorFlow and the Keras YAMNet (YAMNET_KERAS_DIR); "
+                  "falling back to waveform augmentation")
+        self.streaming = self.streaming or self.spec_augment
         
-        # Download training data from S3 if available
+        # Download training data from storage if available
+        self.report_progress("preparing", 0.0, "syncing training data")
         self._download_training_data_from_s3()
+        self._sync_manifest()
+        self.report_progress("preparing", 1.0)
         
         # Load retraining history
         if self.retraining_log_path.exists():
@@ -79,56 +226,69 @@ class ModelRetrainingPipeline:
         else:
             self.retraining_log = {"retraining_history": []}
     
+    def report_progress(self, stage, fraction, message=""):
+        """Forward progress to the caller; raises RetrainingCancelled if cancellation was requested"""
+        if self.cancel_check is not None and self.cancel_check():
+            raise RetrainingCancelled(f"Retraining cancelled during {stage}")
+        if self.progress_callback is not None:
+            self.progress_callback(stage, min(1.0, fraction), message)
+    
     def _download_training_data_from_s3(self):
         """
-        Download extracted audio from S3 and apply augmentation
+        Download extracted audio from storage and apply augmentation
         
         Workflow:
-        1. Download extracted_audio/ from S3 (original/raw files)
+        1. Sync extracted_audio/ from the storage backend (original/raw files)
         2. Apply augmentation to create augmented_audio/
         3. Use augmented_audio/ for training
         """
-        if not S3_AVAILABLE:
-            print("ℹ️  S3 not configured, using local training data")
+        if not STORAGE_AVAILABLE:
+            print("ℹ️  Storage not configured, using local training data")
             return
         
-        # Check if S3 is configured
-        s3_bucket = os.getenv("S3_BUCKET")
-        aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-        
-        if not s3_bucket or not aws_access_key:
-            print("ℹ️  S3 credentials not set, using local training data")
+        # Check if the storage backend is configured (bucket credentials or local root)
+        if not storage_configured():
+            print(f"ℹ️  {STORAGE_BACKEND} storage not configured, using local training data")
             return
         
         print("=" * 70)
         print("DOWNLOADING AND AUGMENTING TRAINING DATA")
         print("=" * 70)
-        print(f"📦 Bucket: {s3_bucket}")
+        print(f"📦 Storage: {STORAGE_BACKEND}")
         print(f"📥 Downloading to: {EXTRACTED_AUDIO_DIR}")
         print(f"🎵 Augmenting to: {self.augmented_audio_dir}")
         print("")
         
         try:
-            # Step 1: Download extracted_audio from S3
-            print("Step 1: Downloading extracted audio from S3...")
-            s3_storage = get_s3_storage()
-            success = s3_storage.download_extracted_audio(str(EXTRACTED_AUDIO_DIR))
+            # Step 1: Sync extracted_audio from storage (only new or changed objects)
+            print(f"Step 1: Syncing extracted audio from {STORAGE_BACKEND} storage...")
+            storage = get_storage()
+            sync_stats = storage.sync_extracted_audio(str(EXTRACTED_AUDIO_DIR))
             
-            if not success:
-                print("⚠️  S3 download failed, using local data if available")
+            if sync_stats is None:
+                print(f"⚠️  {storage.name} download failed, using local data if available")
                 return
+            print(f"  {sync_stats['downloaded']} downloaded ({sync_stats['bytes'] / 1e6:.1f} MB), "
+                  f"{sync_stats['unchanged']} unchanged, {sync_stats['failed']} failed")
             
-            # Count downloaded files
-            extracted_files = sum(1 for _ in EXTRACTED_AUDIO_DIR.rglob("*.wav")) + \
-                             sum(1 for _ in EXTRACTED_AUDIO_DIR.rglob("*.mp3"))
-            print(f"✓ Downloaded {extracted_files} extracted audio files")
+            # Record downloaded files in the manifest
+            synced = self.manifest.sync_directory(EXTRACTED_AUDIO_DIR, "s3")
+            self.s3_synced = True
+            extracted_files = sum(self.manifest.class_counts(ORIGINAL_SOURCES).values())
+            print(f"✓ Downloaded {extracted_files} extracted audio files ({synced['added']} new)")
             print("")
             
+            self._ingest_pcm()
+            
             # Step 2: Apply augmentation
             if not AUGMENTATION_AVAILABLE:
                 print("⚠️  Augmentation not available, using extracted files directly")
                 return
             
+            if self.streaming:
+                print("Step 2: Augmentation deferred to feature extraction (streaming mode)")
+                return
+            
             print("Step 2: Applying audio augmentation...")
             print("  This creates multiple variants of each audio file")
             print("  Augmentations: pitch shift, time stretch, noise, volume, etc.")
@@ -142,7 +302,11 @@ class ModelRetrainingPipeline:
                 input_dir=EXTRACTED_AUDIO_DIR,
                 output_dir=self.augmented_audio_dir,
                 sr=SAMPLE_RATE,
-                augmentations_per_file=5  # Create 5 augmented versions per file
+                augmentations_per_file=AUGMENTATIONS_PER_FILE,
+                workers=AUGMENTATION_WORKERS,
+                seed=AUGMENTATION_SEED,
+                pcm_cache=self.pcm_cache,
+                digests=self.original_digests
             )
             
             # Show augmentation results
@@ -157,30 +321,88 @@ class ModelRetrainingPipeline:
             
             total_augmented = sum(s['augmented_files'] for s in results.values())
             print(f"✓ Total augmented files: {total_augmented}")
+            self.manifest.sync_directory(self.augmented_audio_dir, "augmentation")
             
         except Exception as e:
-            print(f"⚠️  Error in S3 download/augmentation: {e}")
+            print(f"⚠️  Error in storage download/augmentation: {e}")
             print("   Using local training data if available")
         
         print("")
     
+    def _sync_manifest(self):
+        """
+        Reconcile the manifest with the audio directories once per run
+        
+        Unchanged files are only stat'ed; after this, counts and trigger
+        checks never touch the directories. Files that appeared outside
+        /upload and the S3 sync (e.g. copied in by hand) are recorded as "local".
+        """
+        if not self.s3_synced:
+            self.manifest.sync_directory(EXTRACTED_AUDIO_DIR, "local")
+        if not self.streaming and self.augmented_audio_dir.exists():
+            self.manifest.sync_directory(self.augmented_audio_dir, "augmentation")
+    
+    def _digest(self, audio_file):
+        """Content hash of a training file, from the manifest when the file is unchanged"""
+        return self.manifest.digest_for(audio_file) or hash_file(audio_file)
+    
+    def _ingest_pcm(self):
+        """
+        Decode originals that are not in the PCM cache yet
+        
+        Each content hash is decoded once, ever; later runs (and augmentation
+        and feature extraction in this run) read the cached PCM instead.
+        Digests come from the manifest, so unchanged files are not re-hashed.
+        """
+        if self.pcm_cache is None or self.original_digests is not None:
+            return
+        self.original_digests = {
+            EXTRACTED_AUDIO_DIR / row["class_name"] / Path(row["path"]).name: row["sha256"]
+            for row in self.manifest.samples(sources=ORIGINAL_SOURCES)
+        }
+        print(f"🎧 PCM cache: checking {len(self.original_digests):,} originals...")
+        stats = self.pcm_cache.ingest(
+            ((digest, path) for path, digest in self.original_digests.items()),
+            workers=DECODE_WORKERS or available_cores()
+        )
+        print(f"  {stats['decoded']:,} decoded, {stats['cached']:,} already cached, {stats['failed']:,} failed")
+    
+    def variants_per_original(self):
+        """Training samples produced from each original (itself plus its augmented variants)"""
+        if self.spec_augment:
+            return 1 + SPEC_AUGMENTATIONS_PER_FILE
+        if AUGMENTATION_AVAILABLE:
+            return 1 + min(AUGMENTATIONS_PER_FILE, len(AUGMENTATION_NAMES))
+        return 1
+    
+    def count_samples(self):
+        """
+        Per-class training sample counts (originals plus augmented variants)
+        
+        In streaming/SpecAugment mode no augmented WAVs exist, so each original
+        counts as itself plus the number of variants augmentation will create.
+        """
+        if self.streaming:
+            variants_per_file = self.variants_per_original()
+            return {class_name: originals * variants_per_file
+                    for class_name, originals in self.manifest.class_counts(ORIGINAL_SOURCES).items()}
+        return self.manifest.class_counts(("augmentation",))
+    
     def check_retraining_trigger(self, min_new_samples=100):
         """Check if retraining should be triggered based on new data"""
-        # Count current samples
-        current_samples = {}
-        for class_dir in self.augmented_audio_dir.iterdir():
-            if class_dir.is_dir():
-                audio_files = list(class_dir.glob("*.wav"))
-                current_samples[class_dir.name] = len(audio_files)
-        
         # Get last training sample count
         if len(self.retraining_log["retraining_history"]) > 0:
-            last_training = self.retraining_log["retraining_history"][-1]
-            last_samples = last_training.get("sample_counts", {})
-            
-            # Calculate new samples
-            total_new = sum(current_samples.get(cls, 0) - last_samples.get(cls, 0) 
-                          for cls in current_samples.keys())
+            trained_watermark = self.manifest.trained_watermark()
+            if trained_watermark is not None:
+                # Originals recorded after the last training run, and the samples they will add
+                new_originals = self.manifest.class_counts(ORIGINAL_SOURCES, since=trained_watermark)
+                total_new = sum(new_originals.values()) * self.variants_per_original()
+            else:
+                # Trained before the manifest existed: compare with the logged counts
+                current_samples = self.count_samples()
+                last_samples = self.retraining_log["retraining_history"][-1].get("sample_counts", {})
+                total_new = sum(current_samples.get(cls, 0) - last_samples.get(cls, 0)
+                                for cls in current_samples.keys())
             
             print(f"📊 New samples since last training: {total_new}")
             
@@ -192,18 +414,32 @@ class ModelRetrainingPipeline:
                 return False, total_new
         else:
             print(f"📝 No previous training found. Initial training recommended.")
-            return True, sum(current_samples.values())
+            return True, sum(self.count_samples().values())
     
     def extract_features_batch(self, yamnet_model):
-        """Extract YAMNet features from all audio files"""
-        X_features = []
-        y_labels = []
-        class_names = []
+        """
+        Extract YAMNet features from all audio files
         
+        Decoding runs in a thread pool ahead of batched YAMNet inference.
+        With a feature store, files are looked up by content hash and YAMNet
+        only runs on files whose embeddings are not cached yet.
+        """
         print("="*70)
         print("EXTRACTING FEATURES FOR RETRAINING")
         print("="*70)
         
+        if self.spec_augment:
+            self._ingest_pcm()
+            return self._extract_features_specaugment()
+        if self.streaming:
+            self._ingest_pcm()
+            return self._extract_features_streaming(yamnet_model)
+        
+        class_names = []
+        samples = []  # (key, class_idx) for every training file
+        pending = []  # (key, path) still needing YAMNet
+        queued = set()
+        
         class_dirs = sorted([d for d in self.augmented_audio_dir.iterdir() if d.is_dir()])
         
         for class_idx, class_dir in enumerate(class_dirs):
@@ -213,32 +449,275 @@ class ModelRetrainingPipeline:
             audio_files = list(class_dir.glob("*.wav"))
             print(f"[{class_idx + 1}/{len(class_dirs)}] {class_name}: {len(audio_files)} files")
             
-            for audio_file in tqdm(audio_files, desc=f"  Processing"):
-                try:
-                    # Load audio at 16kHz
-                    audio, sr = librosa.load(audio_file, sr=SAMPLE_RATE, duration=4)
-                    audio = audio.astype(np.float32)
-                    
-                    # Extract YAMNet embeddings
-                    scores, embeddings, spectrogram = yamnet_model(audio)
-                    embedding_mean = np.mean(embeddings.numpy(), axis=0)
-                    
-                    X_features.append(embedding_mean)
-                    y_labels.append(class_idx)
-                except Exception as e:
-                    print(f"    ⚠️  Error: {audio_file.name}: {e}")
-        
-        X_features = np.array(X_features)
+            for audio_file in audio_files:
+                key = self._digest(audio_file) if self.feature_store is not None else str(audio_file)
+                samples.append((key, class_idx))
+                cached = self.feature_store is not None and key in self.feature_store
+                if not cached and key not in queued:
+                    pending.append((key, audio_file))
+                    queued.add(key)
+        
+        if DISTRIBUTED_EXTRACTION and self.feature_store is not None and pending:
+            pending = self._extract_distributed(yamnet_model, pending)
+        
+        return self._embed_samples(yamnet_model, samples, pending, len(pending), class_names)
+    
+    def _extract_distributed(self, yamnet_model, pending):
+        """
+        Embed (key, path) items across extraction workers and merge them into the feature store
+        
+        Returns:
+            Items still missing from the store (failed shards), embedded locally afterwards
+        """
+        print(f"\n🌐 Distributed extraction: {len(pending):,} clips in shards of {EXTRACTION_SHARD_SIZE} "
+              f"({EXTRACTION_WORK_DIR})")
+        if not EXTRACTION_COORDINATOR_WORKS:
+            print("  Waiting for extraction workers (scripts/extraction_worker.py)...")
+        
+        def progress(counts):
+            total = sum(counts[status] for status in ("pending", "leased", "done", "failed"))
+            finished = counts["done"] + counts["failed"]
+            self.report_progress("extracting_features", finished / max(1, total),
+                                 f"{finished}/{total} shards, {counts['embedded']:,} clips embedded")
+        
+        report = extract_distributed(
+            EXTRACTION_WORK_DIR, pending, self.augmented_audio_dir, YAMNET_MODEL_URL,
+            yamnet_model, self.feature_store,
+            shard_size=EXTRACTION_SHARD_SIZE,
+            lease_seconds=EXTRACTION_LEASE_SECONDS,
+            participate=EXTRACTION_COORDINATOR_WORKS,
+            progress=progress,
+            decode_workers=DECODE_WORKERS or None,
+            batch_size=EMBEDDING_BATCH_SIZE or None
+        )
+        remaining = report["remaining"]
+        print(f"✓ Job {report['job_id']}: {report['shards']['done']} shards done, "
+              f"{report['shards']['failed']} failed, {report['merged']:,} embeddings merged "
+              f"in {report['seconds']:.1f}s")
+        if remaining:
+            print(f"  {len(remaining):,} clips not embedded by workers; embedding them here")
+        return remaining
+    
+    def _extract_features_streaming(self, yamnet_model):
+        """
+        Augment originals in memory and embed the variants without writing WAVs
+        
+        Each variant is keyed by (original content hash, variant, seed). Files
+        whose planned variants are all cached are skipped before decoding.
+        """
+        class_names = []
+        samples = []  # (key, class_idx) for every original and planned variant
+        to_augment = []  # (class_name, path) with at least one uncached variant
+        file_keys = {}  # path -> (digest, seed)
+        
+        class_dirs = sorted([d for d in EXTRACTED_AUDIO_DIR.iterdir() if d.is_dir()])
+        
+        for class_idx, class_dir in enumerate(class_dirs):
+            class_name = class_dir.name
+            class_names.append(class_name)
+            
+            audio_files = sorted(list(class_dir.glob("*.wav")) + list(class_dir.glob("*.mp3")))
+            print(f"[{class_idx + 1}/{len(class_dirs)}] {class_name}: {len(audio_files)} originals")
+            
+            for audio_file in audio_files:
+                seed = file_seed(AUGMENTATION_SEED, class_name, audio_file.name)
+                digest = self._digest(audio_file) if self.feature_store is not None else str(audio_file)
+                file_keys[audio_file] = (digest, seed)
+                
+                keys = [f"{digest}:{variant}:{seed}:v{AUGMENTATION_VERSION}" for variant in planned_variants(AUGMENTATIONS_PER_FILE, seed)]
+                samples.extend((key, class_idx) for key in keys)
+                if self.feature_store is None or not all(key in self.feature_store for key in keys):
+                    to_augment.append((class_name, audio_file))
+        
+        print(f"  Augmenting {len(to_augment):,} originals in memory "
+              f"({AUGMENTATION_WORKERS} worker(s){', writing WAVs' if STREAM_WRITE_WAVS else ''})")
+        
+        def pending():
+            for class_name, audio_file, variant, audio in stream_augmented_audio(
+                to_augment,
+                sr=SAMPLE_RATE,
+                augmentations_per_file=AUGMENTATIONS_PER_FILE,
+                workers=AUGMENTATION_WORKERS,
+                seed=AUGMENTATION_SEED,
+                max_duration=4,
+                output_dir=self.augmented_audio_dir if STREAM_WRITE_WAVS else None,
+                pcm_cache=self.pcm_cache,
+                digests=self.original_digests
+            ):
+                digest, seed = file_keys[audio_file]
+                key = f"{digest}:{variant}:{seed}:v{AUGMENTATION_VERSION}"
+                if self.feature_store is None or key not in self.feature_store:
+                    yield key, audio
+        
+        expected = len(to_augment) * (1 + min(AUGMENTATIONS_PER_FILE, len(AUGMENTATION_NAMES)))
+        return self._embed_samples(yamnet_model, samples, pending(), expected, class_names)
+    
+    def _extract_features_specaugment(self):
+        """
+        Embed originals plus SpecAugment variants of their log-mel patches
+        
+        Each clip is decoded and converted to log-mel patches once; the variants
+        are masked/warped copies of those patches run through the Keras YAMNet
+        in one call per chunk of clips. Keys are (original hash, variant, seed).
+        """
+        embedder = SpecAugmentEmbedder()
+        variants = spec_variant_names(SPEC_AUGMENTATIONS_PER_FILE)
+        
+        class_names = []
+        samples = []  # (key, class_idx) for every original and variant
+        to_embed = []  # (keys, path, seed) with at least one uncached variant
+        
+        class_dirs = sorted([d for d in EXTRACTED_AUDIO_DIR.iterdir() if d.is_dir()])
+        
+        for class_idx, class_dir in enumerate(class_dirs):
+            class_name = class_dir.name
+            class_names.append(class_name)
+            
+            audio_files = sorted(list(class_dir.glob("*.wav")) + list(class_dir.glob("*.mp3")))
+            print(f"[{class_idx + 1}/{len(class_dirs)}] {class_name}: {len(audio_files)} originals")
+            
+            for audio_file in audio_files:
+                seed = file_seed(AUGMENTATION_SEED, class_name, audio_file.name)
+                digest = self._digest(audio_file) if self.feature_store is not None else str(audio_file)
+                keys = [f"{digest}:{variant}:{seed}:sa{SPEC_AUGMENT_VERSION}" for variant in variants]
+                samples.extend((key, class_idx) for key in keys)
+                if self.feature_store is None or not all(key in self.feature_store for key in keys):
+                    to_embed.append((keys, audio_file, seed))
+        
+        def decode(audio_file):
+            try:
+                if self.pcm_cache is not None:
+                    digest = self.original_digests.get(audio_file) if self.original_digests else None
+                    return self.pcm_cache.load(audio_file, digest, SAMPLE_RATE, duration=4)
+                audio, _ = librosa.load(str(audio_file), sr=SAMPLE_RATE, duration=4)
+                return audio
+            except Exception as e:
+                print(f"    ⚠️  Error: {audio_file}: {e}")
+                return None
+        
+        computed = {}
+        num_computed = 0
+        chunk_size = EMBEDDING_BATCH_SIZE or 32
+        decode_workers = DECODE_WORKERS or max(1, available_cores() - 1)
+        print(f"  SpecAugment: {len(to_embed):,} originals x {len(variants)} variants "
+              f"({decode_workers} decoders, {chunk_size} clips per YAMNet call)")
+        
+        with ThreadPoolExecutor(max_workers=decode_workers) as pool:
+            for start in tqdm(range(0, len(to_embed), chunk_size), desc="  Processing"):
+                self.report_progress("extracting_features", start / len(to_embed),
+                                     f"{start:,}/{len(to_embed):,} originals")
+                chunk = to_embed[start:start + chunk_size]
+                decoded = list(pool.map(decode, [audio_file for _, audio_file, _ in chunk]))
+                ok = [(item, audio) for item, audio in zip(chunk, decoded) if audio is not None]
+                if not ok:
+                    continue
+                results = embedder.embed_clips(
+                    [(audio, seed) for (_, _, seed), audio in ok], SPEC_AUGMENTATIONS_PER_FILE
+                )
+                for ((keys, _, _), _), embeddings in zip(ok, results):
+                    for key, embedding in zip(keys, embeddings):
+                        num_computed += 1
+                        if self.feature_store is not None:
+                            self.feature_store.put(key, embedding)
+                        else:
+                            computed[key] = embedding
+        
+        return self._assemble_dataset(samples, computed, num_computed, class_names)
+    
+    def _embed_samples(self, yamnet_model, samples, pending, num_pending, class_names):
+        """
+        Run the pipelined extractor over uncached items and assemble the dataset
+        
+        Args:
+            yamnet_model: Loaded YAMNet model
+            samples: (key, class_idx) for every training sample
+            pending: Iterable of (key, path or array) still needing YAMNet
+            num_pending: Expected number of pending items (for progress)
+            class_names: Class names in label order
+        """
+        computed = {}
+        num_computed = 0
+        if num_pending:
+            extractor = PipelinedEmbeddingExtractor(
+                yamnet_model,
+                decode_workers=DECODE_WORKERS or None,
+                batch_size=EMBEDDING_BATCH_SIZE or None
+            )
+            print(f"  Embedding ~{num_pending:,} clips "
+                  f"({extractor.decode_workers} decoders, batch {extractor.batch_size})")
+            
+            for done, (key, embedding, error) in enumerate(
+                tqdm(extractor.extract(pending), total=num_pending, desc="  Processing"), start=1
+            ):
+                self.report_progress("extracting_features", done / num_pending, f"{done:,}/{num_pending:,} clips")
+                if embedding is None:
+                    print(f"    ⚠️  Error: {key}: {error}")
+                    continue
+                num_computed += 1
+                if self.feature_store is not None:
+                    self.feature_store.put(key, embedding)
+                else:
+                    computed[key] = embedding
+            
+            report = extractor.throughput_report()
+            print(f"  Throughput: decode {report['decode_clips_per_s']:.1f} clips/s, "
+                  f"inference {report['inference_clips_per_s']:.1f} clips/s, "
+                  f"end-to-end {report['end_to_end_clips_per_s']:.1f} clips/s "
+                  f"(inference stalled {report['inference_stall_seconds']:.1f}s on decode)")
+        
+        return self._assemble_dataset(samples, computed, num_computed, class_names)
+    
+    def _assemble_dataset(self, samples, computed, num_computed, class_names):
+        """
+        Gather embeddings for every training sample into X/y arrays
+        
+        Args:
+            samples: (key, class_idx) for every training sample
+            computed: Embeddings computed this run (used when there is no feature store)
+            num_computed: Number of embeddings computed this run
+            class_names: Class names in label order
+        """
+        if self.feature_store is not None:
+            self.feature_store.flush()
+            # Every embedding of this dataset is stored before this point
+            self.store_watermark = self.feature_store.watermark()
+        
+        if self.out_of_core:
+            # Keys and labels only: training reads the embeddings from the store's shards
+            kept = [(key, class_idx) for key, class_idx in samples if key in self.feature_store]
+            self.sample_keys = [key for key, _ in kept]
+            y_labels = np.array([class_idx for _, class_idx in kept], dtype=np.int64)
+            print(f"\n✓ Feature extraction complete!")
+            print(f"  Total samples: {len(kept):,} (streamed from the feature store during training)")
+            print(f"  Cached: {len(kept) - num_computed:,}  Computed: {num_computed:,}")
+            print("="*70)
+            return None, y_labels, class_names
+        
+        X_features = []
+        y_labels = []
+        self.sample_keys = []
+        for key, class_idx in samples:
+            embedding = self.feature_store.get(key) if self.feature_store is not None else computed.get(key)
+            if embedding is None:
+                continue  # failed to decode or augment
+            X_features.append(embedding)
+            y_labels.append(class_idx)
+            self.sample_keys.append(key)
+        
+        X_features = np.array(X_features, dtype=np.float32)
         y_labels = np.array(y_labels)
         
         print(f"\n✓ Feature extraction complete!")
         print(f"  Total samples: {len(X_features):,}")
+        if self.feature_store is not None:
+            print(f"  Cached: {len(X_features) - num_computed:,}  Computed: {num_computed:,}")
         print(f"  Feature shape: {X_features.shape}")
         print("="*70)
         
         return X_features, y_labels, class_names
     
-    def build_model(self, input_dim=1024, num_classes=4):
+    @staticmethod
+    def build_model(input_dim=1024, num_classes=4):
         """Build YAMNet classifier architecture"""
         model = Sequential([
             Dense(512, activation='relu', input_shape=(input_dim,)),
@@ -268,81 +747,632 @@ class ModelRetrainingPipeline:
         
         return model
     
-    def retrain_model(self, yamnet_model, epochs=100, batch_size=64):
-        """Complete retraining pipeline"""
-        print("\n" + "="*70)
-        print("🔄 STARTING MODEL RETRAINING PIPELINE")
-        print("="*70)
+    @staticmethod
+    def build_linear_model(W, b):
+        """Package a linear head as a single Dense softmax layer (served like the MLP)"""
+        model = Sequential([
+            Dense(W.shape[1], activation='softmax', input_shape=(W.shape[0],))
+        ])
+        model.set_weights([W, b])
+        model.compile(
+            optimizer=Adam(learning_rate=0.001),
+            loss='categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        return model
+    
+    @staticmethod
+    def fit_model(model, X_train, y_train, X_val, y_val, epochs, batch_size, callbacks,
+                  embedding_mixup=False, verbose=1):
+        """
+        Train the classifier, optionally on mixup-expanded batches
         
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        With embedding_mixup, every batch of real samples is extended with
+        fresh mixup + noise samples synthesised from the training embeddings.
+        """
+        if not embedding_mixup:
+            return model.fit(
+                X_train, y_train,
+                validation_data=(X_val, y_val),
+                epochs=epochs,
+                batch_size=batch_size,
+                callbacks=callbacks,
+                verbose=verbose
+            )
         
-        # Step 1: Extract features
-        X_features, y_labels, class_names = self.extract_features_batch(yamnet_model)
+        batches = mixup_batches(
+            X_train, y_train,
+            batch_size=batch_size,
+            alpha=MIXUP_ALPHA,
+            expansion=MIXUP_EXPANSION,
+            noise_std=EMBEDDING_NOISE_STD,
+            seed=AUGMENTATION_SEED
+        )
+        return model.fit(
+            batches,
+            steps_per_epoch=steps_per_epoch(len(X_train), batch_size),
+            validation_data=(X_val, y_val),
+            epochs=epochs,
+            callbacks=callbacks,
+            verbose=verbose
+        )
+    
+    def load_training_state(self):
+        """Normalization stats, class centroids and feature store watermark of the last training run (None if absent)"""
+        if not self.training_state_path.exists():
+            return None
+        with open(self.training_state_path, 'r') as f:
+            return json.load(f)
+    
+    @staticmethod
+    def class_centroids(X_features, y_labels, class_names):
+        """Mean raw embedding of every class present in the data"""
+        return {
+            class_name: X_features[y_labels == idx].mean(axis=0).tolist()
+            for idx, class_name in enumerate(class_names)
+            if np.any(y_labels == idx)
+        }
+    
+    def save_training_state(self, class_names, mean, std, class_centroids, training_mode):
+        """Record what the current model was trained on, for the next incremental run"""
+        state = {
+            "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "training_mode": training_mode,
+            "class_names": class_names,
+            "normalization": {"mean": float(mean), "std": float(std)},
+            "class_centroids": class_centroids,
+            "split": SPLIT_SCHEME,
+            "num_samples": len(self.sample_keys),
+            # Samples embedded after this watermark are new to the model; a fixed-size
+            # reference instead of every key keeps the state small for any dataset size
+            "feature_store_watermark": self.store_watermark
+        }
+        tmp_path = self.training_state_path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.training_state_path)
+    
+    def measure_drift(self, state, X_features, y_labels, new_mask, class_names):
+        """
+        Largest cosine distance between a class's stored centroid and the
+        centroid of its new samples (classes with too few new samples are skipped)
+        
+        Centroids are taken on the raw embeddings: after the scalar
+        normalization they sit close to the origin and their angle is noise.
+        """
+        worst = 0.0
+        for idx, class_name in enumerate(class_names):
+            class_new = new_mask & (y_labels == idx)
+            old_centroid = state["class_centroids"].get(class_name)
+            if old_centroid is None or class_new.sum() < DRIFT_MIN_SAMPLES:
+                continue
+            old_centroid = np.array(old_centroid)
+            new_centroid = X_features[class_new].mean(axis=0)
+            cosine = np.dot(old_centroid, new_centroid) / (
+                np.linalg.norm(old_centroid) * np.linalg.norm(new_centroid) + 1e-12
+            )
+            worst = max(worst, 1.0 - float(cosine))
+        return worst
+    
+    def plan_training(self, state, X_features, y_labels, class_names):
+        """
+        Decide between warm-start fine-tuning and full retraining
         
+        Returns:
+            (training_mode, reason, new_mask) - new_mask marks samples the
+            current model has not been trained on
+        """
+        model_path = self.models_dir / "yamnet_classifier_v2.keras"
+        if state is None or not model_path.exists():
+            return "full", "no previous model or training state", None
+        if state["class_names"] != class_names:
+            return "full", "class set changed", None
+        if state.get("split") != SPLIT_SCHEME:
+            # Its test samples may have been training samples of the current model
+            return "full", "training state predates the key-hashed split", None
+        
+        watermark = state.get("feature_store_watermark")
+        if self.feature_store is None or watermark is None \
+                or watermark.get("store") != self.feature_store.store_dir.name:
+            return "full", "no feature store watermark for the current model", None
+        new_mask = np.fromiter(
+            (self.feature_store.added_since(key, watermark) for key in self.sample_keys),
+            dtype=bool, count=len(self.sample_keys)
+        )
+        num_new = int(new_mask.sum())
+        if num_new == 0:
+            return "full", "no new samples since last training", None
+        if num_new > INCREMENTAL_MAX_NEW_FRACTION * len(new_mask):
+            return "full", f"{num_new:,} new samples exceed {INCREMENTAL_MAX_NEW_FRACTION:.0%} of the dataset", None
+        
+        drift = self.measure_drift(state, X_features, y_labels, new_mask, class_names)
+        if drift > DRIFT_THRESHOLD:
+            return "full", f"embedding drift {drift:.3f} > {DRIFT_THRESHOLD}", None
+        return "incremental", f"{num_new:,} new samples, drift {drift:.3f}", new_mask
+    
+    def split_dataset(self, drop_mask=None):
+        """
+        Train/validation/test split hashed from each sample key (~70/15/15)
+        
+        A sample stays in the same split as the dataset grows, so the test
+        set never holds samples an earlier model (warm-started from) was
+        trained on. Samples in drop_mask (near-duplicates) are removed from
+        the training and validation data only, so pruning never changes what
+        the model is scored on.
+        
+        Returns:
+            (train_idx, val_idx, test_idx, pruned)
+        """
+        splits = split_indices(self.sample_keys, test_fraction=0.15, val_fraction=0.15, seed=42)
+        train_idx, val_idx, test_idx = splits["train"], splits["val"], splits["test"]
+        if min(len(train_idx), len(val_idx), len(test_idx)) == 0:
+            raise ValueError(f"Too few samples ({len(self.sample_keys)}) for a train/validation/test split")
+        pruned = 0
+        if drop_mask is not None:
+            pruned = int(drop_mask[train_idx].sum() + drop_mask[val_idx].sum())
+            train_idx = train_idx[~drop_mask[train_idx]]
+            val_idx = val_idx[~drop_mask[val_idx]]
+        return train_idx, val_idx, test_idx, pruned
+    
+    def _train_full(self, X_features, y_labels, class_names, model_checkpoint_path,
+                    epochs, batch_size, embedding_mixup, drop_mask=None):
+        """Normalize, split and train a fresh network on the full dataset"""
         # Step 2: Normalize features
-        X_normalized = (X_features - X_features.mean()) / X_features.std()
+        mean, std = float(X_features.mean()), float(X_features.std())
+        X_normalized = (X_features - mean) / std
         
         # Step 3: Convert labels to categorical
         y_categorical = to_categorical(y_labels, num_classes=len(class_names))
         
         # Step 4: Split data
-        X_temp, X_test, y_temp, y_test = train_test_split(
-            X_normalized, y_categorical, test_size=0.15, random_state=42, stratify=y_labels
-        )
-        
-        X_train, X_val, y_train, y_val = train_test_split(
-            X_temp, y_temp, test_size=0.176, random_state=42
-        )
+        train_idx, val_idx, test_idx, pruned = self.split_dataset(drop_mask)
+        X_train, y_train = X_normalized[train_idx], y_categorical[train_idx]
+        X_val, y_val = X_normalized[val_idx], y_categorical[val_idx]
+        X_test, y_test = X_normalized[test_idx], y_categorical[test_idx]
         
         print(f"\n📊 Data Split:")
         print(f"  Training:   {len(X_train):,} samples")
         print(f"  Validation: {len(X_val):,} samples")
         print(f"  Test:       {len(X_test):,} samples")
+        if pruned:
+            print(f"  Pruned:     {pruned:,} near-duplicates")
         
         # Step 5: Build model
         model = self.build_model(input_dim=X_train.shape[1], num_classes=len(class_names))
         
         # Step 6: Setup callbacks
-        model_checkpoint_path = self.models_dir / "yamnet_classifier_v2.keras"
         callbacks = [
             EarlyStopping(monitor='val_loss', patience=15, restore_best_weights=True, verbose=1),
             ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=7, min_lr=1e-7, verbose=1),
             ModelCheckpoint(filepath=str(model_checkpoint_path), monitor='val_accuracy', 
-                          save_best_only=True, verbose=1)
+                          save_best_only=True, verbose=1),
+            TrainingProgressCallback(self, epochs)
         ]
         
         # Step 7: Train model
-        print(f"\n🚀 Training model...")
-        history = model.fit(
-            X_train, y_train,
-            validation_data=(X_val, y_val),
+        if embedding_mixup:
+            print(f"\n🚀 Training model with embedding mixup "
+                  f"(alpha {MIXUP_ALPHA}, {MIXUP_EXPANSION:g}x synthetic, noise std {EMBEDDING_NOISE_STD})...")
+        else:
+            print(f"\n🚀 Training model...")
+        history = self.fit_model(
+            model, X_train, y_train, X_val, y_val,
             epochs=epochs,
             batch_size=batch_size,
             callbacks=callbacks,
+            embedding_mixup=embedding_mixup
+        )
+        
+        return {
+            "model": model, "history": history.history, "X_test": X_test, "y_test": y_test,
+            "X_fit": X_train, "y_fit": np.argmax(y_train, axis=1), "X_val": X_val, "y_val": y_val,
+            "mean": mean, "std": std,
+            "new_samples": len(X_features), "replay_samples": 0,
+            "fit_samples": len(X_train), "pruned_samples": pruned
+        }
+    
+    @staticmethod
+    def tf_dataset(loader, num_classes):
+        """Wrap an EmbeddingBatchLoader as a tf.data pipeline (each iteration is one epoch)"""
+        dataset = tf.data.Dataset.from_generator(
+            lambda: iter(loader),
+            output_signature=(
+                tf.TensorSpec(shape=(None, EMBEDDING_DIM), dtype=tf.float32),
+                tf.TensorSpec(shape=(None, num_classes), dtype=tf.float32)
+            )
+        )
+        return dataset.apply(tf.data.experimental.assert_cardinality(len(loader))).prefetch(tf.data.AUTOTUNE)
+    
+    def _train_streaming(self, y_labels, class_names, model_checkpoint_path, epochs, batch_size,
+                         embedding_mixup):
+        """
+        Train a fresh network out-of-core on batches streamed from the feature store
+        
+        Normalization stats and class centroids come from one streaming pass;
+        the split is a hash of each sample key (stable across runs). Memory is
+        bounded by the shuffle buffer and prefetch queue, not the dataset size.
+        """
+        num_classes = len(class_names)
+        print(f"\n📐 Computing normalization statistics over {len(self.sample_keys):,} samples (one pass)...")
+        self.report_progress("training", 0.0, "computing normalization statistics")
+        stats = streaming_statistics(self.feature_store, self.sample_keys, y_labels, num_classes)
+        mean, std = stats["mean"], stats["std"]
+        
+        splits = split_indices(self.sample_keys, test_fraction=0.15, val_fraction=0.15, seed=42)
+        if min(len(idx) for idx in splits.values()) == 0:
+            raise ValueError("Too few samples for out-of-core training; use TRAINING_DATA_MODE=memory")
+        
+        def loader(split, shuffle, **mixup_args):
+            idx = splits[split]
+            return EmbeddingBatchLoader(
+                self.feature_store, [self.sample_keys[i] for i in idx], y_labels[idx], num_classes,
+                mean, std, batch_size=batch_size, shuffle=shuffle,
+                shuffle_buffer=STREAM_SHUFFLE_BUFFER, prefetch_batches=STREAM_PREFETCH_BATCHES,
+                seed=AUGMENTATION_SEED, **mixup_args
+            )
+        
+        train_loader = loader("train", True, **({
+            "mixup_expansion": MIXUP_EXPANSION, "mixup_alpha": MIXUP_ALPHA, "noise_std": EMBEDDING_NOISE_STD
+        } if embedding_mixup else {}))
+        val_loader, test_loader = loader("val", False), loader("test", False)
+        
+        print(f"\n📊 Data Split (hashed by sample key):")
+        print(f"  Training:   {len(splits['train']):,} samples")
+        print(f"  Validation: {len(splits['val']):,} samples")
+        print(f"  Test:       {len(splits['test']):,} samples")
+        print(f"  Shuffle buffer: {STREAM_SHUFFLE_BUFFER:,} samples, prefetch {STREAM_PREFETCH_BATCHES} batches")
+        
+        model = self.build_model(input_dim=EMBEDDING_DIM, num_classes=num_classes)
+        callbacks = [
+            EarlyStopping(monitor='val_loss', patience=15, restore_best_weights=True, verbose=1),
+            ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=7, min_lr=1e-7, verbose=1),
+            ModelCheckpoint(filepath=str(model_checkpoint_path), monitor='val_accuracy', 
+                          save_best_only=True, verbose=1),
+            TrainingProgressCallback(self, epochs)
+        ]
+        
+        print(f"\n🚀 Training model out-of-core{' with embedding mixup (within batches)' if embedding_mixup else ''}...")
+        history = model.fit(
+            self.tf_dataset(train_loader, num_classes),
+            validation_data=self.tf_dataset(val_loader, num_classes),
+            epochs=epochs,
+            callbacks=callbacks,
             verbose=1
         )
         
+        counts = np.maximum(stats["class_counts"], 1)[:, None]
+        centroids = {
+            class_name: (stats["class_sums"][idx] / counts[idx]).tolist()
+            for idx, class_name in enumerate(class_names)
+            if stats["class_counts"][idx] > 0
+        }
+        return {
+            "model": model, "history": history.history, "test_loader": test_loader,
+            "mean": mean, "std": std, "class_centroids": centroids,
+            "new_samples": len(self.sample_keys), "replay_samples": 0,
+            "fit_samples": len(splits["train"]), "pruned_samples": 0
+        }
+    
+    @staticmethod
+    def evaluate_model(model, run):
+        """
+        Test loss, accuracy and per-sample (true, predicted) classes
+        
+        Out-of-core runs are scored batch by batch from their test loader.
+        """
+        if "test_loader" not in run:
+            test_loss, test_accuracy = model.evaluate(run["X_test"], run["y_test"], verbose=0)
+            y_pred = model.predict(run["X_test"])
+            return test_loss, test_accuracy, np.argmax(run["y_test"], axis=1), np.argmax(y_pred, axis=1)
+        
+        loss_sum, true_classes, pred_classes = 0.0, [], []
+        for X_batch, y_batch in run["test_loader"]:
+            probs = np.asarray(model.predict_on_batch(X_batch))
+            loss_sum += float(-np.sum(y_batch * np.log(np.clip(probs, 1e-7, 1.0))))
+            true_classes.append(np.argmax(y_batch, axis=1))
+            pred_classes.append(np.argmax(probs, axis=1))
+        y_true, y_pred = np.concatenate(true_classes), np.concatenate(pred_classes)
+        return loss_sum / len(y_true), float(np.mean(y_true == y_pred)), y_true, y_pred
+    
+    def _train_linear(self, X_features, y_labels, class_names, model_checkpoint_path, drop_mask=None):
+        """Fit only a linear head on the full-retraining split (no epochs, for urgent re-deployments)"""
+        mean, std = float(X_features.mean()), float(X_features.std())
+        X_normalized = (X_features - mean) / std
+        y_categorical = to_categorical(y_labels, num_classes=len(class_names))
+        
+        train_idx, val_idx, test_idx, pruned = self.split_dataset(drop_mask)
+        X_train, y_train = X_normalized[train_idx], y_categorical[train_idx]
+        X_val, y_val = X_normalized[val_idx], y_categorical[val_idx]
+        X_test, y_test = X_normalized[test_idx], y_categorical[test_idx]
+        
+        print(f"\n📊 Data Split:")
+        print(f"  Training:   {len(X_train):,} samples")
+        print(f"  Validation: {len(X_val):,} samples")
+        print(f"  Test:       {len(X_test):,} samples")
+        if pruned:
+            print(f"  Pruned:     {pruned:,} near-duplicates")
+        
+        train_labels, val_labels = np.argmax(y_train, axis=1), np.argmax(y_val, axis=1)
+        print(f"\n⚡ Fitting {LINEAR_HEAD} head...")
+        self.report_progress("training", 0.0, f"fitting {LINEAR_HEAD} head")
+        start = time.perf_counter()
+        W, b = fit_linear_head(X_train, train_labels, len(class_names), kind=LINEAR_HEAD)
+        fit_seconds = time.perf_counter() - start
+        print(f"✓ Fitted in {fit_seconds:.2f}s")
+        self.report_progress("training", 1.0, f"{LINEAR_HEAD} head fitted in {fit_seconds:.2f}s")
+        
+        model = self.build_linear_model(W, b)
+        model.save(model_checkpoint_path)
+        
+        # One "epoch" of history so the dashboard's curves stay meaningful
+        history = {
+            "loss": [log_loss(X_train, train_labels, W, b)],
+            "accuracy": [float(np.mean(predict_proba(X_train, W, b).argmax(axis=1) == train_labels))],
+            "val_loss": [log_loss(X_val, val_labels, W, b)],
+            "val_accuracy": [float(np.mean(predict_proba(X_val, W, b).argmax(axis=1) == val_labels))]
+        }
+        
+        return {
+            "model": model, "history": history, "X_test": X_test, "y_test": y_test,
+            "X_fit": X_train, "y_fit": train_labels, "X_val": X_val, "y_val": y_val,
+            "mean": mean, "std": std,
+            "new_samples": len(X_features), "replay_samples": 0,
+            "fit_samples": len(X_train), "pruned_samples": pruned,
+            "linear_fit_seconds": fit_seconds
+        }
+    
+    def compare_heads(self, run, model_checkpoint_path):
+        """
+        Fit a linear head on the same training data as the MLP and keep the
+        lighter one when its validation accuracy is within HEAD_TOLERANCE
+        
+        The test split is left out of the choice and only scores the
+        selected head afterwards.
+        
+        Returns:
+            (model, head_report)
+        """
+        X_val, y_val = run["X_val"], np.argmax(run["y_val"], axis=1)
+        mlp = run["model"]
+        _, mlp_accuracy = mlp.evaluate(X_val, run["y_val"], verbose=0)
+        
+        print(f"\n⚡ Fitting {LINEAR_HEAD} head for comparison...")
+        start = time.perf_counter()
+        W, b = fit_linear_head(run["X_fit"], run["y_fit"], run["y_val"].shape[1], kind=LINEAR_HEAD)
+        fit_seconds = time.perf_counter() - start
+        linear_accuracy = float(np.mean(predict_proba(X_val, W, b).argmax(axis=1) == y_val))
+        
+        candidates = {
+            "mlp": {"val_accuracy": float(mlp_accuracy), "params": int(mlp.count_params())},
+            "linear": {"val_accuracy": linear_accuracy, "params": int(W.size + b.size),
+                       "kind": LINEAR_HEAD, "fit_seconds": round(fit_seconds, 3)}
+        }
+        gap = float(mlp_accuracy) - linear_accuracy
+        selected = "linear" if gap <= HEAD_TOLERANCE else "mlp"
+        
+        print(f"  MLP:    val accuracy {mlp_accuracy:.4f} ({candidates['mlp']['params']:,} params)")
+        print(f"  Linear: val accuracy {linear_accuracy:.4f} ({candidates['linear']['params']:,} params, {fit_seconds:.2f}s)")
+        print(f"✓ Selected {selected} head (accuracy gap {gap:+.4f}, tolerance {HEAD_TOLERANCE})")
+        
+        model = mlp
+        if selected == "linear":
+            model = self.build_linear_model(W, b)
+            model.save(model_checkpoint_path)
+        return model, {"selected": selected, "tolerance": HEAD_TOLERANCE, "candidates": candidates}
+    
+    def _train_incremental(self, state, new_mask, X_features, y_labels, class_names,
+                           model_checkpoint_path, batch_size, embedding_mixup, drop_mask=None):
+        """
+        Fine-tune the current model on new samples plus a class-balanced replay buffer
+        
+        Inputs are normalized with the stats the current model was trained
+        with. The split is the same hashed split as full retraining, so the
+        current model never saw the test samples and accuracies compare.
+        """
+        mean, std = state["normalization"]["mean"], state["normalization"]["std"]
+        X_normalized = (X_features - mean) / std
+        y_categorical = to_categorical(y_labels, num_classes=len(class_names))
+        
+        train_idx, val_idx, test_idx, pruned = self.split_dataset(drop_mask)
+        new_idx = train_idx[new_mask[train_idx]]
+        old_idx = train_idx[~new_mask[train_idx]]
+        
+        # Replay: up to REPLAY_SAMPLES_PER_CLASS previously seen samples per class
+        rng = np.random.RandomState(42)
+        replay_idx = [np.array([], dtype=int)]
+        for class_idx in range(len(class_names)):
+            candidates = old_idx[y_labels[old_idx] == class_idx]
+            if len(candidates):
+                replay_idx.append(rng.choice(
+                    candidates, size=min(REPLAY_SAMPLES_PER_CLASS, len(candidates)), replace=False
+                ))
+        replay_idx = np.concatenate(replay_idx)
+        # Validate on the whole validation split, old samples included, so
+        # early stopping also guards against forgetting
+        fit_idx = np.concatenate([new_idx, replay_idx])
+        
+        print(f"\n📊 Incremental Data:")
+        print(f"  New:        {len(new_idx):,} samples")
+        print(f"  Replay:     {len(replay_idx):,} samples ({REPLAY_SAMPLES_PER_CLASS} per class max)")
+        print(f"  Training:   {len(fit_idx):,}  Validation: {len(val_idx):,}  Test: {len(test_idx):,}")
+        if pruned:
+            print(f"  Pruned:     {pruned:,} near-duplicates")
+        
+        # Warm start from the production model with a lower learning rate
+        model = tf.keras.models.load_model(self.models_dir / "yamnet_classifier_v2.keras")
+        model.compile(
+            optimizer=Adam(learning_rate=INCREMENTAL_LEARNING_RATE),
+            loss='categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        callbacks = [
+            EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True, verbose=1),
+            ModelCheckpoint(filepath=str(model_checkpoint_path), monitor='val_accuracy', 
+                          save_best_only=True, verbose=1),
+            TrainingProgressCallback(self, INCREMENTAL_EPOCHS)
+        ]
+        
+        print(f"\n🚀 Fine-tuning current model for up to {INCREMENTAL_EPOCHS} epochs...")
+        history = self.fit_model(
+            model, X_normalized[fit_idx], y_categorical[fit_idx],
+            X_normalized[val_idx], y_categorical[val_idx],
+            epochs=INCREMENTAL_EPOCHS,
+            batch_size=batch_size,
+            callbacks=callbacks,
+            embedding_mixup=embedding_mixup
+        )
+        
+        return {
+            "model": model, "history": history.history,
+            "X_test": X_normalized[test_idx], "y_test": y_categorical[test_idx],
+            # A linear head is cheap enough to fit on the whole training split
+            "X_fit": X_normalized[train_idx], "y_fit": y_labels[train_idx],
+            "X_val": X_normalized[val_idx], "y_val": y_categorical[val_idx],
+            "mean": mean, "std": std,
+            "new_samples": len(new_idx), "replay_samples": len(replay_idx),
+            "fit_samples": len(fit_idx), "pruned_samples": pruned
+        }
+    
+    def find_near_duplicates(self, X_features, y_labels, threshold=DEDUP_THRESHOLD):
+        """
+        Flag same-class embeddings that are near-duplicates of an earlier sample
+        
+        An IVF index (approximate nearest neighbours) keeps this far below the
+        all-pairs cost; the first sample of every close group is kept.
+        
+        Returns:
+            (duplicate_mask, report)
+        """
+        print(f"\n🔎 Searching for near-duplicate embeddings (cosine >= {threshold})...")
+        start = time.perf_counter()
+        duplicate_mask, stats = near_duplicates(
+            X_features, threshold=threshold, labels=y_labels, nprobe=DEDUP_NPROBE
+        )
+        index_seconds = time.perf_counter() - start
+        print(f"✓ {stats['flagged']:,} of {len(X_features):,} samples are near-duplicates "
+              f"({stats['pairs']:,} close pairs, {stats['nlist']} lists, {index_seconds:.1f}s)")
+        return duplicate_mask, {
+            "threshold": threshold,
+            "pairs": stats["pairs"],
+            "flagged": stats["flagged"],
+            "index_seconds": round(index_seconds, 2)
+        }
+    
+    def retrain_model(self, yamnet_model, epochs=100, batch_size=64, embedding_mixup=EMBEDDING_MIXUP,
+                      retrain_mode=RETRAIN_MODE, head_mode=HEAD_MODE, dedup_mode=DEDUP_MODE):
+        """
+        Complete retraining pipeline
+        
+        retrain_mode "incremental" fine-tunes the current model when only a
+        modest amount of in-distribution data arrived, and falls back to full
+        retraining on class-set changes, drift or missing training state.
+        
+        head_mode "linear" fits only a linear head (seconds); "auto" also fits
+        one after the MLP and keeps it if it is within HEAD_TOLERANCE.
+        
+        dedup_mode "flag" reports near-duplicate training embeddings; "prune"
+        also leaves them out of the training and validation data.
+        """
+        print("\n" + "="*70)
+        print("🔄 STARTING MODEL RETRAINING PIPELINE")
+        print("="*70)
+        
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        
+        # Samples recorded up to here are the ones this run trains on
+        manifest_watermark = self.manifest.watermark()
+        
+        # Step 1: Extract features
+        X_features, y_labels, class_names = self.extract_features_batch(yamnet_model)
+        
+        # Step 1b: Near-duplicate detection (needs in-memory features)
+        drop_mask, dedup_report = None, None
+        if dedup_mode != "off" and X_features is not None:
+            duplicate_mask, dedup_report = self.find_near_duplicates(X_features, y_labels)
+            dedup_report["mode"] = dedup_mode
+            if dedup_mode == "prune":
+                drop_mask = duplicate_mask
+        elif dedup_mode != "off":
+            print("ℹ️  Near-duplicate detection needs in-memory features; skipped in out-of-core mode")
+        
+        # Steps 2-7: Normalize, split, build (or warm-start) and train
+        training_mode, mode_reason, new_mask = "full", "full retraining requested", None
+        state = self.load_training_state()
+        if X_features is None:
+            mode_reason = "out-of-core training (streamed from the feature store)"
+            if head_mode != "mlp" or retrain_mode == "incremental":
+                print("ℹ️  Out-of-core mode trains the MLP from scratch; "
+                      "incremental and linear heads need in-memory features")
+            head_mode = "mlp"
+        elif head_mode == "linear":
+            training_mode, mode_reason = "linear", f"{LINEAR_HEAD} head only"
+        elif retrain_mode == "incremental":
+            training_mode, mode_reason, new_mask = self.plan_training(state, X_features, y_labels, class_names)
+        print(f"\n🧭 Training mode: {training_mode} ({mode_reason})")
+        
+        # Checkpoints go to a partial file that replaces the served model only once all
+        # artifacts are ready, so a cancelled or failed run leaves production untouched
+        model_checkpoint_path = self.models_dir / "yamnet_classifier_v2.keras"
+        partial_checkpoint_path = self.models_dir / "yamnet_classifier_v2.partial.keras"
+        partial_checkpoint_path.unlink(missing_ok=True)
+        train_start = time.perf_counter()
+        if X_features is None:
+            run = self._train_streaming(
+                y_labels, class_names, partial_checkpoint_path, epochs, batch_size, embedding_mixup
+            )
+        elif training_mode == "linear":
+            run = self._train_linear(X_features, y_labels, class_names, partial_checkpoint_path, drop_mask)
+        elif training_mode == "incremental":
+            run = self._train_incremental(
+                state, new_mask, X_features, y_labels, class_names,
+                partial_checkpoint_path, batch_size, embedding_mixup, drop_mask
+            )
+        else:
+            run = self._train_full(
+                X_features, y_labels, class_names,
+                partial_checkpoint_path, epochs, batch_size, embedding_mixup, drop_mask
+            )
+        train_seconds = time.perf_counter() - train_start
+        model, history = run["model"], run["history"]
+        
+        if dedup_report is not None:
+            # Training time scales roughly linearly with the samples fitted per epoch
+            pruned = run["pruned_samples"]
+            dedup_report.update({
+                "pruned_from_training": pruned,
+                "train_seconds": round(train_seconds, 2),
+                "estimated_seconds_saved": round(train_seconds * pruned / max(1, run["fit_samples"]), 2)
+            })
+        
+        head_report = {"selected": "linear" if training_mode == "linear" else "mlp"}
+        if head_mode == "auto" and training_mode != "linear":
+            model, head_report = self.compare_heads(run, partial_checkpoint_path)
+        
         # Step 8: Evaluate model
-        test_loss, test_accuracy = model.evaluate(X_test, y_test, verbose=0)
+        self.report_progress("saving", 0.0, "evaluating")
+        test_loss, test_accuracy, y_test_classes, y_pred_classes = self.evaluate_model(model, run)
         
         print(f"\n✓ Training complete!")
         print(f"  Test Accuracy: {test_accuracy:.4f} ({test_accuracy*100:.2f}%)")
         print(f"  Test Loss: {test_loss:.4f}")
+        if dedup_report is not None and dedup_report["pruned_from_training"]:
+            print(f"  Pruned {dedup_report['pruned_from_training']:,} near-duplicates: "
+                  f"~{dedup_report['estimated_seconds_saved']:.0f}s of training saved "
+                  f"(index built in {dedup_report['index_seconds']:.1f}s)")
         
         # Step 9: Calculate detailed metrics
-        y_pred = model.predict(X_test)
-        y_pred_classes = np.argmax(y_pred, axis=1)
-        y_test_classes = np.argmax(y_test, axis=1)
-        
         precision, recall, f1, _ = precision_recall_fscore_support(
-            y_test_classes, y_pred_classes, average=None
+            y_test_classes, y_pred_classes, labels=list(range(len(class_names))), average=None, zero_division=0
         )
         
         # Step 10: Save artifacts
-        sample_counts = {}
-        for class_dir in self.augmented_audio_dir.iterdir():
-            if class_dir.is_dir():
-                sample_counts[class_dir.name] = len(list(class_dir.glob("*.wav")))
+        self.report_progress("saving", 0.3, "saving artifacts")
+        if partial_checkpoint_path.exists():
+            os.replace(partial_checkpoint_path, model_checkpoint_path)
+        else:
+            model.save(model_checkpoint_path)
+        
+        sample_counts = self.count_samples()
         
         # Save class names
         with open(self.models_dir / "class_names.json", 'w') as f:
@@ -356,7 +1386,10 @@ class ModelRetrainingPipeline:
             "test_loss": float(test_loss),
             "num_classes": len(class_names),
             "classes": class_names,
-            "sample_counts": sample_counts
+            "sample_counts": sample_counts,
+            "training_mode": training_mode,
+            "head": head_report["selected"],
+            "normalization": {"mean": run["mean"], "std": run["std"]}
         }
         
         with open(self.models_dir / "model_metadata.json", 'w') as f:
@@ -381,7 +1414,13 @@ class ModelRetrainingPipeline:
         
         # Save training history
         with open(self.models_dir / "training_history.pkl", 'wb') as f:
-            pickle.dump(history.history, f)
+            pickle.dump(history, f)
+        
+        centroids = run.get("class_centroids") or self.class_centroids(X_features, y_labels, class_names)
+        self.save_training_state(class_names, run["mean"], run["std"], centroids, training_mode)
+        
+        # Written last: versions and checksums the artifacts above for startup sync
+        write_manifest(self.models_dir, build_manifest(self.models_dir, version=timestamp))
         
         # Step 11: Update retraining log
         retraining_record = {
@@ -393,8 +1432,21 @@ class ModelRetrainingPipeline:
             "num_classes": len(class_names),
             "classes": class_names,
             "sample_counts": sample_counts,
-            "total_samples": len(X_features),
-            "epochs_trained": len(history.history['loss']),
+            "manifest_watermark": manifest_watermark,
+            "total_samples": len(self.sample_keys),
+            "epochs_trained": len(history['loss']),
+            "training_mode": training_mode,
+            "training_mode_reason": mode_reason,
+            "head": head_report,
+            "new_samples": run["new_samples"],
+            "replay_samples": run["replay_samples"],
+            "near_duplicates": dedup_report,
+            "augmentations_per_file": AUGMENTATIONS_PER_FILE,
+            "embedding_mixup": {
+                "alpha": MIXUP_ALPHA,
+                "expansion": MIXUP_EXPANSION,
+                "noise_std": EMBEDDING_NOISE_STD
+            } if embedding_mixup else None,
             "metrics": {
                 "precision": precision.tolist(),
                 "recall": recall.tolist(),
@@ -406,6 +1458,7 @@ class ModelRetrainingPipeline:
         
         with open(self.retraining_log_path, 'w') as f:
             json.dump(self.retraining_log, f, indent=2)
+        self.manifest.mark_trained(manifest_watermark)
         
         print(f"\n✓ All artifacts saved to {self.models_dir}")
         print(f"  - Model: yamnet_classifier_v2.keras")
@@ -415,18 +1468,34 @@ class ModelRetrainingPipeline:
         print(f"  - Retraining log: retraining_log.json")
         print("="*70)
         
+        self.report_progress("saving", 1.0, "artifacts saved")
+        
         return model, {
             "test_accuracy": test_accuracy,
             "test_loss": test_loss,
             "precision": precision,
             "recall": recall,
             "f1_score": f1,
-            "class_names": class_names
+            "class_names": class_names,
+            "training_mode": training_mode,
+            "head": head_report["selected"]
         }
 
 
-def main():
-    """Main retraining function"""
+def run_retraining(yamnet_model=None, min_new_samples=MIN_NEW_SAMPLES,
+                   progress_callback=None, cancel_check=None):
+    """
+    Check the retraining trigger and retrain if enough new data arrived
+    
+    Args:
+        yamnet_model: Already loaded YAMNet (loaded from TF Hub if None)
+        min_new_samples: New samples required to retrain
+        progress_callback: Called as progress_callback(stage, fraction, message)
+        cancel_check: Returns True when the run should stop
+    
+    Returns:
+        JSON-serialisable summary with a "status" of "completed" or "skipped"
+    """
     print("="*70)
     print("🦜 EcoSight Wildlife Monitoring - Model Retraining")
     print("="*70)
@@ -436,24 +1505,34 @@ def main():
     print("="*70)
     
     # Initialize pipeline
+    feature_store = EmbeddingFeatureStore(FEATURES_DIR, YAMNET_MODEL_URL, dtype=FEATURE_STORE_DTYPE)
+    pcm_cache = PCMCache(FEATURES_DIR, sample_rate=SAMPLE_RATE, dtype=PCM_CACHE_DTYPE) if PCM_CACHE else None
     pipeline = ModelRetrainingPipeline(
         models_dir=MODELS_DIR,
-        augmented_audio_dir=AUGMENTED_AUDIO_DIR
+        augmented_audio_dir=AUGMENTED_AUDIO_DIR,
+        feature_store=feature_store,
+        pcm_cache=pcm_cache,
+        streaming=PIPELINE_MODE == "stream",
+        spec_augment=PIPELINE_MODE == "specaugment",
+        out_of_core=TRAINING_DATA_MODE == "stream",
+        progress_callback=progress_callback,
+        cancel_check=cancel_check
     )
     
     # Check if retraining should be triggered
-    should_retrain, new_samples = pipeline.check_retraining_trigger(min_new_samples=MIN_NEW_SAMPLES)
+    should_retrain, new_samples = pipeline.check_retraining_trigger(min_new_samples=min_new_samples)
     
     if not should_retrain:
         print("\n⏸️  Retraining skipped. Not enough new data.")
         print(f"   Current new samples: {new_samples}")
-        print(f"   Required: {MIN_NEW_SAMPLES}")
-        return
+        print(f"   Required: {min_new_samples}")
+        return {"status": "skipped", "new_samples": int(new_samples), "required": min_new_samples}
     
     # Load YAMNet model
-    print("\n📥 Loading YAMNet pretrained model...")
-    yamnet_model = hub.load('https://tfhub.dev/google/yamnet/1')
-    print("✓ YAMNet model loaded!")
+    if yamnet_model is None:
+        print("\n📥 Loading YAMNet pretrained model...")
+        yamnet_model = hub.load(YAMNET_MODEL_URL)
+        print("✓ YAMNet model loaded!")
     
     # Run retraining
     model, metrics = pipeline.retrain_model(
@@ -462,6 +1541,26 @@ def main():
         batch_size=BATCH_SIZE
     )
     
+    return {
+        "status": "completed",
+        "new_samples": int(new_samples),
+        "test_accuracy": float(metrics["test_accuracy"]),
+        "test_loss": float(metrics["test_loss"]),
+        "class_names": metrics["class_names"],
+        "precision": [float(v) for v in metrics["precision"]],
+        "recall": [float(v) for v in metrics["recall"]],
+        "f1_score": [float(v) for v in metrics["f1_score"]],
+        "training_mode": metrics["training_mode"],
+        "head": metrics["head"]
+    }
+
+
+def main():
+    """Main retraining function"""
+    metrics = run_retraining()
+    if metrics["status"] != "completed":
+        return
+    
     print("\n" + "="*70)
     print("✅ RETRAINING COMPLETE!")
     print("="*70)
@@ -481,7 +1580,7 @@ def main():
 if __name__ == "__main__":
     try:
         main()
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, RetrainingCancelled):
         print("\n\n⚠️  Retraining interrupted by user")
         sys.exit(1)
     except Exception as e:
@@ -41,6 +41,27 @@ if [ -f "$CLASSES_FILE" ]; then
     echo "✓ Class names uploaded"
 fi
 
+# Upload metrics and history if they exist
+for EXTRA_FILE in models/performance_metrics.json models/training_history.pkl; do
+    if [ -f "$EXTRA_FILE" ]; then
+        echo "Uploading $(basename "$EXTRA_FILE")..."
+        aws s3 cp "$EXTRA_FILE" "s3://$BUCKET/models/$(basename "$EXTRA_FILE")"
+    fi
+done
+
+# Refresh the manifest (keeping its version) and upload it last:
+# the API compares it with local files and only fetches what changed
+echo "Writing model manifest..."
+python3 - <<'PY'
+import sys
+sys.path.insert(0, "src")
+from model_manifest import build_manifest, write_manifest, load_manifest
+current = load_manifest("models")
+write_manifest("models", build_manifest("models", version=current["version"] if current else None))
+PY
+aws s3 cp models/manifest.json "s3://$BUCKET/models/manifest.json"
+echo "✓ Manifest uploaded"
+
 echo ""
 echo "================================================================"
 echo "  ✅ Model Upload Complete"
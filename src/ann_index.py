@@ -0,0 +1,338 @@
+"""
+Approximate Nearest-Neighbour Index for EcoSight
+Inverted-file (IVF) index over YAMNet embeddings, built with NumPy only.
+
+Vectors are L2-normalised, so cosine similarity is a dot product. A
+spherical k-means assigns every vector to one of nlist centroids; a query
+only scores the vectors in its nprobe closest lists, which for
+nprobe << nlist is a small fraction of the collection.
+
+Used to flag or prune near-duplicate training samples (near_duplicates)
+and for similar-sound search (sound_search.SoundSearchIndex).
+
+Saved layout (vectors and list assignments are append-only, so inserts
+since the last save can be written without rewriting the index):
+    <directory>/
+        ivf.json            (dim, nlist, nprobe, seed)
+        centroids.npy
+        vectors.f32         (n x dim, float32)
+        lists.i32           (list id of each vector)
+"""
+
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NPROBE = 8
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64  # k-means is trained on at most nlist * this many vectors
+QUERY_CHUNK = 1024
+META_FILENAME = "ivf.json"
+CENTROIDS_FILENAME = "centroids.npy"
+VECTORS_FILENAME = "vectors.f32"
+LISTS_FILENAME = "lists.i32"
+
+
+def normalize(X: np.ndarray) -> np.ndarray:
+    """Row-wise L2 normalisation (zero rows stay zero)"""
+    X = np.asarray(X, dtype=np.float32)
+    norms = np.linalg.norm(X, axis=-1, keepdims=True)
+    return X / np.maximum(norms, 1e-12)
+
+
+def default_nlist(num_vectors: int) -> int:
+    """About 4 * sqrt(n) lists, so each list holds roughly sqrt(n) / 4 vectors"""
+    return max(1, min(num_vectors, int(4 * math.sqrt(max(num_vectors, 1)))))
+
+
+class IVFIndex:
+    """Inverted-file index with cosine similarity"""
+
+    def __init__(self, dim: int, nlist: Optional[int] = None, nprobe: int = DEFAULT_NPROBE, seed: int = 42):
+        """
+        Args:
+            dim: Vector dimension
+            nlist: Number of inverted lists (default: chosen from the first batch added)
+            nprobe: Lists scanned per query
+            seed: Seed for k-means initialisation
+        """
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._size = 0
+        self._lists: List[List[int]] = []
+        self._list_arrays: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Normalised vectors in insertion (id) order"""
+        return self._vectors[:self._size]
+
+    def train(self, X: np.ndarray, iterations: int = KMEANS_ITERATIONS):
+        """
+        Fit the centroids with spherical k-means
+
+        Args:
+            X: Training vectors (normalised here)
+            iterations: k-means iterations
+        """
+        X = normalize(X)
+        rng = np.random.RandomState(self.seed)
+        nlist = self.nlist or default_nlist(len(X))
+        nlist = min(nlist, len(X))
+        if len(X) > nlist * KMEANS_SAMPLE_PER_LIST:
+            X = X[rng.choice(len(X), nlist * KMEANS_SAMPLE_PER_LIST, replace=False)]
+
+        centroids = X[rng.choice(len(X), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = self._nearest_centroid(X, centroids)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            present = np.flatnonzero(counts)
+            sums[present] = np.add.reduceat(X[order], np.concatenate([[0], np.cumsum(counts)[:-1]])[present])
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                sums[empty] = X[rng.choice(len(X), len(empty), replace=False)]
+            centroids = normalize(sums)
+
+        self.nlist = nlist
+        self.centroids = centroids
+        self._lists = [[] for _ in range(nlist)]
+        self._list_arrays = {}
+        if self._size:
+            existing = self.vectors
+            self._size = 0
+            self._append(existing)
+        logger.info(f"IVF index trained: {nlist} lists on {len(X):,} vectors")
+
+    @staticmethod
+    def _nearest_centroid(X: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        assign = np.empty(len(X), dtype=np.int64)
+        for start in range(0, len(X), QUERY_CHUNK):
+            assign[start:start + QUERY_CHUNK] = np.argmax(X[start:start + QUERY_CHUNK] @ centroids.T, axis=1)
+        return assign
+
+    def _append(self, X: np.ndarray) -> np.ndarray:
+        """Store already-normalised vectors and file them under their nearest list"""
+        return self._file(X, self._nearest_centroid(X, self.centroids))
+
+    def _file(self, X: np.ndarray, assignments: np.ndarray) -> np.ndarray:
+        """Store vectors with known list assignments"""
+        needed = self._size + len(X)
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors))
+            grown = np.empty((capacity, self.dim), dtype=np.float32)
+            grown[:self._size] = self.vectors
+            self._vectors = grown
+            grown_assignments = np.empty(capacity, dtype=np.int32)
+            grown_assignments[:self._size] = self._assignments[:self._size]
+            self._assignments = grown_assignments
+        ids = np.arange(self._size, needed)
+        self._vectors[self._size:needed] = X
+        self._assignments[self._size:needed] = assignments
+        self._size = needed
+        for vector_id, list_id in zip(ids, assignments):
+            self._lists[list_id].append(int(vector_id))
+            self._list_arrays.pop(int(list_id), None)
+        return ids
+
+    def add(self, X: np.ndarray) -> np.ndarray:
+        """
+        Insert vectors (the first call trains the centroids on them)
+
+        Args:
+            X: Vectors of shape (n, dim)
+
+        Returns:
+            Ids assigned to the new vectors (consecutive, in input order)
+        """
+        X = normalize(np.atleast_2d(X))
+        if self.centroids is None:
+            self.train(X)
+        return self._append(X)
+
+    def _list_ids(self, list_id: int) -> np.ndarray:
+        ids = self._list_arrays.get(list_id)
+        if ids is None:
+            ids = np.array(self._lists[list_id], dtype=np.int64)
+            self._list_arrays[list_id] = ids
+        return ids
+
+    def _candidates(self, list_ids: np.ndarray) -> np.ndarray:
+        return np.concatenate([self._list_ids(int(l)) for l in list_ids] + [np.empty(0, dtype=np.int64)])
+
+    def search(self, queries: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+               allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k by cosine similarity
+
+        Args:
+            queries: Query vectors, shape (q, dim) or (dim,)
+            k: Neighbours per query
+            nprobe: Lists scanned per query (default: self.nprobe)
+            allowed: Boolean mask over ids; other vectors are never returned.
+                When the probed lists hold fewer than k allowed vectors, every
+                allowed vector is scored instead (optional)
+
+        Returns:
+            (similarities, ids), each (q, k), best first; missing slots have id -1
+        """
+        queries = normalize(np.atleast_2d(queries))
+        sims = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if self._size == 0:
+            return sims, ids
+
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = self._candidates(lists)
+            if allowed is not None:
+                candidates = candidates[allowed[candidates]]
+                if len(candidates) < k:
+                    candidates = np.flatnonzero(allowed[:self._size])
+            if len(candidates) == 0:
+                continue
+            scores = self._vectors[candidates] @ query
+            top = min(k, len(candidates))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            sims[row, :top] = scores[best]
+            ids[row, :top] = candidates[best]
+        return sims, ids
+
+    def similar_pairs(self, threshold: float, nprobe: Optional[int] = None,
+                      labels: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        All (approximately) found pairs of stored vectors with cosine similarity >= threshold
+
+        Vectors are queried list by list: the members of one list are scored
+        against the lists probed from that list's centroid in one matrix product.
+
+        Args:
+            threshold: Minimum cosine similarity
+            nprobe: Lists probed per list (default: self.nprobe)
+            labels: Only pair vectors with equal labels (optional)
+
+        Returns:
+            int64 array of shape (pairs, 2) with id_a < id_b, sorted
+        """
+        if self._size == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probes = np.argsort(-(self.centroids @ self.centroids.T), axis=1)[:, :nprobe]
+        found = []
+        for list_id in range(self.nlist):
+            members = self._list_ids(list_id)
+            if len(members) == 0:
+                continue
+            candidates = self._candidates(probes[list_id])
+            candidate_vectors = self._vectors[candidates]
+            for start in range(0, len(members), QUERY_CHUNK):
+                chunk = members[start:start + QUERY_CHUNK]
+                rows, cols = np.nonzero(self._vectors[chunk] @ candidate_vectors.T >= threshold)
+                a, b = chunk[rows], candidates[cols]
+                keep = a != b
+                if labels is not None:
+                    keep &= labels[a] == labels[b]
+                a, b = a[keep], b[keep]
+                found.append(np.stack([np.minimum(a, b), np.maximum(a, b)], axis=1))
+        pairs = np.concatenate(found) if found else np.empty((0, 2), dtype=np.int64)
+        return np.unique(pairs, axis=0) if len(pairs) else pairs
+
+    def save(self, directory: Path, start: int = 0):
+        """
+        Write the index to a directory
+
+        Args:
+            directory: Target directory (created if missing)
+            start: Number of vectors already saved there with the same
+                centroids; only vectors from this id on are appended
+                (0 rewrites everything)
+        """
+        if self.centroids is None:
+            raise ValueError("Cannot save an untrained index")
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        mode = "ab" if start else "wb"
+        if not start:
+            with open(directory / META_FILENAME, "w") as f:
+                json.dump({"dim": self.dim, "nlist": self.nlist, "nprobe": self.nprobe, "seed": self.seed}, f)
+            np.save(directory / CENTROIDS_FILENAME, self.centroids)
+        with open(directory / VECTORS_FILENAME, mode) as f:
+            f.write(np.ascontiguousarray(self._vectors[start:self._size]).tobytes())
+        with open(directory / LISTS_FILENAME, mode) as f:
+            f.write(self._assignments[start:self._size].tobytes())
+
+    @classmethod
+    def load(cls, directory: Path, limit: Optional[int] = None) -> "IVFIndex":
+        """
+        Read an index written by save()
+
+        Args:
+            directory: Index directory
+            limit: Keep at most this many vectors (e.g. the count other
+                files saved alongside agree on)
+
+        Returns:
+            The index; vectors and list files of different lengths (an
+            interrupted append) are cut to the shorter one
+        """
+        directory = Path(directory)
+        with open(directory / META_FILENAME) as f:
+            meta = json.load(f)
+        index = cls(meta["dim"], nlist=meta["nlist"], nprobe=meta["nprobe"], seed=meta["seed"])
+        index.centroids = np.load(directory / CENTROIDS_FILENAME)
+        index._lists = [[] for _ in range(index.nlist)]
+        vectors = np.fromfile(directory / VECTORS_FILENAME, dtype=np.float32)
+        vectors = vectors[:len(vectors) // index.dim * index.dim].reshape(-1, index.dim)
+        assignments = np.fromfile(directory / LISTS_FILENAME, dtype=np.int32)
+        count = min(len(vectors), len(assignments), len(vectors) if limit is None else limit)
+        index._file(vectors[:count], assignments[:count])
+        return index
+
+
+def near_duplicates(X: np.ndarray, threshold: float = 0.98, labels: Optional[np.ndarray] = None,
+                    nprobe: int = DEFAULT_NPROBE, seed: int = 42) -> Tuple[np.ndarray, dict]:
+    """
+    Flag near-duplicate rows of X, keeping the first of every close group
+
+    Rows are visited in order; a row is flagged when an earlier row that is
+    still kept has cosine similarity >= threshold with it (and, with labels,
+    the same label). No two kept rows found by the index are that close.
+
+    Args:
+        X: Embeddings, shape (n, dim)
+        threshold: Cosine similarity at or above which rows count as duplicates
+        labels: Only compare rows with the same label (optional)
+        nprobe: IVF lists probed per list
+        seed: k-means seed
+
+    Returns:
+        (duplicate_mask, stats) - stats has pairs, flagged and nlist
+    """
+    duplicate = np.zeros(len(X), dtype=bool)
+    if len(X) < 2:
+        return duplicate, {"pairs": 0, "flagged": 0, "nlist": 0}
+
+    index = IVFIndex(X.shape[1], nprobe=nprobe, seed=seed)
+    index.add(X)
+    pairs = index.similar_pairs(threshold, labels=None if labels is None else np.asarray(labels))
+    for a, b in pairs:
+        if not duplicate[a]:
+            duplicate[b] = True
+    return duplicate, {"pairs": int(len(pairs)), "flagged": int(duplicate.sum()), "nlist": index.nlist}
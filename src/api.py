@@ -13,10 +13,11 @@ Features:
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict
-import sys
+import asyncio
 import numpy as np
 import librosa
 import soundfile as sf
@@ -25,10 +26,41 @@ import tensorflow_hub as hub
 import json
 import os
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 import logging
 
+try:
+    from src.audio_store import ContentAddressedAudioStore, is_archive, iter_archive_entries, sniff_audio_format
+except ImportError:
+    from audio_store import ContentAddressedAudioStore, is_archive, iter_archive_entries, sniff_audio_format
+
+try:
+    from src.sample_manifest import SampleManifest, default_manifest_path
+except ImportError:
+    from sample_manifest import SampleManifest, default_manifest_path
+
+try:
+    from src.model_manifest import local_models_current
+except ImportError:
+    from model_manifest import local_models_current
+
+try:
+    from src.training_worker import TrainingWorker, TERMINAL_STATUSES
+except ImportError:
+    from training_worker import TrainingWorker, TERMINAL_STATUSES
+
+try:
+    from src.sound_search import SoundSearchIndex, SOURCES as SEARCH_SOURCES
+    from src.sample_manifest import ORIGINAL_SOURCES
+    from src.audio_store import hash_file
+except ImportError:
+    from sound_search import SoundSearchIndex, SOURCES as SEARCH_SOURCES
+    from sample_manifest import ORIGINAL_SOURCES
+    from audio_store import hash_file
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -56,7 +88,6 @@ CLASS_NAMES = []
 MODEL_METADATA = {}
 START_TIME = datetime.now()
 PREDICTION_COUNT = 0
-RETRAINING_IN_PROGRESS = False
 
 # Paths (adjust these based on your deployment)
 BASE_DIR = Path(__file__).parent
@@ -72,6 +103,29 @@ for class_dir in ["gun_shot", "dog_bark", "engine_idling", "clips"]:
     (AUGMENTED_AUDIO_DIR / class_dir).mkdir(parents=True, exist_ok=True)
     (EXTRACTED_AUDIO_DIR / class_dir).mkdir(parents=True, exist_ok=True)
 
+# Content-addressed store for uploaded training audio (deduplicates re-uploads);
+# new files are recorded in the sample manifest used for retraining triggers
+SAMPLE_MANIFEST = SampleManifest(default_manifest_path(EXTRACTED_AUDIO_DIR))
+AUDIO_STORE = ContentAddressedAudioStore(EXTRACTED_AUDIO_DIR, manifest=SAMPLE_MANIFEST)
+
+# Bulk upload tuning
+BULK_UPLOAD_WORKERS = int(os.getenv("BULK_UPLOAD_WORKERS", min(8, (os.cpu_count() or 2) * 2)))
+
+# Serve this model version (manifest "version"); unset = whatever verifies locally
+MODEL_VERSION = os.getenv("MODEL_VERSION") or None
+
+# Retraining worker: start it with the API so YAMNet is already loaded for the first job
+TRAINING_WORKER_AUTOSTART = os.getenv("TRAINING_WORKER_AUTOSTART", "true").lower() == "true"
+SSE_POLL_SECONDS = 0.5
+SSE_KEEPALIVE_SECONDS = 15
+
+# Similar-sound search over training originals and (optionally) every predicted clip
+SEARCH_INDEX_DIR = Path(os.getenv("SEARCH_INDEX_DIR", str(BASE_DIR / "search_index")))
+SEARCH_INDEX_PREDICTIONS = os.getenv("SEARCH_INDEX_PREDICTIONS", "true").lower() == "true"
+SEARCH_NPROBE = int(os.getenv("SEARCH_NPROBE", "8"))
+SEARCH_MAX_K = 100
+SEARCH_INDEX = SoundSearchIndex(SEARCH_INDEX_DIR, nprobe=SEARCH_NPROBE)
+
 
 # ============================================================================
 # STARTUP: DOWNLOAD MODEL FROM S3
@@ -172,50 +226,48 @@ async def startup_event():
     try:
         logger.info("Starting up API...")
 
-        # Define required files
-        required_files = [
-            "yamnet_classifier_v2.keras",
-            "class_names.json",
-            "model_metadata.json",
-            "performance_metrics.json",
-            "training_history.pkl",
-        ]
-
-        # Check if any required file is missing
-        missing_files = []
-        for filename in required_files:
-            file_path = MODELS_DIR / filename
-            if not file_path.exists():
-                missing_files.append(filename)
-
-        if missing_files:
-            logger.info(f"Missing files: {missing_files}. Downloading from S3...")
+        # Serve local artifacts if their manifest verifies; otherwise fetch what changed
+        if local_models_current(MODELS_DIR, MODEL_VERSION):
+            logger.info("Local model artifacts are current, skipping storage sync")
+        else:
+            logger.info("Model artifacts missing or stale. Syncing from storage...")
             try:
-                from src.s3_storage import S3Storage
-                s3 = S3Storage()
-                # Assuming your S3Storage class has a method to download the entire models folder
-                # Or modify it to download specific files
-                success = s3.download_model(str(MODELS_DIR))
+                from src.storage import get_storage
+                storage = get_storage()
+                success = storage.sync_model(str(MODELS_DIR))
 
                 if success:
-                    logger.info("✓ Model and metrics downloaded from S3")
+                    logger.info(f"✓ Model and metrics synced from {storage.name}")
                 else:
-                    logger.error("✗ Failed to download model and metrics from S3")
+                    logger.error(f"✗ Failed to sync model and metrics from {storage.name}")
             except Exception as e:
-                logger.error(f"Error downloading model and metrics from S3: {e}")
+                logger.error(f"Error downloading model and metrics from storage: {e}")
                 import traceback
                 logger.error(traceback.format_exc())
-        else:
-            logger.info("All required files found locally, skipping download")
 
         # Load model artifacts
         load_model_artifacts()
+        
+        # Embed training originals missing from the search index (in the background)
+        start_search_indexing()
+        
+        # Hash pre-existing training audio into the dedup indexes (in the background)
+        start_audio_store_indexing()
+        
+        if TRAINING_WORKER_AUTOSTART:
+            TRAINING_WORKER.start()
 
     except Exception as e:
         logger.error(f"Startup error: {e}", exc_info=True)
         logger.warning("API starting with limited functionality")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the retraining worker process"""
+    TRAINING_WORKER.stop()
+
+
 # ============================================================================
 # PYDANTIC MODELS
 # ============================================================================
@@ -241,6 +293,15 @@ class ModelStatusResponse(BaseModel):
     classes: List[str]
 
 
+class SearchResponse(BaseModel):
+    success: bool
+    matches: List[dict]
+    indexed_clips: int
+    embedding_time: float
+    search_time: float
+    timestamp: str
+
+
 class RetrainingRequest(BaseModel):
     trigger_reason: Optional[str] = "Manual trigger"
     min_new_samples: Optional[int] = 100
@@ -250,6 +311,7 @@ class RetrainingResponse(BaseModel):
     success: bool
     message: str
     status: str
+    job_id: Optional[str] = None
 
 
 # ============================================================================
@@ -293,6 +355,83 @@ def extract_yamnet_embeddings(audio_path: Path, max_duration: int = 4):
     return embedding_mean
 
 
+_search_indexing_lock = threading.Lock()
+
+
+def index_training_clips():
+    """Add training originals recorded in the sample manifest to the search index"""
+    if not _search_indexing_lock.acquire(blocking=False):
+        return  # a pass is already running
+    try:
+        samples = SAMPLE_MANIFEST.samples(sources=ORIGINAL_SOURCES)
+        pending = sum(1 for row in samples if row["sha256"] not in SEARCH_INDEX)
+        if pending:
+            logger.info(f"Search index: embedding {pending} training clip(s)...")
+        stats = SEARCH_INDEX.index_samples(samples, extract_yamnet_embeddings)
+        logger.info(f"✓ Search index: {stats['indexed']} added, {stats['failed']} failed, "
+                    f"{len(SEARCH_INDEX)} clips indexed")
+    except Exception as e:
+        logger.error(f"Search indexing failed: {e}", exc_info=True)
+    finally:
+        _search_indexing_lock.release()
+
+
+def start_search_indexing():
+    """Run index_training_clips in a daemon thread"""
+    threading.Thread(target=index_training_clips, name="search-indexing", daemon=True).start()
+
+
+def build_audio_store_indexes():
+    """Adopt training audio stored before the dedup index into AUDIO_STORE"""
+    try:
+        added = AUDIO_STORE.build_indexes()
+        if any(added.values()):
+            logger.info(f"Audio store indexes built: {added}")
+    except Exception as e:
+        logger.error(f"Audio store indexing failed: {e}", exc_info=True)
+
+
+def start_audio_store_indexing():
+    """Run build_audio_store_indexes in a daemon thread"""
+    threading.Thread(target=build_audio_store_indexes, name="audio-store-indexing", daemon=True).start()
+
+
+_search_rebuild_lock = threading.Lock()
+
+
+def rebuild_search_index():
+    """Re-cluster the search index once inserts have outgrown its lists"""
+    if not _search_rebuild_lock.acquire(blocking=False):
+        return  # a rebuild is already running
+    try:
+        if SEARCH_INDEX.needs_rebuild():
+            SEARCH_INDEX.rebuild()
+    except Exception as e:
+        logger.error(f"Search index rebuild failed: {e}", exc_info=True)
+    finally:
+        _search_rebuild_lock.release()
+
+
+def index_prediction_clip(temp_path: Path, embedding: np.ndarray, item: dict):
+    """
+    Add a prediction clip to the search index, then delete its temp file
+    
+    Runs as a background task after the response is sent; a failure here
+    never affects the prediction. Re-clustering, when due, runs in its own
+    thread.
+    """
+    try:
+        clip_digest = hash_file(temp_path)
+        if clip_digest not in SEARCH_INDEX:
+            SEARCH_INDEX.add(embedding, [{**item, "key": clip_digest}])
+    except Exception as e:
+        logger.warning(f"Could not add prediction to the search index: {e}")
+    finally:
+        temp_path.unlink(missing_ok=True)
+    if SEARCH_INDEX.needs_rebuild():
+        threading.Thread(target=rebuild_search_index, name="search-rebuild", daemon=True).start()
+
+
 def get_uptime():
     """Calculate API uptime"""
     uptime = datetime.now() - START_TIME
@@ -316,9 +455,13 @@ async def root():
         "status": "operational",
         "endpoints": {
             "predict": "/predict",
+            "search": "/search",
             "status": "/status",
             "retrain": "/retrain",
+            "retrain_status": "/retrain/{job_id}",
+            "retrain_events": "/retrain/{job_id}/events",
             "upload": "/upload",
+            "upload_bulk": "/upload/bulk",
             "metrics": "/metrics"
         }
     }
@@ -400,10 +543,13 @@ async def get_training_history():
 
 
 @app.post("/predict", response_model=PredictionResponse)
-async def predict(file: UploadFile = File(...)):
+async def predict(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
     Predict wildlife sound class from uploaded audio file
     
+    The clip is added to the similar-sound search index in a background
+    task after the response is sent.
+    
     Args:
         file: Audio file (.wav or .mp3)
     
@@ -426,7 +572,7 @@ async def predict(file: UploadFile = File(...)):
     
     try:
         # Save uploaded file temporarily
-        temp_path = UPLOAD_DIR / f"temp_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
+        temp_path = UPLOAD_DIR / f"temp_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{Path(file.filename).name}"
         with open(temp_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
         
@@ -449,8 +595,14 @@ async def predict(file: UploadFile = File(...)):
             for i in range(len(CLASS_NAMES))
         }
         
-        # Clean up temp file
-        temp_path.unlink()
+        # Make the clip findable by /search (hashed, inserted and cleaned up after the response)
+        if SEARCH_INDEX_PREDICTIONS:
+            background_tasks.add_task(index_prediction_clip, temp_path, embedding, {
+                "source": "prediction", "label": predicted_class, "confidence": round(confidence, 4),
+                "name": file.filename
+            })
+        else:
+            temp_path.unlink()
         
         # Update prediction count
         PREDICTION_COUNT += 1
@@ -475,6 +627,59 @@ async def predict(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 
+@app.post("/search", response_model=SearchResponse)
+async def search_similar_sounds(file: UploadFile = File(...), k: int = 10, source: Optional[str] = None):
+    """
+    Find stored clips that sound like the uploaded one
+    
+    Args:
+        file: Audio file (.wav, .mp3, .ogg or .flac)
+        k: Number of matches (1-100)
+        source: Only "training" or "prediction" clips (default: both)
+    
+    Returns:
+        Matches (best first) with label, source, file name and cosine similarity
+    """
+    if not file.filename.endswith(('.wav', '.mp3', '.ogg', '.flac')):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid file format. Supported: .wav, .mp3, .ogg, .flac"
+        )
+    if not 1 <= k <= SEARCH_MAX_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {SEARCH_MAX_K}")
+    if source is not None and source not in SEARCH_SOURCES:
+        raise HTTPException(status_code=400, detail=f"source must be one of: {', '.join(SEARCH_SOURCES)}")
+    
+    temp_path = UPLOAD_DIR / f"search_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{Path(file.filename).name}"
+    try:
+        with open(temp_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        
+        start_time = datetime.now()
+        embedding = extract_yamnet_embeddings(temp_path)
+        embedding_time = (datetime.now() - start_time).total_seconds()
+        
+        start_time = datetime.now()
+        matches = SEARCH_INDEX.search(embedding, k=k, source=source)
+        search_time = (datetime.now() - start_time).total_seconds()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+    finally:
+        temp_path.unlink(missing_ok=True)
+    
+    return SearchResponse(
+        success=True,
+        matches=matches,
+        indexed_clips=len(SEARCH_INDEX),
+        embedding_time=embedding_time,
+        search_time=search_time,
+        timestamp=datetime.now().isoformat()
+    )
+
+
 @app.post("/upload")
 async def upload_training_data(
     file: UploadFile = File(...),
@@ -491,128 +696,317 @@ async def upload_training_data(
         )
     
     try:
-        # Create class directory if needed
-        class_dir = EXTRACTED_AUDIO_DIR / class_name
-        class_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Save file to extracted_audio (originals)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        # Sanitize filename to prevent directory traversal or spaces
-        safe_filename = Path(file.filename).name
-        filename = f"{timestamp}_{safe_filename}"
-        file_path = class_dir / filename
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        logger.info(f"File saved to extracted_audio: {file_path}")
-        
-        # Upload to S3 if configured
-        s3_uploaded = False
-        try:
-            from src.s3_storage import S3Storage
-            s3 = S3Storage()
-            # Upload single file to S3
-            s3_key = f"extracted_audio/{class_name}/{filename}"
-            s3_uploaded = s3.upload_file(str(file_path), s3_key)
-            if s3_uploaded:
-                logger.info(f"File uploaded to S3: {s3_key}")
-        except Exception as s3_error:
-            # We catch specific S3 errors so the main upload doesn't fail
-            logger.warning(f"S3 upload failed (continuing anyway): {s3_error}")
-        
+        # Hashing, the store lock and the storage upload all block: keep them off the event loop
+        return await run_in_threadpool(_store_upload, file.file, file.filename, class_name)
+    except Exception as e:
+        logger.error(f"Upload error: {e}")
+        # Fixed: Removed the duplicate raise line
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+
+def _store_upload(fileobj, filename: str, class_name: str) -> dict:
+    """Store one uploaded file and push it to the storage backend; returns the /upload response"""
+    # Hash while streaming to disk; identical bytes are stored only once
+    stored = AUDIO_STORE.save_stream(fileobj, class_name, filename)
+    file_path = stored["path"]
+    
+    if not stored["is_new"]:
+        # Duplicate: skip S3 so it is never re-synced, augmented or embedded
+        logger.info(f"Duplicate upload skipped: {stored['original_filename']} -> {file_path}")
         return {
             "success": True,
-            "message": "File uploaded successfully",
+            "message": "Duplicate file already in training data, skipped",
             "file_path": str(file_path),
             "class": class_name,
-            "s3_uploaded": s3_uploaded,
+            "sha256": stored["sha256"],
+            "is_new": False,
+            "s3_uploaded": False,
             "timestamp": datetime.now().isoformat()
         }
+    
+    logger.info(f"File saved to extracted_audio: {file_path}")
+    
+    # Upload to the configured storage backend
+    s3_uploaded = False
+    try:
+        from src.storage import get_storage
+        storage = get_storage()
+        # Upload single file to storage
+        s3_key = f"extracted_audio/{class_name}/{file_path.name}"
+        s3_uploaded = storage.upload_file(str(file_path), s3_key)
+        if s3_uploaded:
+            logger.info(f"File uploaded to {storage.name}: {s3_key}")
+    except Exception as s3_error:
+        # We catch storage errors so the main upload doesn't fail
+        logger.warning(f"Storage upload failed (continuing anyway): {s3_error}")
+    
+    return {
+        "success": True,
+        "message": "File uploaded successfully",
+        "file_path": str(file_path),
+        "class": class_name,
+        "sha256": stored["sha256"],
+        "is_new": True,
+        "s3_uploaded": s3_uploaded,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def _store_training_entry(fileobj, filename: str, class_name: str) -> dict:
+    """Validate one bulk-upload entry and store it; returns a per-file report row"""
+    report = {"filename": filename, "class": class_name}
+    try:
+        if class_name not in CLASS_NAMES and class_name != "unknown":
+            return {**report, "status": "rejected", "error": f"Invalid class name. Valid classes: {CLASS_NAMES}"}
         
+        if not filename.lower().endswith(('.wav', '.mp3', '.ogg', '.flac')):
+            return {**report, "status": "rejected", "error": "Unsupported file type"}
+        
+        head = fileobj.read(12)
+        fileobj.seek(0)
+        if sniff_audio_format(head) is None:
+            return {**report, "status": "rejected", "error": "Not a recognised audio file"}
+        
+        stored = AUDIO_STORE.save_stream(fileobj, class_name, filename)
+        return {
+            **report,
+            "status": "stored" if stored["is_new"] else "duplicate",
+            "sha256": stored["sha256"],
+            "is_new": stored["is_new"],
+            "file_path": str(stored["path"])
+        }
     except Exception as e:
-        logger.error(f"Upload error: {e}")
-        # Fixed: Removed the duplicate raise line
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+        logger.error(f"Bulk upload error for {filename}: {e}")
+        return {**report, "status": "error", "error": str(e)}
+    finally:
+        fileobj.close()
 
 
-@app.post("/retrain", response_model=RetrainingResponse)
-async def trigger_retraining(
-    request: RetrainingRequest,
-    background_tasks: BackgroundTasks
+def _entry_class(member_name: str, default_class: str) -> str:
+    """Use an archive member's parent folder as its class when it names a known class"""
+    parent = Path(member_name).parent.name
+    return parent if parent in CLASS_NAMES else default_class
+
+
+def _ingest_bulk_upload(files: List[UploadFile], class_name: str) -> List[dict]:
+    """
+    Stream archives and plain files into the audio store in parallel
+    
+    Archive members are extracted one at a time on this thread and handed
+    to a bounded worker pool, so at most ~2x BULK_UPLOAD_WORKERS entries are
+    spooled at once regardless of archive size.
+    """
+    in_flight = threading.BoundedSemaphore(BULK_UPLOAD_WORKERS * 2)
+    futures = []
+    report = []
+    
+    def submit(executor, fileobj, filename, entry_class):
+        in_flight.acquire()
+        future = executor.submit(_store_training_entry, fileobj, filename, entry_class)
+        future.add_done_callback(lambda _: in_flight.release())
+        futures.append(future)
+    
+    with ThreadPoolExecutor(max_workers=BULK_UPLOAD_WORKERS) as executor:
+        for upload in files:
+            filename = Path(upload.filename or "upload").name
+            if is_archive(filename):
+                try:
+                    for member_name, member_file, error in iter_archive_entries(upload.file, filename):
+                        entry_class = _entry_class(member_name, class_name)
+                        if member_file is None:
+                            report.append({"filename": member_name, "class": entry_class,
+                                           "status": "rejected", "error": error})
+                            continue
+                        submit(executor, member_file, Path(member_name).name, entry_class)
+                except Exception as e:
+                    logger.error(f"Could not read archive {filename}: {e}")
+                    report.append({"filename": filename, "class": class_name,
+                                   "status": "error", "error": f"Unreadable archive: {e}"})
+            else:
+                submit(executor, upload.file, filename, class_name)
+        
+        report.extend(future.result() for future in futures)
+    
+    return report
+
+
+def sync_uploads_to_s3(files: List[tuple]):
+    """Background task: push newly stored uploads to storage in one pooled batch"""
+    try:
+        from src.storage import get_storage
+        s3 = get_storage()
+        results = s3.upload_files(files)
+        failed = [key for key, ok in results.items() if not ok]
+        if failed:
+            logger.warning(f"S3 batch sync: {len(failed)} of {len(files)} uploads failed")
+    except Exception as s3_error:
+        logger.warning(f"S3 batch sync failed (files remain local): {s3_error}")
+
+
+@app.post("/upload/bulk")
+async def upload_training_data_bulk(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    class_name: str = Form("unknown")
 ):
     """
-    Trigger model retraining
+    Upload many training files at once
     
-    Args:
-        request: Retraining parameters
-        background_tasks: FastAPI background tasks
+    Accepts any mix of audio files and .zip/.tar(.gz) archives. Archive
+    members inside a folder named after a known class are labelled with that
+    class; everything else uses class_name. New files are synced to S3 in a
+    single background batch.
     
     Returns:
-        Retraining status
+        Per-file report plus summary counts
     """
-    global RETRAINING_IN_PROGRESS
+    report = await run_in_threadpool(_ingest_bulk_upload, files, class_name)
+    
+    new_files = [
+        (row["file_path"], f"extracted_audio/{row['class']}/{Path(row['file_path']).name}")
+        for row in report if row["status"] == "stored"
+    ]
+    if new_files:
+        background_tasks.add_task(sync_uploads_to_s3, new_files)
+    
+    summary = {status: sum(1 for row in report if row["status"] == status)
+               for status in ("stored", "duplicate", "rejected", "error")}
+    logger.info(f"Bulk upload: {summary}")
+    
+    return {
+        "success": summary["error"] == 0,
+        "message": f"Processed {len(report)} file(s)",
+        "summary": summary,
+        "s3_sync": "queued" if new_files else "skipped",
+        "files": report,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def reload_classifier():
+    """Load the freshly trained classifier (called by the worker listener after a job completes)"""
+    global MODEL
     
-    if RETRAINING_IN_PROGRESS:
-        return RetrainingResponse(
-            success=False,
-            message="Retraining already in progress",
-            status="in_progress"
+    model_path = MODELS_DIR / "yamnet_classifier_v2.keras"
+    if model_path.exists():
+        MODEL = tf.keras.models.load_model(model_path, compile=False)
+        MODEL.compile(
+            optimizer='adam',
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy']
         )
+        logger.info("✓ New model loaded successfully")
     
-    # Start retraining in background
-    def run_retraining():
-        global RETRAINING_IN_PROGRESS, MODEL
-        RETRAINING_IN_PROGRESS = True
-        
-        try:
-            import subprocess
-            
-            logger.info(f"Starting retraining: {request.trigger_reason}")
-            
-            # Run the retraining script from the correct path
-            script_path = Path("/app/scripts/retrain_model.py")
-            result = subprocess.run(
-                [sys.executable, str(script_path)],
-                capture_output=True,
-                text=True,
-                timeout=3600  # 1 hour timeout
-            )
-            
-            if result.returncode == 0:
-                logger.info("✓ Retraining completed successfully")
-                logger.info(result.stdout)
-                
-                # Reload the model
-                model_path = MODELS_DIR / "yamnet_classifier_v2.keras"
-                if model_path.exists():
-                    MODEL = tf.keras.models.load_model(model_path, compile=False)
-                    MODEL.compile(
-                        optimizer='adam',
-                        loss='sparse_categorical_crossentropy',
-                        metrics=['accuracy']
-                    )
-                    logger.info("✓ New model loaded successfully")
-            else:
-                logger.error(f"Retraining failed: {result.stderr}")
-                
-        except Exception as e:
-            logger.error(f"Retraining error: {e}")
-        finally:
-            RETRAINING_IN_PROGRESS = False
+    # Pick up the originals this run trained on
+    start_search_indexing()
+
+
+# Long-lived retraining process (keeps TensorFlow and YAMNet loaded between jobs)
+TRAINING_WORKER = TrainingWorker(on_model_updated=reload_classifier)
+
+
+@app.post("/retrain", response_model=RetrainingResponse)
+async def trigger_retraining(request: RetrainingRequest):
+    """
+    Queue a model retraining job
     
-    # Add to background tasks
-    background_tasks.add_task(run_retraining)
+    Jobs run one at a time in the persistent training worker. Follow
+    progress at /retrain/{job_id} or stream it from /retrain/{job_id}/events.
     
-    logger.info(f"Retraining triggered: {request.trigger_reason}")
+    Args:
+        request: Retraining parameters
+    
+    Returns:
+        Retraining status with the job id
+    """
+    job = TRAINING_WORKER.submit(
+        trigger_reason=request.trigger_reason,
+        min_new_samples=request.min_new_samples
+    )
+    
+    logger.info(f"Retraining queued ({job['job_id']}): {request.trigger_reason}")
     
     return RetrainingResponse(
         success=True,
-        message="Retraining started in background. Check logs for progress.",
-        status="running"
+        message=f"Retraining job {job['job_id']} {job['status']}. "
+                f"Follow progress at /retrain/{job['job_id']}/events",
+        status=job["status"],
+        job_id=job["job_id"]
     )
 
 
+@app.get("/retrain/{job_id}")
+async def get_retraining_job(job_id: str):
+    """
+    Get a retraining job's status
+    
+    Returns:
+        Job record: status, stage, percent, eta_seconds, message, result/error
+    """
+    job = TRAINING_WORKER.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown retraining job '{job_id}'")
+    job["worker_ready"] = TRAINING_WORKER.ready
+    return job
+
+
+@app.get("/retrain/{job_id}/events")
+async def stream_retraining_events(job_id: str, after: int = 0):
+    """
+    Stream a retraining job's progress as Server-Sent Events
+    
+    Each event is a JSON object with a type (queued, started, progress,
+    completed, skipped, failed, cancelled) and, for progress, the stage,
+    percent and eta_seconds. The stream ends when the job finishes.
+    
+    Args:
+        job_id: Retraining job id
+        after: Only send events with a sequence number above this (resume)
+    """
+    if TRAINING_WORKER.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown retraining job '{job_id}'")
+    
+    async def event_stream():
+        last_seq = after
+        idle = 0.0
+        while True:
+            events = TRAINING_WORKER.events_since(job_id, last_seq)
+            for event in events:
+                last_seq = event["seq"]
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            
+            if not events and TRAINING_WORKER.get(job_id)["status"] in TERMINAL_STATUSES:
+                break
+            
+            idle = 0.0 if events else idle + SSE_POLL_SECONDS
+            if idle >= SSE_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keepalive\n\n"
+            await asyncio.sleep(SSE_POLL_SECONDS)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/retrain/{job_id}/cancel")
+async def cancel_retraining_job(job_id: str):
+    """
+    Cancel a queued or running retraining job
+    
+    Queued jobs are dropped immediately; a running job stops at its next
+    progress check and leaves the current model in place.
+    """
+    job = TRAINING_WORKER.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown retraining job '{job_id}'")
+    if job["status"] in TERMINAL_STATUSES and job["status"] != "cancelled":
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' already {job['status']}")
+    return job
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for container orchestration"""
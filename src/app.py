@@ -13,6 +13,7 @@ Features:
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import numpy as np
 import plotly.express as px
@@ -21,8 +22,24 @@ from datetime import datetime
 import json
 import time
 import os
+import io
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from math import gcd
 from pathlib import Path
 
+# Optional audio stack for client-side transcoding before prediction
+try:
+    import soundfile as sf
+    TRANSCODE_AVAILABLE = True
+except ImportError:
+    TRANSCODE_AVAILABLE = False
+
+try:
+    from scipy.signal import resample_poly
+except ImportError:
+    resample_poly = None
+
 # Page configuration
 st.set_page_config(
     page_title="EcoSight Wildlife Monitoring",
@@ -34,6 +51,19 @@ st.set_page_config(
 # API Configuration - Use environment variable or default to localhost
 API_URL = os.getenv("API_URL", "http://localhost:8000")
 
+# Client tuning: parallel uploads, keep-alive pool size and how long API responses are cached (seconds)
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "8"))
+UPLOAD_MAX_RETRIES = 3
+UPLOAD_BACKOFF_SECONDS = 0.5
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+HTTP_POOL_SIZE = max(16, UPLOAD_WORKERS)
+
+# What the API analyses per clip: first 4 s, 16 kHz mono (see extract_yamnet_embeddings)
+PREDICTION_SAMPLE_RATE = 16000
+PREDICTION_MAX_DURATION = 4
+STATUS_CACHE_TTL = int(os.getenv("STATUS_CACHE_TTL", "10"))
+METRICS_CACHE_TTL = int(os.getenv("METRICS_CACHE_TTL", "300"))
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -79,14 +109,50 @@ st.markdown("""
 # HELPER FUNCTIONS
 # ============================================================================
 
+@st.cache_resource
+def get_http_session():
+    """Shared keep-alive HTTP session, reused across reruns and users"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _get_json(endpoint):
+    """GET an API endpoint and return its JSON body (None on non-200)"""
+    response = get_http_session().get(f"{API_URL}{endpoint}", timeout=5)
+    if response.status_code == 200:
+        return response.json()
+    return None
+
+
+@st.cache_data(ttl=STATUS_CACHE_TTL, show_spinner=False)
+def _fetch_status():
+    return _get_json("/status")
+
+
+@st.cache_data(ttl=METRICS_CACHE_TTL, show_spinner=False)
+def _fetch_metrics():
+    return _get_json("/metrics")
+
+
+@st.cache_data(ttl=METRICS_CACHE_TTL, show_spinner=False)
+def _fetch_training_history():
+    return _get_json("/training-history")
+
+
+def refresh_api_data():
+    """Drop cached API responses so the next call hits the API"""
+    _fetch_status.clear()
+    _fetch_metrics.clear()
+    _fetch_training_history.clear()
+
+
 def get_model_status():
     """Fetch model status from API"""
     try:
-        response = requests.get(f"{API_URL}/status", timeout=5)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return None
+        return _fetch_status()
     except Exception as e:
         st.error(f"Failed to connect to API: {e}")
         return None
@@ -95,11 +161,7 @@ def get_model_status():
 def get_metrics():
     """Fetch performance metrics from API"""
     try:
-        response = requests.get(f"{API_URL}/metrics", timeout=5)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return None
+        return _fetch_metrics()
     except Exception as e:
         return None
 
@@ -107,20 +169,58 @@ def get_metrics():
 def get_training_history():
     """Fetch training history including learning curves"""
     try:
-        response = requests.get(f"{API_URL}/training-history", timeout=5)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return None
+        return _fetch_training_history()
     except Exception as e:
         return None
 
 
+def prepare_clip_for_prediction(file):
+    """
+    Transcode an uploaded clip to exactly what the API will analyse
+    
+    Decodes only the first PREDICTION_MAX_DURATION seconds, downmixes to
+    mono, resamples to 16 kHz and encodes as 16-bit FLAC.
+    
+    Returns:
+        (filename, flac_bytes, mime) tuple, or None to send the original file
+    """
+    if not TRANSCODE_AVAILABLE:
+        return None
+    
+    try:
+        with sf.SoundFile(io.BytesIO(file.getvalue())) as f:
+            sr = f.samplerate
+            max_frames = int(PREDICTION_MAX_DURATION * sr)
+            frames = min(f.frames, max_frames) if f.frames > 0 else max_frames
+            audio = f.read(frames, dtype='float32', always_2d=True)
+        
+        # Downmix to mono
+        audio = audio.mean(axis=1)
+        
+        # Resample to 16 kHz (polyphase when SciPy is available, linear otherwise)
+        if sr != PREDICTION_SAMPLE_RATE and len(audio) > 0:
+            if resample_poly is not None:
+                g = gcd(sr, PREDICTION_SAMPLE_RATE)
+                audio = resample_poly(audio, PREDICTION_SAMPLE_RATE // g, sr // g)
+            else:
+                n_out = int(round(len(audio) * PREDICTION_SAMPLE_RATE / sr))
+                audio = np.interp(
+                    np.linspace(0, len(audio) - 1, n_out), np.arange(len(audio)), audio
+                )
+        
+        buffer = io.BytesIO()
+        sf.write(buffer, np.clip(audio, -1.0, 1.0), PREDICTION_SAMPLE_RATE, format='FLAC', subtype='PCM_16')
+        return (f"{Path(file.name).stem}.flac", buffer.getvalue(), "audio/flac")
+    except Exception:
+        # Formats libsndfile cannot decode are sent untouched
+        return None
+
+
 def predict_audio(file):
     """Send audio file to API for prediction"""
     try:
         files = {"file": file}
-        response = requests.post(f"{API_URL}/predict", files=files, timeout=30)
+        response = get_http_session().post(f"{API_URL}/predict", files=files, timeout=30)
         if response.status_code == 200:
             return response.json()
         else:
@@ -129,30 +229,48 @@ def predict_audio(file):
         return {"error": str(e)}
 
 
-def upload_training_data(file, class_name):
-    """Upload new training data to API"""
-    try:
-        files = {"file": file}
-        data = {"class_name": class_name}
-        response = requests.post(
-            f"{API_URL}/upload",
-            files=files,
-            data=data,
-            timeout=30
-        )
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return {"error": f"Upload failed with status {response.status_code}"}
-    except Exception as e:
-        return {"error": str(e)}
+def upload_training_data(file, class_name, session=None, max_retries=UPLOAD_MAX_RETRIES):
+    """
+    Upload new training data to API
+    
+    Safe to call from worker threads when a session is passed in (no
+    Streamlit calls). Connection errors, timeouts and 408/429/5xx responses
+    are retried with exponential backoff.
+    """
+    session = session or get_http_session()
+    # Send an immutable (name, bytes) pair so retries and threads never share a file pointer
+    payload = (file.name, file.getvalue()) if hasattr(file, "getvalue") else file
+    data = {"class_name": class_name}
+    
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.post(
+                f"{API_URL}/upload",
+                files={"file": payload},
+                data=data,
+                timeout=30
+            )
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code not in TRANSIENT_STATUS_CODES or attempt == max_retries:
+                return {"error": f"Upload failed with status {response.status_code}"}
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries:
+                return {"error": str(e)}
+        except Exception as e:
+            return {"error": str(e)}
+        
+        # Exponential backoff with jitter before the next attempt
+        time.sleep(UPLOAD_BACKOFF_SECONDS * (2 ** attempt) + random.uniform(0, UPLOAD_BACKOFF_SECONDS))
+    
+    return {"error": "Upload failed after retries"}
 
 
 def trigger_retraining(reason="Manual trigger"):
     """Trigger model retraining via API"""
     try:
         data = {"trigger_reason": reason}
-        response = requests.post(
+        response = get_http_session().post(
             f"{API_URL}/retrain",
             json=data,
             timeout=10
@@ -165,6 +283,196 @@ def trigger_retraining(reason="Manual trigger"):
         return {"error": str(e)}
 
 
+# ============================================================================
+# CACHED VIEW BUILDERS
+# ============================================================================
+# Keyed on the API payload, so reruns reuse the DataFrames and figures until
+# the underlying data changes.
+
+@st.cache_data(show_spinner=False)
+def build_metrics_view(per_class_metrics):
+    """Build the per-class metrics table and grouped bar chart"""
+    metrics_data = []
+    for class_name, class_metrics in per_class_metrics.items():
+        metrics_data.append({
+            "Class": class_name,
+            "Precision": class_metrics.get("precision", 0),
+            "Recall": class_metrics.get("recall", 0),
+            "F1-Score": class_metrics.get("f1_score", 0),
+            "Support": class_metrics.get("support", 0)
+        })
+    
+    df_metrics = pd.DataFrame(metrics_data)
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Bar(
+        name='Precision',
+        x=df_metrics['Class'],
+        y=df_metrics['Precision'],
+        marker_color='lightblue'
+    ))
+    
+    fig.add_trace(go.Bar(
+        name='Recall',
+        x=df_metrics['Class'],
+        y=df_metrics['Recall'],
+        marker_color='lightgreen'
+    ))
+    
+    fig.add_trace(go.Bar(
+        name='F1-Score',
+        x=df_metrics['Class'],
+        y=df_metrics['F1-Score'],
+        marker_color='lightcoral'
+    ))
+    
+    fig.update_layout(
+        barmode='group',
+        title='Performance Metrics by Class',
+        xaxis_title='Class',
+        yaxis_title='Score',
+        height=400
+    )
+    
+    return df_metrics, fig
+
+
+def _curve_figure(history, series, title, yaxis_title):
+    """Line chart of training/validation curves; series is [(key, name, color)]"""
+    fig = go.Figure()
+    
+    for key, name, color in series:
+        if key in history and history[key]:
+            fig.add_trace(go.Scatter(
+                x=history["epochs"],
+                y=history[key],
+                mode='lines+markers',
+                name=name,
+                line=dict(color=color, width=3),
+                marker=dict(size=6)
+            ))
+    
+    fig.update_layout(
+        title=title,
+        xaxis_title='Epoch',
+        yaxis_title=yaxis_title,
+        height=450,
+        hovermode='x unified',
+        template='plotly_white',
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+    
+    return fig
+
+
+@st.cache_data(show_spinner=False)
+def build_learning_curve_figures(history):
+    """Build the loss and accuracy learning-curve figures"""
+    fig_loss = _curve_figure(
+        history,
+        [("loss", "Training Loss", "#FF6B6B"), ("val_loss", "Validation Loss", "#4ECDC4")],
+        'Model Loss Over Epochs', 'Loss'
+    )
+    fig_acc = _curve_figure(
+        history,
+        [("accuracy", "Training Accuracy", "#95E1D3"), ("val_accuracy", "Validation Accuracy", "#F38181")],
+        'Model Accuracy Over Epochs', 'Accuracy'
+    )
+    return fig_loss, fig_acc
+
+
+@st.cache_data(show_spinner=False)
+def build_sessions_view(sessions):
+    """Build the retraining sessions table and accuracy trend (None for one session)"""
+    session_data = []
+    for idx, session in enumerate(sessions, 1):
+        session_data.append({
+            "Session": idx,
+            "Date": session.get("datetime", "N/A"),
+            "Accuracy": f"{session.get('test_accuracy', 0)*100:.2f}%",
+            "Loss": f"{session.get('test_loss', 0):.4f}",
+            "Samples": session.get('total_samples', 0),
+            "Epochs": session.get('epochs_trained', 0),
+            "Classes": session.get('num_classes', 0)
+        })
+    
+    df_sessions = pd.DataFrame(session_data)
+    
+    fig_trend = None
+    if len(sessions) > 1:
+        fig_trend = go.Figure()
+        
+        fig_trend.add_trace(go.Scatter(
+            x=[s.get("datetime", f"Session {i}") for i, s in enumerate(sessions, 1)],
+            y=[s.get("test_accuracy", 0) * 100 for s in sessions],
+            mode='lines+markers',
+            name='Test Accuracy',
+            line=dict(color='#2E7D32', width=3),
+            marker=dict(size=10)
+        ))
+        
+        fig_trend.update_layout(
+            title='Model Performance Across Retraining Sessions',
+            xaxis_title='Retraining Session',
+            yaxis_title='Test Accuracy (%)',
+            height=350,
+            template='plotly_white'
+        )
+    
+    return df_sessions, fig_trend
+
+
+@st.cache_data(show_spinner=False)
+def build_confusion_matrix_figure(cm, classes):
+    """Build the confusion matrix heatmap"""
+    cm_df = pd.DataFrame(cm, columns=classes, index=classes)
+    
+    fig = px.imshow(
+        cm_df,
+        labels=dict(x="Predicted", y="True", color="Count"),
+        x=classes,
+        y=classes,
+        color_continuous_scale="Greens",
+        text_auto=True
+    )
+    fig.update_layout(height=500)
+    return fig
+
+
+@st.cache_data(show_spinner=False)
+def build_f1_gauge(f1_score):
+    """Build the F1-score gauge for one class"""
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=f1_score * 100,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': "F1-Score"},
+        gauge={
+            'axis': {'range': [0, 100]},
+            'bar': {'color': "darkgreen"},
+            'steps': [
+                {'range': [0, 50], 'color': "lightcoral"},
+                {'range': [50, 75], 'color': "lightyellow"},
+                {'range': [75, 100], 'color': "lightgreen"}
+            ],
+            'threshold': {
+                'line': {'color': "red", 'width': 4},
+                'thickness': 0.75,
+                'value': 90
+            }
+        }
+    ))
+    fig.update_layout(height=250)
+    return fig
+
+
 # ============================================================================
 # SIDEBAR
 # ============================================================================
@@ -183,6 +491,9 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### 📡 System Status")
     
+    if st.button("🔄 Refresh data", help="Re-fetch status, metrics and history from the API"):
+        refresh_api_data()
+    
     # Fetch and display status
     status = get_model_status()
     if status:
@@ -266,18 +577,7 @@ if page == "🏠 Dashboard":
             per_class_metrics = metrics.get("per_class_metrics", {})
             
             if per_class_metrics:
-                # Create dataframe for metrics
-                metrics_data = []
-                for class_name, class_metrics in per_class_metrics.items():
-                    metrics_data.append({
-                        "Class": class_name,
-                        "Precision": class_metrics.get("precision", 0),
-                        "Recall": class_metrics.get("recall", 0),
-                        "F1-Score": class_metrics.get("f1_score", 0),
-                        "Support": class_metrics.get("support", 0)
-                    })
-                
-                df_metrics = pd.DataFrame(metrics_data)
+                df_metrics, fig = build_metrics_view(per_class_metrics)
                 
                 # Display metrics table
                 st.dataframe(
@@ -290,37 +590,6 @@ if page == "🏠 Dashboard":
                 )
                 
                 # Visualize metrics
-                fig = go.Figure()
-                
-                fig.add_trace(go.Bar(
-                    name='Precision',
-                    x=df_metrics['Class'],
-                    y=df_metrics['Precision'],
-                    marker_color='lightblue'
-                ))
-                
-                fig.add_trace(go.Bar(
-                    name='Recall',
-                    x=df_metrics['Class'],
-                    y=df_metrics['Recall'],
-                    marker_color='lightgreen'
-                ))
-                
-                fig.add_trace(go.Bar(
-                    name='F1-Score',
-                    x=df_metrics['Class'],
-                    y=df_metrics['F1-Score'],
-                    marker_color='lightcoral'
-                ))
-                
-                fig.update_layout(
-                    barmode='group',
-                    title='Performance Metrics by Class',
-                    xaxis_title='Class',
-                    yaxis_title='Score',
-                    height=400
-                )
-                
                 st.plotly_chart(fig, use_container_width=True)
     else:
         st.error("❌ Cannot fetch model status. Please ensure the API is running.")
@@ -356,47 +625,10 @@ if page == "🏠 Dashboard":
         # Plot Learning Curves
         if history and "epochs" in history:
             tab1, tab2 = st.tabs(["📉 Loss Curves", "📈 Accuracy Curves"])
+            fig_loss, fig_acc = build_learning_curve_figures(history)
             
             with tab1:
                 # Loss curves
-                fig_loss = go.Figure()
-                
-                if "loss" in history and history["loss"]:
-                    fig_loss.add_trace(go.Scatter(
-                        x=history["epochs"],
-                        y=history["loss"],
-                        mode='lines+markers',
-                        name='Training Loss',
-                        line=dict(color='#FF6B6B', width=3),
-                        marker=dict(size=6)
-                    ))
-                
-                if "val_loss" in history and history["val_loss"]:
-                    fig_loss.add_trace(go.Scatter(
-                        x=history["epochs"],
-                        y=history["val_loss"],
-                        mode='lines+markers',
-                        name='Validation Loss',
-                        line=dict(color='#4ECDC4', width=3),
-                        marker=dict(size=6)
-                    ))
-                
-                fig_loss.update_layout(
-                    title='Model Loss Over Epochs',
-                    xaxis_title='Epoch',
-                    yaxis_title='Loss',
-                    height=450,
-                    hovermode='x unified',
-                    template='plotly_white',
-                    legend=dict(
-                        orientation="h",
-                        yanchor="bottom",
-                        y=1.02,
-                        xanchor="right",
-                        x=1
-                    )
-                )
-                
                 st.plotly_chart(fig_loss, use_container_width=True)
                 
                 # Loss statistics
@@ -413,44 +645,6 @@ if page == "🏠 Dashboard":
             
             with tab2:
                 # Accuracy curves
-                fig_acc = go.Figure()
-                
-                if "accuracy" in history and history["accuracy"]:
-                    fig_acc.add_trace(go.Scatter(
-                        x=history["epochs"],
-                        y=history["accuracy"],
-                        mode='lines+markers',
-                        name='Training Accuracy',
-                        line=dict(color='#95E1D3', width=3),
-                        marker=dict(size=6)
-                    ))
-                
-                if "val_accuracy" in history and history["val_accuracy"]:
-                    fig_acc.add_trace(go.Scatter(
-                        x=history["epochs"],
-                        y=history["val_accuracy"],
-                        mode='lines+markers',
-                        name='Validation Accuracy',
-                        line=dict(color='#F38181', width=3),
-                        marker=dict(size=6)
-                    ))
-                
-                fig_acc.update_layout(
-                    title='Model Accuracy Over Epochs',
-                    xaxis_title='Epoch',
-                    yaxis_title='Accuracy',
-                    height=450,
-                    hovermode='x unified',
-                    template='plotly_white',
-                    legend=dict(
-                        orientation="h",
-                        yanchor="bottom",
-                        y=1.02,
-                        xanchor="right",
-                        x=1
-                    )
-                )
-                
                 st.plotly_chart(fig_acc, use_container_width=True)
                 
                 # Accuracy statistics
@@ -473,42 +667,11 @@ if page == "🏠 Dashboard":
                 st.markdown("---")
                 st.subheader("🔄 Retraining Sessions History")
                 
-                session_data = []
-                for idx, session in enumerate(sessions, 1):
-                    session_data.append({
-                        "Session": idx,
-                        "Date": session.get("datetime", "N/A"),
-                        "Accuracy": f"{session.get('test_accuracy', 0)*100:.2f}%",
-                        "Loss": f"{session.get('test_loss', 0):.4f}",
-                        "Samples": session.get('total_samples', 0),
-                        "Epochs": session.get('epochs_trained', 0),
-                        "Classes": session.get('num_classes', 0)
-                    })
-                
-                df_sessions = pd.DataFrame(session_data)
+                df_sessions, fig_trend = build_sessions_view(sessions)
                 st.dataframe(df_sessions, use_container_width=True)
                 
                 # Plot accuracy trend across retraining sessions
-                if len(sessions) > 1:
-                    fig_trend = go.Figure()
-                    
-                    fig_trend.add_trace(go.Scatter(
-                        x=[s.get("datetime", f"Session {i}") for i, s in enumerate(sessions, 1)],
-                        y=[s.get("test_accuracy", 0) * 100 for s in sessions],
-                        mode='lines+markers',
-                        name='Test Accuracy',
-                        line=dict(color='#2E7D32', width=3),
-                        marker=dict(size=10)
-                    ))
-                    
-                    fig_trend.update_layout(
-                        title='Model Performance Across Retraining Sessions',
-                        xaxis_title='Retraining Session',
-                        yaxis_title='Test Accuracy (%)',
-                        height=350,
-                        template='plotly_white'
-                    )
-                    
+                if fig_trend is not None:
                     st.plotly_chart(fig_trend, use_container_width=True)
     else:
         st.info("📝 No retraining history available yet. Training history will appear after the first retraining session.")
@@ -541,7 +704,8 @@ elif page == "🎯 Predictions":
         with col1:
             if st.button("🔍 Classify Audio", type="primary"):
                 with st.spinner("Analyzing audio..."):
-                    result = predict_audio(uploaded_file)
+                    clip = prepare_clip_for_prediction(uploaded_file)
+                    result = predict_audio(clip if clip is not None else uploaded_file)
                     
                     if "error" in result:
                         st.error(f"❌ Prediction failed: {result['error']}")
@@ -584,6 +748,9 @@ elif page == "🎯 Predictions":
                         # Processing info
                         st.markdown("---")
                         st.info(f"⏱️ Processing time: {result.get('processing_time', 0):.3f} seconds")
+                        if clip is not None:
+                            st.caption(f"Uploaded {len(clip[1]) / 1024:.0f} KB (16 kHz mono FLAC) "
+                                       f"instead of {uploaded_file.size / 1024:.0f} KB original")
                         st.caption(f"Timestamp: {result.get('timestamp', 'N/A')}")
 
 
@@ -603,17 +770,7 @@ elif page == "📊 Analytics":
         classes = status.get("classes", [])
         
         if cm and classes:
-            cm_df = pd.DataFrame(cm, columns=classes, index=classes)
-            
-            fig = px.imshow(
-                cm_df,
-                labels=dict(x="Predicted", y="True", color="Count"),
-                x=classes,
-                y=classes,
-                color_continuous_scale="Greens",
-                text_auto=True
-            )
-            fig.update_layout(height=500)
+            fig = build_confusion_matrix_figure(cm, classes)
             st.plotly_chart(fig, use_container_width=True)
         
         st.markdown("---")
@@ -640,27 +797,7 @@ elif page == "📊 Analytics":
                     # Create gauge chart for F1-score
                     f1_score = class_metrics.get('f1_score', 0)
                     
-                    fig = go.Figure(go.Indicator(
-                        mode="gauge+number",
-                        value=f1_score * 100,
-                        domain={'x': [0, 1], 'y': [0, 1]},
-                        title={'text': "F1-Score"},
-                        gauge={
-                            'axis': {'range': [0, 100]},
-                            'bar': {'color': "darkgreen"},
-                            'steps': [
-                                {'range': [0, 50], 'color': "lightcoral"},
-                                {'range': [50, 75], 'color': "lightyellow"},
-                                {'range': [75, 100], 'color': "lightgreen"}
-                            ],
-                            'threshold': {
-                                'line': {'color': "red", 'width': 4},
-                                'thickness': 0.75,
-                                'value': 90
-                            }
-                        }
-                    ))
-                    fig.update_layout(height=250)
+                    fig = build_f1_gauge(f1_score)
                     st.plotly_chart(fig, use_container_width=True)
     else:
         st.error("❌ Cannot load analytics. Please ensure the API is running.")
@@ -713,24 +850,32 @@ elif page == "🔄 Training":
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 success_count = 0
+                duplicate_count = 0
                 errors = []
 
-                # 3. LOOP THROUGH FILES AND UPLOAD
-                for idx, file_obj in enumerate(uploaded_training_files):
-                    # Update status
-                    status_text.text(f"Uploading {file_obj.name} ({idx + 1}/{file_count})...")
+                # 3. UPLOAD THROUGH A BOUNDED POOL OVER THE SHARED SESSION
+                # Worker threads only do HTTP; all Streamlit updates stay on this thread
+                session = get_http_session()
+                with ThreadPoolExecutor(max_workers=min(UPLOAD_WORKERS, file_count)) as executor:
+                    futures = {
+                        executor.submit(upload_training_data, file_obj, selected_class, session): file_obj.name
+                        for file_obj in uploaded_training_files
+                    }
                     
-                    # Call your existing backend function
-                    # Note: We assume upload_training_data handles the pointer reset (seek(0))
-                    result = upload_training_data(file_obj, selected_class)
-                    
-                    if "error" in result:
-                        errors.append(f"{file_obj.name}: {result['error']}")
-                    else:
-                        success_count += 1
-                    
-                    # Update progress bar
-                    progress_bar.progress((idx + 1) / file_count)
+                    for done, future in enumerate(as_completed(futures), 1):
+                        file_name = futures[future]
+                        result = future.result()
+                        
+                        if "error" in result:
+                            errors.append(f"{file_name}: {result['error']}")
+                        else:
+                            success_count += 1
+                            if result.get("is_new") is False:
+                                duplicate_count += 1
+                        
+                        # Update progress
+                        status_text.text(f"Uploaded {done}/{file_count} (last: {file_name})")
+                        progress_bar.progress(done / file_count)
 
                 # Final Summary
                 status_text.empty()
@@ -738,6 +883,8 @@ elif page == "🔄 Training":
 
                 if success_count == file_count:
                     st.success(f"✅ All {file_count} files uploaded successfully!")
+                    if duplicate_count:
+                        st.info(f"ℹ️ {duplicate_count} file(s) were already in the training data and were skipped")
                 else:
                     st.warning(f"⚠️ Processed with issues. Success: {success_count}, Failed: {len(errors)}")
                     if errors:
@@ -774,6 +921,7 @@ elif page == "🔄 Training":
                         st.error(f"❌ Retraining failed: {result['error']}")
                     else:
                         if result.get("success"):
+                            refresh_api_data()
                             st.success(f"✅ {result.get('message')}")
                             st.info(f"Status: {result.get('status')}")
                         else:
@@ -791,7 +939,7 @@ elif page == "⚙️ Settings":
     
     if st.button("Test Connection"):
         try:
-            response = requests.get(f"{api_url}/health", timeout=5)
+            response = get_http_session().get(f"{api_url}/health", timeout=5)
             if response.status_code == 200:
                 st.success("✅ API connection successful!")
                 st.json(response.json())
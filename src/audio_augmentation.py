@@ -14,11 +14,14 @@ Augmentation techniques:
 Based on the augmentation pipeline from acoustic_togetherso_(1).ipynb
 """
 
+import hashlib
+from collections import deque
 import numpy as np
 import librosa
 import soundfile as sf
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Callable
+from typing import Dict, Iterator, List, Tuple, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -53,34 +56,36 @@ def pitch_shift(audio: np.ndarray, sr: int, n_steps: int = 0) -> np.ndarray:
     return librosa.effects.pitch_shift(audio, sr=sr, n_steps=n_steps)
 
 
-def add_noise(audio: np.ndarray, noise_factor: float = 0.005) -> np.ndarray:
+def add_noise(audio: np.ndarray, noise_factor: float = 0.005, rng=np.random) -> np.ndarray:
     """
     Add random Gaussian noise to audio.
     
     Args:
         audio: Audio data as numpy array
         noise_factor: Noise intensity (0.001-0.01 recommended)
+        rng: Random source (np.random or a np.random.RandomState)
     
     Returns:
         Audio with added noise
     """
-    noise = np.random.randn(len(audio))
+    noise = rng.randn(len(audio))
     augmented = audio + noise_factor * noise
     return augmented
 
 
-def time_shift(audio: np.ndarray, shift_max: float = 0.2) -> np.ndarray:
+def time_shift(audio: np.ndarray, shift_max: float = 0.2, rng=np.random) -> np.ndarray:
     """
     Shift audio in time domain.
     
     Args:
         audio: Audio data as numpy array
         shift_max: Maximum shift as fraction of total length
+        rng: Random source (np.random or a np.random.RandomState)
     
     Returns:
         Time-shifted audio
     """
-    shift = int(np.random.uniform(-shift_max, shift_max) * len(audio))
+    shift = int(rng.uniform(-shift_max, shift_max) * len(audio))
     return np.roll(audio, shift)
 
 
@@ -98,26 +103,215 @@ def change_volume(audio: np.ndarray, factor: float = 1.0) -> np.ndarray:
     return audio * factor
 
 
-def random_speed_change(audio: np.ndarray, speed_range: Tuple[float, float] = (0.9, 1.1)) -> np.ndarray:
+def random_speed_change(audio: np.ndarray, speed_range: Tuple[float, float] = (0.9, 1.1), rng=np.random) -> np.ndarray:
     """
     Randomly change speed within a range.
     
     Args:
         audio: Audio data as numpy array
         speed_range: Tuple of (min_speed, max_speed)
+        rng: Random source (np.random or a np.random.RandomState)
     
     Returns:
         Speed-adjusted audio
     """
-    rate = np.random.uniform(speed_range[0], speed_range[1])
+    rate = rng.uniform(speed_range[0], speed_range[1])
     return time_stretch(audio, rate)
 
 
+def file_seed(seed: int, class_name: str, file_name: str) -> int:
+    """
+    Derive a stable per-file seed from a run seed and the file's identity.
+    
+    The seed depends only on (seed, class, filename), so a file gets the
+    same augmentations whichever worker processes it and in whatever order.
+    """
+    digest = hashlib.sha256(f"{seed}:{class_name}/{file_name}".encode()).digest()
+    return int.from_bytes(digest[:4], "little")
+
+
+# Bump when the variants generated for a given seed change (invalidates cached variant embeddings)
+AUGMENTATION_VERSION = 2
+
+AUGMENTATION_NAMES = [
+    'time_stretch_fast', 'time_stretch_slow', 'pitch_up', 'pitch_down',
+    'noise_light', 'noise_medium', 'time_shift', 'volume_up', 'volume_down',
+    'combined_1', 'combined_2'
+]
+
+
+def planned_variants(augmentations_per_file: int, seed: int) -> List[str]:
+    """
+    Variant names iter_augmented_audio() will produce for a seeded file.
+    
+    Replays only the selection draw, so callers can look up cached results
+    without decoding or augmenting the file.
+    """
+    rng = np.random.RandomState(seed)
+    selected_indices = rng.choice(
+        len(AUGMENTATION_NAMES),
+        size=min(augmentations_per_file, len(AUGMENTATION_NAMES)),
+        replace=False
+    )
+    return ['original'] + [AUGMENTATION_NAMES[idx] for idx in selected_indices]
+
+
+# Phase-vocoder rate behind each spectral variant (pitch shifts stretch by 2^(-steps/12), then resample)
+STRETCH_RATES = {'time_stretch_fast': 1.1, 'time_stretch_slow': 0.9, 'combined_1': 1.05}
+PITCH_STEPS = {'pitch_up': 2, 'pitch_down': -2, 'combined_2': 1}
+# Cheap waveform variants: (noise_factor, volume_factor, max_shift)
+CHEAP_VARIANTS = {
+    'noise_light': (0.002, 1.0, 0.0),
+    'noise_medium': (0.005, 1.0, 0.0),
+    'time_shift': (0.0, 1.0, 0.15),
+    'volume_up': (0.0, 1.2, 0.0),
+    'volume_down': (0.0, 0.8, 0.0),
+}
+
+
+class SharedSTFTAugmenter:
+    """
+    Derive all time-stretch and pitch-shift variants from one STFT of a clip.
+    
+    librosa's time_stretch and pitch_shift each start with an STFT of the
+    same signal; here it is computed once and every variant runs only its
+    own phase vocoder, inverse STFT and (for pitch) resample. Each variant
+    uses the same librosa calls as time_stretch()/pitch_shift().
+    """
+    
+    def __init__(self, audio: np.ndarray, sr: int):
+        self.audio = audio
+        self.sr = sr
+        self._stft = None
+    
+    @property
+    def stft(self) -> np.ndarray:
+        if self._stft is None:
+            self._stft = librosa.stft(self.audio)
+        return self._stft
+    
+    def stretch(self, rate: float) -> np.ndarray:
+        """Equivalent to time_stretch(audio, rate)"""
+        stretched = librosa.phase_vocoder(self.stft, rate=rate, hop_length=512)
+        length = int(round(self.audio.shape[-1] / rate))
+        return librosa.istft(stretched, dtype=self.audio.dtype, length=length)
+    
+    def pitch(self, n_steps: float) -> np.ndarray:
+        """Equivalent to pitch_shift(audio, sr, n_steps)"""
+        rate = 2.0 ** (-float(n_steps) / 12)
+        shifted = librosa.resample(self.stretch(rate), orig_sr=float(self.sr) / rate, target_sr=self.sr)
+        return librosa.util.fix_length(shifted, size=self.audio.shape[-1])
+
+
+def cheap_variants(audio: np.ndarray, params: List[Tuple[float, float, float]], rng=np.random) -> np.ndarray:
+    """
+    Apply noise, volume and time-shift variants as one vectorized operation.
+    
+    Args:
+        audio: Audio data as numpy array
+        params: One (noise_factor, volume_factor, max_shift) tuple per variant
+        rng: Random source (np.random or a np.random.RandomState)
+    
+    Returns:
+        2-D array with one variant per row
+    """
+    n = len(audio)
+    noise_factors, volumes, max_shifts = (np.array(col, dtype=np.float64) for col in zip(*params))
+    
+    # Roll each row by its own shift via one gather: rolled[i] = audio[(i - shift) % n]
+    shifts = np.zeros(len(params), dtype=np.int64)
+    for row in np.flatnonzero(max_shifts):
+        shifts[row] = int(rng.uniform(-max_shifts[row], max_shifts[row]) * n)
+    if shifts.any():
+        variants = audio[(np.arange(n)[None, :] - shifts[:, None]) % n]
+    else:
+        variants = np.broadcast_to(audio, (len(params), n)).astype(np.float64)
+    
+    variants = variants * volumes[:, None]
+    
+    noisy = np.flatnonzero(noise_factors)
+    if len(noisy):
+        variants[noisy] += noise_factors[noisy, None] * rng.randn(len(noisy), n)
+    
+    return variants
+
+
+def iter_augmented_audio(
+    audio: np.ndarray,
+    sr: int,
+    augmentations_per_file: int = 5,
+    seed: Optional[int] = None,
+    source_name: str = "audio"
+) -> Iterator[Tuple[str, np.ndarray]]:
+    """
+    Yield the original clip and its augmented variants as arrays.
+    
+    Stretch and pitch variants share one STFT (SharedSTFTAugmenter); the
+    noise/volume/shift variants are computed together by cheap_variants().
+    
+    Args:
+        audio: Decoded audio
+        sr: Sample rate of audio
+        augmentations_per_file: Number of augmented versions to create
+        seed: Seed for a private RandomState (None = global np.random)
+        source_name: Name used in warnings
+    
+    Yields:
+        (variant_name, audio) - 'original' first, then the selected variants
+    """
+    rng = np.random.RandomState(seed) if seed is not None else np.random
+    
+    yield 'original', audio
+    
+    # Randomly select augmentations (the same draw planned_variants() replays)
+    selected_indices = rng.choice(
+        len(AUGMENTATION_NAMES),
+        size=min(augmentations_per_file, len(AUGMENTATION_NAMES)),
+        replace=False
+    )
+    selected = [AUGMENTATION_NAMES[idx] for idx in selected_indices]
+    
+    results = {}
+    
+    cheap = [name for name in selected if name in CHEAP_VARIANTS]
+    if cheap:
+        try:
+            rows = cheap_variants(audio, [CHEAP_VARIANTS[name] for name in cheap], rng=rng)
+            results.update(zip(cheap, rows))
+        except Exception as e:
+            logger.warning(f"Error applying {', '.join(cheap)} to {source_name}: {e}")
+    
+    spectral = SharedSTFTAugmenter(audio, sr)
+    for aug_name in selected:
+        if aug_name in CHEAP_VARIANTS:
+            continue
+        try:
+            if aug_name in STRETCH_RATES:
+                augmented_audio = spectral.stretch(STRETCH_RATES[aug_name])
+            else:
+                augmented_audio = spectral.pitch(PITCH_STEPS[aug_name])
+            
+            if aug_name == 'combined_1':
+                augmented_audio = add_noise(augmented_audio, noise_factor=0.003, rng=rng)
+            elif aug_name == 'combined_2':
+                augmented_audio = change_volume(augmented_audio, factor=0.9)
+            results[aug_name] = augmented_audio
+        except Exception as e:
+            logger.warning(f"Error applying {aug_name} to {source_name}: {e}")
+    
+    for aug_name in selected:
+        if aug_name in results:
+            yield aug_name, results[aug_name]
+
+
 def augment_audio_file(
     audio_path: Path,
     output_dir: Path,
     sr: int = 22050,
-    augmentations_per_file: int = 5
+    augmentations_per_file: int = 5,
+    seed: Optional[int] = None,
+    pcm_cache=None,
+    digest: Optional[str] = None
 ) -> List[Path]:
     """
     Apply multiple augmentations to a single audio file.
@@ -131,56 +325,27 @@ def augment_audio_file(
         output_dir: Directory to save augmented files
         sr: Sample rate for loading audio (default: 22050)
         augmentations_per_file: Number of augmented versions to create (default: 5)
+        seed: Seed for a private RandomState (None = global np.random)
+        pcm_cache: Optional PCMCache to read the decoded clip from
+        digest: Content hash of audio_path (the PCM cache key)
     
     Returns:
         List of paths to saved augmented files
     """
     try:
-        # Load audio (librosa handles both .wav and .mp3)
-        audio, sr = librosa.load(str(audio_path), sr=sr)
+        audio, sr = _load_audio(audio_path, sr, pcm_cache, digest)
         
         saved_files = []
         base_name = audio_path.stem
         
-        # Save original (copy to augmented folder as .wav)
-        original_path = output_dir / f"{base_name}_original.wav"
-        sf.write(str(original_path), audio, sr)
-        saved_files.append(original_path)
-        
-        # Define augmentation strategies
-        augmentation_configs: List[Tuple[str, Callable]] = [
-            ('time_stretch_fast', lambda a: time_stretch(a, rate=1.1)),
-            ('time_stretch_slow', lambda a: time_stretch(a, rate=0.9)),
-            ('pitch_up', lambda a: pitch_shift(a, sr, n_steps=2)),
-            ('pitch_down', lambda a: pitch_shift(a, sr, n_steps=-2)),
-            ('noise_light', lambda a: add_noise(a, noise_factor=0.002)),
-            ('noise_medium', lambda a: add_noise(a, noise_factor=0.005)),
-            ('time_shift', lambda a: time_shift(a, shift_max=0.15)),
-            ('volume_up', lambda a: change_volume(a, factor=1.2)),
-            ('volume_down', lambda a: change_volume(a, factor=0.8)),
-            ('combined_1', lambda a: add_noise(time_stretch(a, rate=1.05), noise_factor=0.003)),
-            ('combined_2', lambda a: change_volume(pitch_shift(a, sr, n_steps=1), factor=0.9))
-        ]
-        
-        # Randomly select augmentations
-        selected_indices = np.random.choice(
-            len(augmentation_configs),
-            size=min(augmentations_per_file, len(augmentation_configs)),
-            replace=False
-        )
-        
-        for idx in selected_indices:
-            aug_name, aug_func = augmentation_configs[idx]
-            try:
-                augmented_audio = aug_func(audio)
-                
-                # Save augmented audio (always save as .wav)
-                aug_path = output_dir / f"{base_name}_{aug_name}.wav"
-                sf.write(str(aug_path), augmented_audio, sr)
-                saved_files.append(aug_path)
-                
-            except Exception as e:
-                logger.warning(f"Error applying {aug_name} to {audio_path.name}: {e}")
+        # Original is saved as <name>_original.wav alongside the variants
+        for aug_name, augmented_audio in iter_augmented_audio(
+            audio, sr, augmentations_per_file, seed=seed, source_name=audio_path.name
+        ):
+            # Save augmented audio (always save as .wav)
+            aug_path = output_dir / f"{base_name}_{aug_name}.wav"
+            sf.write(str(aug_path), augmented_audio, sr)
+            saved_files.append(aug_path)
         
         logger.info(f"Augmented {audio_path.name}: {len(saved_files)} files created")
         return saved_files
@@ -190,11 +355,38 @@ def augment_audio_file(
         return []
 
 
+def _load_audio(audio_path: Path, sr: int, pcm_cache=None, digest: Optional[str] = None) -> Tuple[np.ndarray, int]:
+    """Decoded clip from the PCM cache when it holds it, otherwise via librosa (.wav and .mp3)"""
+    if pcm_cache is not None:
+        return pcm_cache.load(audio_path, digest, sr), sr
+    return librosa.load(str(audio_path), sr=sr)
+
+
+def _augment_task(task: tuple) -> Tuple[str, int]:
+    """Process-pool entry point: augment one file, return (class_name, files_created)"""
+    class_name, audio_file, output_class_dir, sr, augmentations_per_file, seed, pcm_cache, digest = task
+    saved_files = augment_audio_file(
+        audio_file,
+        output_class_dir,
+        sr=sr,
+        augmentations_per_file=augmentations_per_file,
+        seed=seed,
+        pcm_cache=pcm_cache,
+        digest=digest
+    )
+    return class_name, len(saved_files)
+
+
 def augment_directory(
     input_dir: Path,
     output_dir: Path,
     sr: int = 22050,
-    augmentations_per_file: int = 5
+    augmentations_per_file: int = 5,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    pcm_cache=None,
+    digests: Optional[Dict[Path, str]] = None
 ) -> dict:
     """
     Augment all audio files in a directory, preserving class structure.
@@ -217,63 +409,170 @@ def augment_directory(
         class2/
             ...
     
+    With workers > 1 the files of all classes are fanned out over a process
+    pool in chunks. Given a seed, every file is augmented from its own
+    file_seed(), so the output is identical for any worker count or order.
+    
     Args:
         input_dir: Directory containing class subdirectories with audio files
         output_dir: Directory to save augmented files
         sr: Sample rate for loading audio
         augmentations_per_file: Number of augmented versions per file
+        workers: Number of worker processes (1 = run in this process)
+        seed: Run seed for reproducible augmentation (None = unseeded)
+        chunksize: Files per task submitted to a worker (default: auto)
+        pcm_cache: Optional PCMCache holding the decoded originals
+        digests: Content hash of each original (the PCM cache keys)
     
     Returns:
         Dictionary with augmentation statistics per class
     """
     results = {}
+    tasks = []
     
     # Create output directory
     output_dir.mkdir(exist_ok=True, parents=True)
     
-    # Process each class directory
+    # Collect files of each class directory
     for class_dir in sorted(input_dir.iterdir()):
         if not class_dir.is_dir():
             continue
         
         class_name = class_dir.name
-        logger.info(f"Processing class: {class_name}")
         
         # Create output class directory
         output_class_dir = output_dir / class_name
         output_class_dir.mkdir(exist_ok=True)
         
         # Get all audio files (both .wav and .mp3)
-        audio_files = list(class_dir.glob("*.wav")) + list(class_dir.glob("*.mp3"))
+        audio_files = sorted(list(class_dir.glob("*.wav")) + list(class_dir.glob("*.mp3")))
         
         if not audio_files:
             logger.warning(f"No audio files found in {class_dir}")
             continue
         
-        original_count = len(audio_files)
-        total_created = 0
-        
-        # Augment each file
-        for audio_file in audio_files:
-            saved_files = augment_audio_file(
-                audio_file,
-                output_class_dir,
-                sr=sr,
-                augmentations_per_file=augmentations_per_file
-            )
-            total_created += len(saved_files)
-        
         results[class_name] = {
-            'original_files': original_count,
-            'augmented_files': total_created,
-            'increase_factor': total_created / original_count if original_count > 0 else 0
+            'original_files': len(audio_files),
+            'augmented_files': 0,
+            'increase_factor': 0
         }
         
+        for audio_file in audio_files:
+            task_seed = file_seed(seed, class_name, audio_file.name) if seed is not None else None
+            digest = digests.get(audio_file) if digests else None
+            tasks.append((class_name, audio_file, output_class_dir, sr, augmentations_per_file, task_seed,
+                          pcm_cache, digest))
+    
+    logger.info(f"Augmenting {len(tasks)} files from {len(results)} classes with {workers} worker(s)")
+    
+    # Augment each file
+    if workers > 1 and len(tasks) > 1:
+        if chunksize is None:
+            chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(_augment_task, tasks, chunksize=chunksize))
+    else:
+        outcomes = [_augment_task(task) for task in tasks]
+    
+    for class_name, created in outcomes:
+        results[class_name]['augmented_files'] += created
+    
+    for class_name, stats in results.items():
+        original_count = stats['original_files']
+        total_created = stats['augmented_files']
+        stats['increase_factor'] = total_created / original_count if original_count > 0 else 0
         logger.info(f"Class {class_name}: {original_count} → {total_created} files ({total_created/original_count:.1f}x)")
     
     return results
 
 
+def _augment_in_memory(task: tuple) -> Tuple[str, Path, List[Tuple[str, np.ndarray]]]:
+    """Process-pool entry point: decode and augment one file, returning the arrays"""
+    class_name, audio_file, sr, augmentations_per_file, seed, max_duration, output_class_dir, pcm_cache, digest = task
+    try:
+        audio, sr = _load_audio(audio_file, sr, pcm_cache, digest)
+    except Exception as e:
+        logger.error(f"Error augmenting {audio_file}: {e}")
+        return class_name, audio_file, []
+    
+    variants = []
+    for aug_name, augmented_audio in iter_augmented_audio(
+        audio, sr, augmentations_per_file, seed=seed, source_name=audio_file.name
+    ):
+        if output_class_dir is not None:
+            sf.write(str(output_class_dir / f"{audio_file.stem}_{aug_name}.wav"), augmented_audio, sr)
+        if max_duration is not None:
+            # Only the analysed window crosses the process boundary
+            augmented_audio = augmented_audio[:int(max_duration * sr)]
+        variants.append((aug_name, np.asarray(augmented_audio, dtype=np.float32)))
+    return class_name, audio_file, variants
+
+
+def stream_augmented_audio(
+    audio_files: List[Tuple[str, Path]],
+    sr: int = 22050,
+    augmentations_per_file: int = 5,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    max_duration: Optional[float] = None,
+    output_dir: Optional[Path] = None,
+    pcm_cache=None,
+    digests: Optional[Dict[Path, str]] = None
+) -> Iterator[Tuple[str, Path, str, np.ndarray]]:
+    """
+    Stream augmented variants as arrays instead of writing WAV files.
+    
+    Files are augmented in a process pool with a bounded number in flight,
+    and results are yielded in input order, so memory stays flat however
+    many files there are.
+    
+    Args:
+        audio_files: (class_name, path) pairs
+        sr: Sample rate for loading audio
+        augmentations_per_file: Number of augmented versions per file
+        workers: Number of worker processes (1 = run in this process)
+        seed: Run seed; each file uses file_seed(seed, class, filename)
+        max_duration: Trim yielded arrays to this many seconds
+        output_dir: Also write <class>/<name>_<variant>.wav here (optional)
+        pcm_cache: Optional PCMCache holding the decoded originals
+        digests: Content hash of each original (the PCM cache keys)
+    
+    Yields:
+        (class_name, source_path, variant_name, audio)
+    """
+    def make_task(class_name, audio_file):
+        task_seed = file_seed(seed, class_name, audio_file.name) if seed is not None else None
+        output_class_dir = None
+        if output_dir is not None:
+            output_class_dir = Path(output_dir) / class_name
+            output_class_dir.mkdir(parents=True, exist_ok=True)
+        digest = digests.get(audio_file) if digests else None
+        return (class_name, audio_file, sr, augmentations_per_file, task_seed, max_duration, output_class_dir,
+                pcm_cache, digest)
+    
+    tasks = (make_task(class_name, audio_file) for class_name, audio_file in audio_files)
+    
+    if workers <= 1:
+        for task in tasks:
+            class_name, audio_file, variants = _augment_in_memory(task)
+            for aug_name, audio in variants:
+                yield class_name, audio_file, aug_name, audio
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for task in tasks:
+            in_flight.append(executor.submit(_augment_in_memory, task))
+            if len(in_flight) >= workers * 2:
+                class_name, audio_file, variants = in_flight.popleft().result()
+                for aug_name, audio in variants:
+                    yield class_name, audio_file, aug_name, audio
+        while in_flight:
+            class_name, audio_file, variants = in_flight.popleft().result()
+            for aug_name, audio in variants:
+                yield class_name, audio_file, aug_name, audio
+
+
 if __name__ == "__main__":
     # Example usage
     logging.basicConfig(level=logging.INFO)
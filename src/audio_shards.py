@@ -0,0 +1,202 @@
+"""
+Sharded Audio Dataset Format for EcoSight
+Packs each class's audio files into size-bounded, uncompressed tar shards
+plus one JSON index, so a dataset moves to and from S3 as a few large
+objects instead of tens of thousands of small ones.
+
+Layout (locally and under an S3 prefix):
+    <dataset>/
+        index.json                   (shards and member offsets)
+        dog_bark/shard-00000.tar
+        dog_bark/shard-00001.tar
+        gun_shot/shard-00000.tar
+
+Members are stored as "<class>/<filename>". Tar data is not compressed, so
+the index records each member's byte offset and size in its shard and any
+single sample can be read with one seek locally or one ranged GET on S3.
+"""
+
+import json
+import logging
+import os
+import tarfile
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SHARD_FORMAT_VERSION = 1
+INDEX_FILENAME = "index.json"
+DEFAULT_MAX_SHARD_BYTES = int(os.getenv("AUDIO_SHARD_MAX_BYTES", str(256 * 1024 * 1024)))
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg", ".flac")
+
+
+def shard_key(class_name: str, shard_number: int) -> str:
+    """Relative path of a shard within the dataset"""
+    return f"{class_name}/shard-{shard_number:05d}.tar"
+
+
+def _member_offsets(shard_path: Path) -> List[Tuple[str, int, int]]:
+    """(name, data offset, size) of every regular file in a tar shard"""
+    with tarfile.open(shard_path, "r:") as archive:
+        return [(m.name, m.offset_data, m.size) for m in archive.getmembers() if m.isfile()]
+
+
+def _safe_member_path(output_dir: Path, name: str) -> Path:
+    """Resolve a member name to <output_dir>/<class>/<file>, rejecting anything else"""
+    parts = Path(name).parts
+    if len(parts) != 2 or any(part in ("", ".", "..") for part in parts) or Path(name).is_absolute():
+        raise ValueError(f"Unexpected shard member path '{name}'")
+    return output_dir / parts[0] / parts[1]
+
+
+def pack_directory(input_dir: Path, output_dir: Path,
+                   max_shard_bytes: int = DEFAULT_MAX_SHARD_BYTES) -> dict:
+    """
+    Pack input_dir/<class>/<audio> into per-class tar shards and an index
+
+    Args:
+        input_dir: Directory holding one subdirectory per class
+        output_dir: Where shards and index.json are written
+        max_shard_bytes: Start a new shard once a shard would exceed this size
+
+    Returns:
+        The index (also written to output_dir/index.json)
+    """
+    input_dir, output_dir = Path(input_dir), Path(output_dir)
+    index = {
+        "format_version": SHARD_FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "shards": [],
+        "members": []
+    }
+
+    for class_dir in sorted(d for d in input_dir.iterdir() if d.is_dir() and not d.name.startswith(".")):
+        files = sorted(f for f in class_dir.iterdir()
+                       if f.is_file() and f.suffix.lower() in AUDIO_EXTENSIONS)
+        if not files:
+            continue
+        (output_dir / class_dir.name).mkdir(parents=True, exist_ok=True)
+
+        # Group files into shards of at most max_shard_bytes (a single larger file gets its own)
+        groups, current, current_bytes = [], [], 0
+        for audio_file in files:
+            size = audio_file.stat().st_size + 1024  # data + tar header/padding
+            if current and current_bytes + size > max_shard_bytes:
+                groups.append(current)
+                current, current_bytes = [], 0
+            current.append(audio_file)
+            current_bytes += size
+        groups.append(current)
+
+        for shard_number, group in enumerate(groups):
+            key = shard_key(class_dir.name, shard_number)
+            shard_path = output_dir / key
+            tmp_path = shard_path.with_suffix(".tar.tmp")
+            with tarfile.open(tmp_path, "w", format=tarfile.PAX_FORMAT) as archive:
+                for audio_file in group:
+                    archive.add(str(audio_file), arcname=f"{class_dir.name}/{audio_file.name}", recursive=False)
+            os.replace(tmp_path, shard_path)
+
+            members = _member_offsets(shard_path)
+            index["shards"].append({
+                "key": key,
+                "class": class_dir.name,
+                "size": shard_path.stat().st_size,
+                "count": len(members)
+            })
+            index["members"].extend(
+                {"name": name, "class": class_dir.name, "shard": key, "offset": offset, "size": size}
+                for name, offset, size in members
+            )
+        logger.info(f"Packed {len(files)} files of {class_dir.name} into {len(groups)} shard(s)")
+
+    write_index(output_dir, index)
+    return index
+
+
+def write_index(dataset_dir: Path, index: dict):
+    """Atomically write index.json"""
+    index_path = Path(dataset_dir) / INDEX_FILENAME
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
+
+def load_index(source) -> dict:
+    """
+    Load a shard index from a dataset directory, an index path or raw JSON bytes
+
+    Raises:
+        ValueError: if the index was written by a newer format version
+    """
+    if isinstance(source, (bytes, bytearray)):
+        index = json.loads(source)
+    else:
+        path = Path(source)
+        with open(path / INDEX_FILENAME if path.is_dir() else path, "r") as f:
+            index = json.load(f)
+    if index.get("format_version", 0) > SHARD_FORMAT_VERSION:
+        raise ValueError(f"Shard index format {index['format_version']} is newer than "
+                         f"supported ({SHARD_FORMAT_VERSION})")
+    return index
+
+
+def member_lookup(index: dict) -> Dict[str, dict]:
+    """Map member name ("<class>/<file>") to its index entry"""
+    return {member["name"]: member for member in index["members"]}
+
+
+def read_member(dataset_dir: Path, member: dict) -> bytes:
+    """Random access: read one member's bytes from a local shard with a single seek"""
+    with open(Path(dataset_dir) / member["shard"], "rb") as f:
+        f.seek(member["offset"])
+        return f.read(member["size"])
+
+
+def iter_shard_stream(fileobj: BinaryIO) -> Iterator[Tuple[str, bytes]]:
+    """
+    Stream (member name, bytes) out of a tar shard without seeking
+
+    Works on non-seekable streams such as an S3 response body.
+    """
+    with tarfile.open(fileobj=fileobj, mode="r|") as archive:
+        for member in archive:
+            if member.isfile():
+                yield member.name, archive.extractfile(member).read()
+
+
+def extract_shard(fileobj: BinaryIO, output_dir: Path) -> int:
+    """
+    Extract a (possibly streamed) shard into output_dir/<class>/<file>
+
+    Each file is written to a temporary name and renamed into place.
+
+    Returns:
+        Number of files written
+    """
+    written = 0
+    for name, data in iter_shard_stream(fileobj):
+        target = _safe_member_path(Path(output_dir), name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{target.name}.part")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+        written += 1
+    return written
+
+
+def unpack_directory(dataset_dir: Path, output_dir: Path, class_name: Optional[str] = None) -> int:
+    """Extract every local shard (optionally of one class) of a dataset; returns files written"""
+    index = load_index(dataset_dir)
+    written = 0
+    for shard in index["shards"]:
+        if class_name is not None and shard["class"] != class_name:
+            continue
+        with open(Path(dataset_dir) / shard["key"], "rb") as f:
+            written += extract_shard(f, output_dir)
+    return written
@@ -0,0 +1,408 @@
+"""
+Content-Addressed Audio Store for EcoSight
+Stores uploaded training audio under its SHA-256 digest so that
+re-uploads of the same recording are detected before they reach
+S3, augmentation or feature extraction.
+
+Layout:
+    extracted_audio/
+        gun_shot/
+            .index.json          (digest -> stored file metadata)
+            .index.lock          (serializes index updates across processes)
+            3f5a...e1.wav
+            9b0c...42.mp3
+
+Several processes share the store (API workers, retraining, the S3 sync),
+so a cached index is re-read whenever the file on disk changes, and
+digests missing from it are also looked up in the shared sample manifest.
+Files already in a class directory are hashed into its index by
+build_indexes, which the API runs in a background thread at startup.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import threading
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB read/hash chunks
+INDEX_FILENAME = ".index.json"
+LOCK_FILENAME = ".index.lock"
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg", ".flac")
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+MAX_ENTRY_BYTES = 100 * 1024 * 1024  # Reject archive members above 100 MB
+SPOOL_MAX_BYTES = 8 * 1024 * 1024  # Archive members below 8 MB stay in memory
+
+
+def hash_file(path: Path) -> str:
+    """
+    Compute the SHA-256 digest of a file on disk.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_archive(filename: str) -> bool:
+    """Check whether a filename looks like a supported archive"""
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def sniff_audio_format(head: bytes) -> Optional[str]:
+    """
+    Identify an audio container from its first bytes.
+
+    Args:
+        head: At least the first 12 bytes of the file
+
+    Returns:
+        Extension (e.g. ".wav") or None if the bytes are not recognised audio
+    """
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return ".wav"
+    if head[:4] == b"fLaC":
+        return ".flac"
+    if head[:4] == b"OggS":
+        return ".ogg"
+    if head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0):
+        return ".mp3"
+    return None
+
+
+def _spool(src: BinaryIO, max_bytes: int = MAX_ENTRY_BYTES) -> BinaryIO:
+    """Copy a stream into a rewound spooled temp file, enforcing a size cap"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    copied = 0
+    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+        copied += len(chunk)
+        if copied > max_bytes:
+            spooled.close()
+            raise ValueError(f"entry exceeds {max_bytes // (1024 * 1024)} MB limit")
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+def iter_archive_entries(fileobj: BinaryIO, filename: str) -> Iterator[Tuple[str, Optional[BinaryIO], Optional[str]]]:
+    """
+    Stream the regular-file members out of a zip or tar archive.
+
+    Tar archives are read in stream mode (``r|*``) and zip members are
+    opened one at a time, so the archive is never buffered as a whole.
+    Each member is spooled so it can be handed to a worker thread.
+
+    Args:
+        fileobj: Archive file object (zip requires it to be seekable)
+        filename: Archive filename, used to pick the format
+
+    Yields:
+        (member_name, spooled_file, error) - spooled_file is None on error
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                if info.file_size > MAX_ENTRY_BYTES:
+                    yield info.filename, None, "entry exceeds size limit"
+                    continue
+                try:
+                    with archive.open(info) as member:
+                        yield info.filename, _spool(member), None
+                except Exception as e:
+                    yield info.filename, None, str(e)
+    else:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                if member.size > MAX_ENTRY_BYTES:
+                    yield member.name, None, "entry exceeds size limit"
+                    continue
+                try:
+                    yield member.name, _spool(archive.extractfile(member)), None
+                except Exception as e:
+                    yield member.name, None, str(e)
+
+
+class ContentAddressedAudioStore:
+    """Deduplicating, content-addressed store for training audio"""
+
+    def __init__(self, root_dir: Path, manifest=None):
+        """
+        Initialize the store
+
+        Args:
+            root_dir: Directory holding one subdirectory per class
+            manifest: Optional SampleManifest that new files are recorded in
+        """
+        self.root_dir = Path(root_dir)
+        self.manifest = manifest
+        self._indexes: Dict[str, dict] = {}
+        self._index_stamps: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _index_path(self, class_name: str) -> Path:
+        return self.root_dir / class_name / INDEX_FILENAME
+
+    @contextmanager
+    def _locked(self, class_name: str):
+        """Hold the in-process lock and, where supported, an exclusive lock on the class's lock file"""
+        with self._lock:
+            if not FCNTL_AVAILABLE:
+                yield
+                return
+            class_dir = self.root_dir / class_name
+            class_dir.mkdir(parents=True, exist_ok=True)
+            with open(class_dir / LOCK_FILENAME, "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _index_stamp(self, class_name: str) -> Optional[tuple]:
+        try:
+            stat = self._index_path(class_name).stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load_index(self, class_name: str) -> dict:
+        """
+        Load the index for a class, re-reading it if another process changed it.
+        Caller must hold the lock.
+
+        Never hashes the class directory: files stored before the index
+        existed are adopted by build_index, off the request path.
+        """
+        stamp = self._index_stamp(class_name)
+        if class_name in self._indexes and self._index_stamps.get(class_name) == stamp:
+            return self._indexes[class_name]
+
+        index_path = self._index_path(class_name)
+        index = {}
+        if stamp is not None:
+            try:
+                with open(index_path, 'r') as f:
+                    index = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Corrupt index {index_path}, ignoring until the next build_index: {e}")
+                index = {}
+
+        self._indexes[class_name] = index
+        self._index_stamps[class_name] = stamp
+        return index
+
+    def build_index(self, class_name: str) -> int:
+        """
+        Adopt audio files in a class directory that the index does not list yet
+        (e.g. timestamped uploads from before the store existed).
+
+        Only unlisted files are hashed, and the hashing runs without holding
+        the lock, so uploads and other processes are not blocked meanwhile.
+
+        Args:
+            class_name: Class label (subdirectory name)
+
+        Returns:
+            Number of files added to the index
+        """
+        class_dir = self.root_dir / class_name
+        if not class_dir.is_dir():
+            return 0
+        with self._locked(class_name):
+            listed = {entry["filename"] for entry in self._load_index(class_name).values()}
+
+        found = {}
+        for audio_file in sorted(class_dir.iterdir()):
+            if audio_file.suffix.lower() not in AUDIO_EXTENSIONS or audio_file.name in listed:
+                continue
+            try:
+                stat = audio_file.stat()
+                found.setdefault(hash_file(audio_file), {
+                    "filename": audio_file.name,
+                    "original_filename": audio_file.name,
+                    "size": stat.st_size,
+                    "ingested_at": datetime.fromtimestamp(stat.st_mtime).isoformat()
+                })
+            except OSError:
+                continue  # removed while scanning
+
+        if not found:
+            return 0
+        added = 0
+        with self._locked(class_name):
+            index = self._load_index(class_name)
+            for digest, entry in found.items():
+                current = index.get(digest)
+                if current is None or not (class_dir / current["filename"]).exists():
+                    index[digest] = entry
+                    added += 1
+            if added:
+                self._save_index(class_name)
+        if added:
+            logger.info(f"Indexed {added} existing files for class {class_name}")
+        return added
+
+    def build_indexes(self) -> Dict[str, int]:
+        """
+        Run build_index for every class directory under the store root
+
+        Returns:
+            Dict of class name -> number of files added
+        """
+        if not self.root_dir.is_dir():
+            return {}
+        return {
+            class_dir.name: self.build_index(class_dir.name)
+            for class_dir in sorted(self.root_dir.iterdir())
+            if class_dir.is_dir()
+        }
+
+    def _save_index(self, class_name: str):
+        """Atomically persist the index for a class. Caller must hold the lock."""
+        index_path = self._index_path(class_name)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = index_path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self._indexes[class_name], f, indent=2)
+        os.replace(tmp_path, index_path)
+        self._index_stamps[class_name] = self._index_stamp(class_name)
+
+    def _find(self, class_name: str, digest: str) -> Optional[Path]:
+        """
+        Stored file with this digest, or None. Caller must hold the lock.
+
+        Falls back to the sample manifest for files that reached the class
+        directory without passing through this store (e.g. the S3 sync) and
+        adds them to the index.
+        """
+        class_dir = self.root_dir / class_name
+        index = self._load_index(class_name)
+        entry = index.get(digest)
+        if entry is not None and (class_dir / entry["filename"]).exists():
+            return class_dir / entry["filename"]
+        if self.manifest is None:
+            return None
+        try:
+            paths = self.manifest.paths_for_digest(digest, class_name)
+        except Exception as e:
+            logger.warning(f"Sample manifest lookup failed for {digest[:12]}: {e}")
+            return None
+        for path in paths:
+            if path.parent == class_dir.resolve() and path.exists():
+                stat = path.stat()
+                index[digest] = {
+                    "filename": path.name,
+                    "original_filename": path.name,
+                    "size": stat.st_size,
+                    "ingested_at": datetime.fromtimestamp(stat.st_mtime).isoformat()
+                }
+                self._save_index(class_name)
+                return path
+        return None
+
+    def contains(self, class_name: str, digest: str) -> bool:
+        """Check whether a digest is already stored for a class"""
+        with self._locked(class_name):
+            return self._find(class_name, digest) is not None
+
+    def save_stream(self, fileobj: BinaryIO, class_name: str, filename: str) -> dict:
+        """
+        Stream a file into the store, hashing it as it is written.
+
+        The bytes go to a temporary file in the class directory; once the
+        digest is known the file is either atomically renamed to
+        ``<digest><ext>`` or discarded as a duplicate.
+
+        Args:
+            fileobj: Readable binary file object
+            class_name: Class label (subdirectory name)
+            filename: Original client filename (used for the extension)
+
+        Returns:
+            Dict with sha256, path, size, is_new and original_filename
+        """
+        class_dir = self.root_dir / class_name
+        class_dir.mkdir(parents=True, exist_ok=True)
+
+        safe_filename = Path(filename).name
+        suffix = Path(safe_filename).suffix.lower() or ".wav"
+
+        digest = hashlib.sha256()
+        size = 0
+        tmp = tempfile.NamedTemporaryFile(dir=class_dir, prefix=".upload-", suffix=".part", delete=False)
+        tmp_path = Path(tmp.name)
+        try:
+            with tmp:
+                for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            sha256 = digest.hexdigest()
+
+            with self._locked(class_name):
+                existing = self._find(class_name, sha256)
+                if existing is not None:
+                    tmp_path.unlink()
+                    logger.info(f"Duplicate upload {safe_filename} matches {existing.name} ({class_name})")
+                    return {
+                        "sha256": sha256,
+                        "path": existing,
+                        "size": size,
+                        "is_new": False,
+                        "original_filename": safe_filename
+                    }
+
+                stored_name = f"{sha256}{suffix}"
+                final_path = class_dir / stored_name
+                os.replace(tmp_path, final_path)
+                self._indexes[class_name][sha256] = {
+                    "filename": stored_name,
+                    "original_filename": safe_filename,
+                    "size": size,
+                    "ingested_at": datetime.now().isoformat()
+                }
+                self._save_index(class_name)
+        except Exception:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+
+        if self.manifest is not None:
+            try:
+                self.manifest.record(final_path, sha256, class_name, "upload")
+            except Exception as e:
+                logger.warning(f"Could not record {stored_name} in the sample manifest: {e}")
+
+        return {
+            "sha256": sha256,
+            "path": final_path,
+            "size": size,
+            "is_new": True,
+            "original_filename": safe_filename
+        }
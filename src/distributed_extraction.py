@@ -0,0 +1,526 @@
+"""
+Distributed YAMNet Feature Extraction for EcoSight
+Splits the clips a retraining run still has to embed into shards and
+leases them to any number of extraction workers (processes or hosts)
+through a SQLite table on shared storage - no message broker.
+
+    coordinator: create_job -> (works shards itself) -> wait -> merge_results
+    workers:     claim shard -> embed -> write embedding shard -> complete
+
+Layout (EXTRACTION_WORK_DIR, on storage every worker mounts):
+    distributed/
+        leases.db                     (jobs + shards tables)
+        jobs/<job_id>/
+            shard-00000.json          (keys and clip paths relative to the data root)
+            embeddings-00000.npz      (keys + float32 embeddings, written by a worker)
+
+A lease expires unless its worker renews it (a heartbeat thread renews it
+every third of the lease), so shards of crashed or partitioned workers go
+back to the pool. A shard that keeps losing its worker is marked failed
+after MAX_ATTEMPTS; the coordinator embeds whatever is still missing
+itself. The database uses a rollback journal rather than WAL, since WAL
+needs shared memory that does not work across hosts; the shared
+filesystem must support POSIX locks (e.g. NFSv4).
+"""
+
+import json
+import logging
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from src.embedding_pipeline import PipelinedEmbeddingExtractor
+except ImportError:
+    from embedding_pipeline import PipelinedEmbeddingExtractor
+
+logger = logging.getLogger(__name__)
+
+DB_FILENAME = "leases.db"
+JOBS_DIRNAME = "jobs"
+DEFAULT_SHARD_SIZE = 512
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 5.0
+JOB_STATUSES = ("open", "finished", "cancelled")
+SHARD_STATUSES = ("pending", "leased", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    data_root TEXT NOT NULL,
+    num_shards INTEGER NOT NULL,
+    num_items INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    job_id TEXT NOT NULL,
+    shard_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    num_items INTEGER NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    embedded INTEGER,
+    errors INTEGER,
+    last_error TEXT,
+    updated_at REAL,
+    PRIMARY KEY (job_id, shard_id)
+);
+CREATE INDEX IF NOT EXISTS shards_status ON shards (status, job_id, shard_id);
+"""
+
+
+def default_worker_id() -> str:
+    """hostname-pid, unique per worker process"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseTable:
+    """Jobs and shard leases in a SQLite database on shared storage (thread-safe)"""
+
+    def __init__(self, work_dir: Path):
+        """
+        Open (or create) the lease table
+
+        Args:
+            work_dir: Shared directory holding leases.db and the job files
+        """
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit; claims and completions open their own IMMEDIATE transactions
+        self._conn = sqlite3.connect(str(self.work_dir / DB_FILENAME), timeout=60,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.work_dir / JOBS_DIRNAME / job_id
+
+    def shard_path(self, job_id: str, shard_id: int) -> Path:
+        return self.job_dir(job_id) / f"shard-{shard_id:05d}.json"
+
+    def result_path(self, job_id: str, shard_id: int) -> Path:
+        return self.job_dir(job_id) / f"embeddings-{shard_id:05d}.npz"
+
+    def _transaction(self, fn):
+        """Run fn(conn) inside BEGIN IMMEDIATE (one writer across all hosts)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # ----------------------------------------------------------- coordinator
+
+    def create_job(self, items: List[Tuple[str, Path]], data_root: Path, model_version: str,
+                   shard_size: int = DEFAULT_SHARD_SIZE) -> str:
+        """
+        Split (key, clip path) items into shard files and open a job for them
+
+        Args:
+            items: Feature store key and audio path of every clip to embed
+            data_root: Directory the paths are stored relative to (workers may mount it elsewhere)
+            model_version: Embedding model URL the workers must load
+            shard_size: Clips per shard
+
+        Returns:
+            Job id
+        """
+        job_id = uuid.uuid4().hex[:12]
+        data_root = Path(data_root).resolve()
+        job_dir = self.job_dir(job_id)
+        job_dir.mkdir(parents=True)
+
+        shards = [items[start:start + shard_size] for start in range(0, len(items), shard_size)]
+        for shard_id, shard in enumerate(shards):
+            entries = []
+            for key, path in shard:
+                path = Path(path).resolve()
+                entries.append([key, str(path.relative_to(data_root)) if data_root in path.parents else str(path)])
+            with open(self.shard_path(job_id, shard_id), "w") as f:
+                json.dump({"items": entries}, f)
+
+        now = time.time()
+
+        def insert(conn):
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, model_version, data_root, num_shards, num_items, created_at) "
+                "VALUES (?, 'open', ?, ?, ?, ?, ?)",
+                (job_id, model_version, str(data_root), len(shards), len(items), datetime.now().isoformat())
+            )
+            conn.executemany(
+                "INSERT INTO shards (job_id, shard_id, status, num_items, updated_at) VALUES (?, ?, 'pending', ?, ?)",
+                [(job_id, shard_id, len(shard), now) for shard_id, shard in enumerate(shards)]
+            )
+
+        self._transaction(insert)
+        logger.info(f"Extraction job {job_id}: {len(items):,} clips in {len(shards)} shards")
+        return job_id
+
+    def set_job_status(self, job_id: str, status: str):
+        """Close a job ("finished" or "cancelled"); workers stop claiming its shards"""
+        if status not in JOB_STATUSES:
+            raise ValueError(f"Unknown job status '{status}' (expected one of {', '.join(JOB_STATUSES)})")
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE jobs SET status = ? WHERE job_id = ?", (status, job_id)
+        ))
+
+    # ---------------------------------------------------------------- workers
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def open_jobs(self) -> List[dict]:
+        """Open jobs, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'open' ORDER BY created_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim(self, worker_id: str, lease_seconds: float = LEASE_SECONDS,
+              job_id: Optional[str] = None) -> Optional[dict]:
+        """
+        Lease the next pending (or expired) shard of an open job
+
+        Args:
+            worker_id: Claiming worker
+            lease_seconds: Lease length (renew() extends it)
+            job_id: Only claim shards of this job (optional)
+
+        Returns:
+            Shard row (job_id, shard_id, attempts, ...) or None if nothing is claimable
+        """
+        def take(conn):
+            now = time.time()
+            while True:
+                row = conn.execute(
+                    "SELECT s.* FROM shards s JOIN jobs j ON j.job_id = s.job_id "
+                    "WHERE j.status = 'open' AND (? IS NULL OR s.job_id = ?) "
+                    "AND (s.status = 'pending' OR (s.status = 'leased' AND s.lease_expires < ?)) "
+                    "ORDER BY j.created_at, s.shard_id LIMIT 1",
+                    (job_id, job_id, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["attempts"] >= MAX_ATTEMPTS:
+                    conn.execute(
+                        "UPDATE shards SET status = 'failed', updated_at = ?, "
+                        "last_error = COALESCE(last_error, 'lease expired') WHERE job_id = ? AND shard_id = ?",
+                        (now, row["job_id"], row["shard_id"])
+                    )
+                    continue
+                if row["status"] == "leased":
+                    logger.warning(f"Lease of shard {row['shard_id']} ({row['job_id']}) held by "
+                                   f"{row['worker']} expired; reclaiming")
+                conn.execute(
+                    "UPDATE shards SET status = 'leased', worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE job_id = ? AND shard_id = ?",
+                    (worker_id, now + lease_seconds, now, row["job_id"], row["shard_id"])
+                )
+                return {**dict(row), "worker": worker_id, "attempts": row["attempts"] + 1}
+
+        return self._transaction(take)
+
+    def renew(self, job_id: str, shard_id: int, worker_id: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """Extend a lease; False if the worker no longer holds it"""
+        now = time.time()
+        return self._transaction(lambda conn: conn.execute(
+            "UPDATE shards SET lease_expires = ?, updated_at = ? "
+            "WHERE job_id = ? AND shard_id = ? AND status = 'leased' AND worker = ?",
+            (now + lease_seconds, now, job_id, shard_id, worker_id)
+        ).rowcount == 1)
+
+    def complete(self, job_id: str, shard_id: int, worker_id: str, embedded: int, errors: int) -> bool:
+        """Mark a shard done (its result file is written); False if the lease was lost to another worker"""
+        return self._transaction(lambda conn: conn.execute(
+            "UPDATE shards SET status = 'done', embedded = ?, errors = ?, lease_expires = NULL, updated_at = ? "
+            "WHERE job_id = ? AND shard_id = ? AND status = 'leased' AND worker = ?",
+            (embedded, errors, time.time(), job_id, shard_id, worker_id)
+        ).rowcount == 1)
+
+    def release(self, job_id: str, shard_id: int, worker_id: str, error: str):
+        """Give a shard back after an error (failed once it has used MAX_ATTEMPTS)"""
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "worker = NULL, lease_expires = NULL, last_error = ?, updated_at = ? "
+            "WHERE job_id = ? AND shard_id = ? AND status = 'leased' AND worker = ?",
+            (MAX_ATTEMPTS, error[:500], time.time(), job_id, shard_id, worker_id)
+        ))
+
+    def progress(self, job_id: str) -> Dict[str, int]:
+        """Shard counts by status, plus "embedded" clips so far"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS shards, COALESCE(SUM(embedded), 0) AS embedded "
+                "FROM shards WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall()
+        counts = {status: 0 for status in SHARD_STATUSES}
+        counts["embedded"] = 0
+        for row in rows:
+            counts[row["status"]] = row["shards"]
+            counts["embedded"] += row["embedded"]
+        return counts
+
+    def done_shards(self, job_id: str) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT shard_id FROM shards WHERE job_id = ? AND status = 'done' ORDER BY shard_id", (job_id,)
+            ).fetchall()
+        return [row["shard_id"] for row in rows]
+
+
+def _finished(counts: Dict[str, int]) -> bool:
+    return counts["pending"] == 0 and counts["leased"] == 0
+
+
+def process_shard(table: LeaseTable, shard: dict, yamnet_model, data_root: Optional[Path] = None,
+                  lease_seconds: float = LEASE_SECONDS, decode_workers: Optional[int] = None,
+                  batch_size: Optional[int] = None) -> bool:
+    """
+    Embed one leased shard and write its embedding file
+
+    A heartbeat thread renews the lease while YAMNet runs. If the lease is
+    lost (another worker reclaimed it) the result is still written - both
+    workers produce the same embeddings - but the shard is not completed here.
+
+    Args:
+        table: Lease table
+        shard: Row returned by claim()
+        yamnet_model: Loaded model for the job's model_version
+        data_root: Where this worker mounts the job's data root (default: the coordinator's path)
+        lease_seconds: Lease length used for renewals
+        decode_workers, batch_size: PipelinedEmbeddingExtractor tuning (None = auto)
+
+    Returns:
+        True if the shard was completed by this worker
+    """
+    job_id, shard_id, worker_id = shard["job_id"], shard["shard_id"], shard["worker"]
+    root = Path(data_root or table.get_job(job_id)["data_root"])
+    with open(table.shard_path(job_id, shard_id)) as f:
+        items = [(key, root / path) for key, path in json.load(f)["items"]]
+
+    stop = threading.Event()
+    lost = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(lease_seconds / 3):
+            try:
+                if not table.renew(job_id, shard_id, worker_id, lease_seconds):
+                    lost.set()
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"Could not renew lease of shard {shard_id}: {e}")
+
+    beat = threading.Thread(target=heartbeat, name=f"lease-{shard_id}", daemon=True)
+    beat.start()
+    try:
+        extractor = PipelinedEmbeddingExtractor(yamnet_model, decode_workers=decode_workers, batch_size=batch_size)
+        keys, embeddings, errors = [], [], 0
+        for key, embedding, error in extractor.extract(items):
+            if embedding is None:
+                logger.warning(f"Shard {shard_id}: could not embed {key}: {error}")
+                errors += 1
+                continue
+            keys.append(key)
+            embeddings.append(np.asarray(embedding, dtype=np.float32))
+
+        result_path = table.result_path(job_id, shard_id)
+        tmp_path = result_path.with_name(f".{result_path.stem}.{worker_id}.tmp.npz")
+        np.savez(tmp_path, keys=np.array(keys, dtype=str),
+                 embeddings=np.stack(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32))
+        os.replace(tmp_path, result_path)
+    except BaseException as e:
+        # Errors and interrupts give the shard back right away instead of at lease expiry
+        stop.set()
+        table.release(job_id, shard_id, worker_id, f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        stop.set()
+        beat.join()
+
+    if lost.is_set():
+        logger.warning(f"Lost the lease of shard {shard_id} ({job_id}) while embedding it")
+        return False
+    return table.complete(job_id, shard_id, worker_id, embedded=len(keys), errors=errors)
+
+
+def run_worker(table: LeaseTable, get_model: Callable[[str], object], worker_id: Optional[str] = None,
+               job_id: Optional[str] = None, data_root: Optional[Path] = None,
+               lease_seconds: float = LEASE_SECONDS, wait: bool = True, poll_seconds: float = POLL_SECONDS,
+               idle_exit_seconds: Optional[float] = None,
+               progress: Optional[Callable[[Dict[str, int]], None]] = None,
+               decode_workers: Optional[int] = None, batch_size: Optional[int] = None) -> Dict[str, int]:
+    """
+    Claim and embed shards until there is nothing left to do
+
+    Args:
+        table: Lease table
+        get_model: Returns the loaded embedding model for a job's model_version
+        worker_id: Lease owner name (default: hostname-pid)
+        job_id: Only work on this job; return once it has no pending or leased shards
+        data_root: Where this worker mounts the jobs' data root
+        lease_seconds: Lease length
+        wait: Keep polling while other workers hold leases (or, without job_id, for new jobs)
+        poll_seconds: Sleep between polls
+        idle_exit_seconds: Without job_id, stop after this long with no work (None = never)
+        progress: Called with the job's progress counts after every shard and poll (job_id only)
+        decode_workers, batch_size: PipelinedEmbeddingExtractor tuning
+
+    Returns:
+        Dict with completed, lost and failed shard counts
+    """
+    worker_id = worker_id or default_worker_id()
+    stats = {"completed": 0, "lost": 0, "failed": 0}
+    idle_since = time.monotonic()
+    while True:
+        shard = table.claim(worker_id, lease_seconds, job_id=job_id)
+        if shard is not None:
+            job = table.get_job(shard["job_id"])
+            logger.info(f"{worker_id}: shard {shard['shard_id'] + 1}/{job['num_shards']} of {job['job_id']} "
+                        f"({shard['num_items']} clips, attempt {shard['attempts']})")
+            try:
+                completed = process_shard(table, shard, get_model(job["model_version"]), data_root,
+                                          lease_seconds, decode_workers, batch_size)
+                stats["completed" if completed else "lost"] += 1
+            except Exception as e:
+                logger.error(f"{worker_id}: shard {shard['shard_id']} of {job['job_id']} failed: {e}")
+                stats["failed"] += 1
+            idle_since = time.monotonic()
+        if job_id is not None:
+            counts = table.progress(job_id)
+            if progress is not None:
+                progress(counts)
+            job = table.get_job(job_id)
+            if _finished(counts) or job is None or job["status"] != "open":
+                return stats
+        elif shard is None and idle_exit_seconds is not None \
+                and time.monotonic() - idle_since >= idle_exit_seconds:
+            return stats
+        if shard is None:
+            if not wait:
+                return stats
+            time.sleep(poll_seconds)
+
+
+def merge_results(table: LeaseTable, job_id: str, feature_store) -> Dict[str, int]:
+    """
+    Copy the embeddings of every completed shard into the feature store
+
+    Args:
+        table: Lease table
+        job_id: Job to merge
+        feature_store: EmbeddingFeatureStore (or anything with put(key, embedding) and flush())
+
+    Returns:
+        Dict with merged (new embeddings), shards and missing_files counts
+    """
+    stats = {"merged": 0, "shards": 0, "missing_files": 0}
+    for shard_id in table.done_shards(job_id):
+        path = table.result_path(job_id, shard_id)
+        if not path.exists():
+            stats["missing_files"] += 1
+            continue
+        with np.load(path) as result:
+            for key, embedding in zip(result["keys"], result["embeddings"]):
+                stats["merged"] += bool(feature_store.put(str(key), embedding))
+        stats["shards"] += 1
+    feature_store.flush()
+    return stats
+
+
+def remove_job_files(table: LeaseTable, job_id: str):
+    """Delete a merged job's shard and embedding files (the table rows stay as history)"""
+    shutil.rmtree(table.job_dir(job_id), ignore_errors=True)
+
+
+def extract_distributed(work_dir: Path, items: Iterable[Tuple[str, Path]], data_root: Path,
+                        model_version: str, yamnet_model, feature_store,
+                        shard_size: int = DEFAULT_SHARD_SIZE, lease_seconds: float = LEASE_SECONDS,
+                        participate: bool = True, poll_seconds: float = POLL_SECONDS,
+                        progress: Optional[Callable[[Dict[str, int]], None]] = None,
+                        decode_workers: Optional[int] = None, batch_size: Optional[int] = None) -> dict:
+    """
+    Coordinator: shard the items, let workers (and optionally this process) embed them, then merge
+
+    If this returns early (e.g. progress raises to cancel the run), the job
+    is closed as cancelled so workers stop claiming its shards.
+
+    Args:
+        work_dir: Shared extraction directory
+        items: (feature store key, audio path) of every clip to embed
+        data_root: Directory the audio paths live under
+        model_version: Embedding model URL (workers load the same one)
+        yamnet_model: Loaded model, used when this process works shards too
+        feature_store: Where merged embeddings go (put, flush and "in")
+        shard_size: Clips per shard
+        lease_seconds: Lease length
+        participate: Also embed shards in this process (otherwise only wait for workers)
+        poll_seconds: Sleep between progress checks
+        progress: Called with shard counts while the job runs
+        decode_workers, batch_size: PipelinedEmbeddingExtractor tuning
+
+    Returns:
+        Dict with job_id, shard counts, merged embeddings, seconds and
+        remaining: the items still missing from the feature store (failed
+        shards or clips), for the coordinator to embed itself
+    """
+    start = time.perf_counter()
+    items = list(items)
+    table = LeaseTable(work_dir)
+    job_id = table.create_job(items, data_root, model_version, shard_size)
+    status = "cancelled"
+    try:
+        if participate:
+            run_worker(table, lambda _: yamnet_model, job_id=job_id, lease_seconds=lease_seconds,
+                       poll_seconds=poll_seconds, progress=progress,
+                       decode_workers=decode_workers, batch_size=batch_size)
+        else:
+            while True:
+                counts = table.progress(job_id)
+                if progress is not None:
+                    progress(counts)
+                if _finished(counts):
+                    break
+                time.sleep(poll_seconds)
+        status = "finished"
+    finally:
+        table.set_job_status(job_id, status)
+
+    counts = table.progress(job_id)
+    merged = merge_results(table, job_id, feature_store)
+    remove_job_files(table, job_id)
+    table.close()
+    return {
+        "job_id": job_id,
+        "shards": counts,
+        "merged": merged["merged"],
+        "missing_files": merged["missing_files"],
+        "remaining": [(key, path) for key, path in items if key not in feature_store],
+        "seconds": round(time.perf_counter() - start, 2)
+    }
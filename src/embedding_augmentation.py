@@ -0,0 +1,85 @@
+"""
+Embedding-space Augmentation for EcoSight
+Synthesises extra training samples directly on cached 1024-d YAMNet
+embeddings (mixup + Gaussian noise), generated per batch during training.
+No YAMNet forward passes are needed, so it can replace part or all of the
+waveform augmentation.
+
+Mixup: x = lam * x_i + (1 - lam) * x_j and y = lam * y_i + (1 - lam) * y_j,
+with lam ~ Beta(alpha, alpha) and (i, j) random training pairs.
+"""
+
+import math
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+
+def mixup(X: np.ndarray, y: np.ndarray, num_samples: int, rng,
+          alpha: float = 0.2, noise_std: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Synthesise samples by mixing random pairs of embeddings and their labels
+
+    Args:
+        X: Embeddings, shape (n, dim)
+        y: One-hot (or soft) labels, shape (n, num_classes)
+        num_samples: Number of synthetic samples to create
+        rng: np.random.RandomState
+        alpha: Beta distribution parameter (small = mostly one parent)
+        noise_std: Std of Gaussian noise added to the mixed embeddings
+
+    Returns:
+        (X_mixed, y_mixed) float32 arrays
+    """
+    first = rng.randint(0, len(X), size=num_samples)
+    second = rng.randint(0, len(X), size=num_samples)
+    lam = rng.beta(alpha, alpha, size=num_samples).astype(np.float32)[:, None]
+
+    X_mixed = lam * X[first] + (1 - lam) * X[second]
+    y_mixed = lam * y[first] + (1 - lam) * y[second]
+    if noise_std > 0:
+        X_mixed += rng.normal(0, noise_std, size=X_mixed.shape).astype(np.float32)
+    return X_mixed.astype(np.float32), y_mixed.astype(np.float32)
+
+
+def mixup_batches(X: np.ndarray, y: np.ndarray, batch_size: int = 64, alpha: float = 0.2,
+                  expansion: float = 1.0, noise_std: float = 0.05,
+                  seed: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Endless generator of training batches: real samples plus fresh mixup samples
+
+    Each epoch walks the real samples in a new random order; every batch of
+    batch_size real samples is extended with round(batch_size * expansion)
+    synthetic ones, so no two epochs see the same synthetic data.
+
+    Args:
+        X: Normalised training embeddings, shape (n, dim)
+        y: One-hot labels, shape (n, num_classes)
+        batch_size: Real samples per batch
+        alpha: Mixup Beta parameter
+        expansion: Synthetic samples per real sample
+        noise_std: Gaussian noise std for synthetic samples (in normalised units)
+        seed: Seed for reproducible batches
+
+    Yields:
+        (X_batch, y_batch) float32 arrays
+    """
+    rng = np.random.RandomState(seed)
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    num_synthetic = int(round(batch_size * expansion))
+
+    while True:
+        order = rng.permutation(len(X))
+        for start in range(0, len(X), batch_size):
+            idx = order[start:start + batch_size]
+            if num_synthetic:
+                X_mixed, y_mixed = mixup(X, y, num_synthetic, rng, alpha=alpha, noise_std=noise_std)
+                yield np.concatenate([X[idx], X_mixed]), np.concatenate([y[idx], y_mixed])
+            else:
+                yield X[idx], y[idx]
+
+
+def steps_per_epoch(num_samples: int, batch_size: int) -> int:
+    """Batches per pass over the real training samples"""
+    return max(1, math.ceil(num_samples / batch_size))
@@ -0,0 +1,238 @@
+"""
+Out-of-Core Embedding Loader for EcoSight
+Streams training batches straight from the embedding feature store's
+memory-mapped shards, so peak training memory depends on the batch and
+shuffle buffer sizes rather than on the number of samples.
+
+    keys -> block-shuffled reads -> shuffle buffer -> batches -> prefetch queue
+
+- Normalization statistics (the scalar mean/std the classifier uses) and
+  per-class centroids are computed in one streaming pass
+- Train/validation/test membership comes from a hash of each sample key,
+  so no split needs the full dataset in memory and a sample stays in the
+  same split across runs
+"""
+
+import hashlib
+import logging
+import queue
+import threading
+from typing import Dict, Iterator, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from src.embedding_augmentation import mixup
+except ImportError:
+    from embedding_augmentation import mixup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHUFFLE_BUFFER = 8192
+DEFAULT_BLOCK_SIZE = 256
+DEFAULT_PREFETCH_BATCHES = 8
+STATS_CHUNK_SIZE = 4096
+
+
+def split_for_key(key: str, test_fraction: float = 0.15, val_fraction: float = 0.15,
+                  seed: int = 42) -> str:
+    """
+    Deterministic split of one sample: "train", "val" or "test"
+
+    Args:
+        key: Sample key (feature store key)
+        test_fraction: Share of samples held out for testing
+        val_fraction: Share of samples used for validation
+        seed: Changes the assignment when changed
+
+    Returns:
+        Split name
+    """
+    digest = hashlib.blake2b(f"{seed}:{key}".encode(), digest_size=8).digest()
+    position = int.from_bytes(digest, "big") / 2 ** 64
+    if position < test_fraction:
+        return "test"
+    if position < test_fraction + val_fraction:
+        return "val"
+    return "train"
+
+
+def split_indices(keys: Sequence[str], test_fraction: float = 0.15, val_fraction: float = 0.15,
+                  seed: int = 42) -> Dict[str, np.ndarray]:
+    """Indices of keys in each split ({"train": ..., "val": ..., "test": ...})"""
+    names = np.array([split_for_key(key, test_fraction, val_fraction, seed) for key in keys])
+    return {name: np.flatnonzero(names == name) for name in ("train", "val", "test")}
+
+
+def streaming_statistics(store, keys: Sequence[str], labels: np.ndarray, num_classes: int,
+                         chunk_size: int = STATS_CHUNK_SIZE) -> dict:
+    """
+    Scalar mean/std over every element, plus per-class embedding sums, in one pass
+
+    Chunk moments are merged with Chan et al.'s parallel update in float64,
+    so the result matches X.mean() / X.std() without holding X.
+
+    Args:
+        store: Anything with get(key) -> 1-D embedding (e.g. EmbeddingFeatureStore)
+        keys: Sample keys
+        labels: Class index of each key
+        num_classes: Number of classes
+        chunk_size: Samples read per chunk
+
+    Returns:
+        Dict with mean, std, class_sums (num_classes x dim) and class_counts
+    """
+    count, mean, m2 = 0, 0.0, 0.0
+    class_sums, class_counts = None, np.zeros(num_classes, dtype=np.int64)
+    for start in range(0, len(keys), chunk_size):
+        chunk = np.stack([store.get(key) for key in keys[start:start + chunk_size]]).astype(np.float64)
+        chunk_labels = np.asarray(labels[start:start + chunk_size])
+        if class_sums is None:
+            class_sums = np.zeros((num_classes, chunk.shape[1]), dtype=np.float64)
+        np.add.at(class_sums, chunk_labels, chunk)
+        class_counts += np.bincount(chunk_labels, minlength=num_classes)
+
+        chunk_count, chunk_mean = chunk.size, float(chunk.mean())
+        chunk_m2 = float(((chunk - chunk_mean) ** 2).sum())
+        delta = chunk_mean - mean
+        total = count + chunk_count
+        mean += delta * chunk_count / total
+        m2 += chunk_m2 + delta ** 2 * count * chunk_count / total
+        count = total
+
+    return {
+        "mean": mean,
+        "std": float(np.sqrt(m2 / count)) if count else 1.0,
+        "class_sums": class_sums,
+        "class_counts": class_counts
+    }
+
+
+class EmbeddingBatchLoader:
+    """Re-iterable source of normalized (X, one-hot y) batches read from a feature store"""
+
+    def __init__(self, store, keys: Sequence[str], labels: np.ndarray, num_classes: int,
+                 mean: float, std: float, batch_size: int = 64, shuffle: bool = True,
+                 shuffle_buffer: int = DEFAULT_SHUFFLE_BUFFER, block_size: int = DEFAULT_BLOCK_SIZE,
+                 prefetch_batches: int = DEFAULT_PREFETCH_BATCHES, seed: int = 42,
+                 mixup_expansion: float = 0.0, mixup_alpha: float = 0.2, noise_std: float = 0.0):
+        """
+        Args:
+            store: Anything with get(key) -> 1-D embedding (e.g. EmbeddingFeatureStore)
+            keys: Sample keys in this split
+            labels: Class index of each key
+            num_classes: Width of the one-hot labels
+            mean, std: Normalization applied to every batch
+            batch_size: Real samples per batch
+            shuffle: Shuffle every epoch (off for validation/test)
+            shuffle_buffer: Samples held for shuffling (bounds memory)
+            block_size: Consecutive keys read together (keeps shard reads local)
+            prefetch_batches: Batches prepared ahead by the reader thread
+            seed: Base seed; epoch e uses seed + e
+            mixup_expansion: Synthetic mixup samples per real sample, mixed within each batch
+            mixup_alpha: Mixup Beta parameter
+            noise_std: Gaussian noise std for synthetic samples (normalized units)
+        """
+        self.store = store
+        self.keys = list(keys)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.num_classes = num_classes
+        self.mean, self.std = float(mean), float(std)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.shuffle_buffer = max(shuffle_buffer, batch_size)
+        self.block_size = block_size
+        self.prefetch_batches = prefetch_batches
+        self.seed = seed
+        self.num_synthetic = int(round(batch_size * mixup_expansion))
+        self.mixup_alpha = mixup_alpha
+        self.noise_std = noise_std
+        self.epoch = 0
+
+    def __len__(self) -> int:
+        """Batches per epoch"""
+        return -(-len(self.keys) // self.batch_size)
+
+    def _samples(self, rng) -> Iterator[Tuple[np.ndarray, int]]:
+        """(embedding, label) in block-shuffled order, mixed through the shuffle buffer"""
+        blocks = np.arange(0, len(self.keys), self.block_size)
+        if self.shuffle:
+            rng.shuffle(blocks)
+        buffer = []
+        for block_start in blocks:
+            for i in range(block_start, min(block_start + self.block_size, len(self.keys))):
+                item = (self.store.get(self.keys[i]), int(self.labels[i]))
+                if not self.shuffle:
+                    yield item
+                    continue
+                if len(buffer) < self.shuffle_buffer:
+                    buffer.append(item)
+                    continue
+                slot = rng.randint(len(buffer))
+                yield buffer[slot]
+                buffer[slot] = item
+        if self.shuffle:
+            for slot in rng.permutation(len(buffer)):
+                yield buffer[slot]
+
+    def _batches(self, rng) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        eye = np.eye(self.num_classes, dtype=np.float32)
+        embeddings, labels = [], []
+
+        def make_batch():
+            X = (np.stack(embeddings).astype(np.float32) - self.mean) / self.std
+            y = eye[labels]
+            if self.num_synthetic:
+                X_mixed, y_mixed = mixup(X, y, self.num_synthetic, rng,
+                                         alpha=self.mixup_alpha, noise_std=self.noise_std)
+                X, y = np.concatenate([X, X_mixed]), np.concatenate([y, y_mixed])
+            return X, y
+
+        for embedding, label in self._samples(rng):
+            embeddings.append(embedding)
+            labels.append(label)
+            if len(embeddings) == self.batch_size:
+                yield make_batch()
+                embeddings, labels = [], []
+        if embeddings:
+            yield make_batch()
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """One epoch of batches, prepared by a background reader thread"""
+        rng = np.random.RandomState(self.seed + self.epoch)
+        self.epoch += 1
+        prepared = queue.Queue(maxsize=self.prefetch_batches)
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    prepared.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for batch in self._batches(rng):
+                    if not put(batch):
+                        return
+                put(done)
+            except Exception as e:
+                put(e)
+
+        reader = threading.Thread(target=produce, daemon=True)
+        reader.start()
+        try:
+            while True:
+                item = prepared.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            reader.join()
@@ -0,0 +1,201 @@
+"""
+Pipelined YAMNet Embedding Extraction for EcoSight
+Overlaps audio decoding with YAMNet inference and batches many clips
+into a single YAMNet call.
+
+Pipeline:
+    decoder threads  ->  bounded prefetch queue  ->  batcher  ->  YAMNet
+
+Batching: the TF Hub YAMNet signature takes one 1-D waveform, so clips are
+concatenated. Each clip is zero-padded exactly as YAMNet pads a lone clip
+and then to a whole number of 0.48 s patch hops. Every patch therefore
+starts on a clip boundary grid and only ever sees its own clip's samples,
+so slicing the patch embeddings per clip gives the same mean embedding as
+calling YAMNet on each clip separately.
+"""
+
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import librosa
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+PATCH_HOP_SAMPLES = 7680  # 0.48 s patch hop
+MIN_PATCH_SAMPLES = 15600  # 0.96 s patch + 25 ms STFT window - 10 ms STFT hop
+
+AudioSource = Union[Path, str, np.ndarray]
+
+
+def yamnet_patch_count(num_samples: int) -> int:
+    """Number of patches YAMNet produces for a clip of num_samples (after its own padding)"""
+    extra = max(0, num_samples - MIN_PATCH_SAMPLES)
+    return 1 + math.ceil(extra / PATCH_HOP_SAMPLES)
+
+
+def segment_length(num_samples: int) -> int:
+    """Padded length of a clip inside a batch: YAMNet's padding rounded up to whole patch hops"""
+    padded = MIN_PATCH_SAMPLES + (yamnet_patch_count(num_samples) - 1) * PATCH_HOP_SAMPLES
+    return math.ceil(padded / PATCH_HOP_SAMPLES) * PATCH_HOP_SAMPLES
+
+
+def available_cores() -> int:
+    """CPU cores this process may run on (respects affinity/cgroup pinning)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class PipelinedEmbeddingExtractor:
+    """Decode clips in a thread pool while YAMNet embeds batches of earlier clips"""
+
+    def __init__(self, yamnet_model, decode_workers: Optional[int] = None,
+                 batch_size: Optional[int] = None, prefetch: Optional[int] = None,
+                 sr: int = SAMPLE_RATE, max_duration: float = 4):
+        """
+        Args:
+            yamnet_model: Loaded TF Hub YAMNet model
+            decode_workers: Decoder threads (default: cores - 1, at least 1)
+            batch_size: Clips per YAMNet call (default: scales with cores, 16-128)
+            prefetch: Decoded clips buffered ahead of inference (default: 2 batches)
+            sr: Sample rate to decode at (YAMNet requires 16 kHz)
+            max_duration: Seconds of audio kept per clip
+        """
+        cores = available_cores()
+        self.yamnet_model = yamnet_model
+        self.decode_workers = decode_workers or max(1, cores - 1)
+        self.batch_size = batch_size or min(128, max(16, 8 * cores))
+        self.prefetch = prefetch or 2 * self.batch_size
+        self.sr = sr
+        self.max_duration = max_duration
+        self.stats = {}
+
+    def _decode(self, source: AudioSource) -> Tuple[np.ndarray, float]:
+        """Decode one clip (arrays pass through, trimmed); returns (audio, seconds spent)"""
+        start = time.perf_counter()
+        if isinstance(source, np.ndarray):
+            audio = source[:int(self.max_duration * self.sr)]
+        else:
+            audio, _ = librosa.load(str(source), sr=self.sr, duration=self.max_duration)
+        return np.asarray(audio, dtype=np.float32), time.perf_counter() - start
+
+    def _embed_batch(self, clips):
+        """Run YAMNet once over a batch of clips; returns one mean embedding per clip"""
+        offsets = []
+        total = 0
+        for audio in clips:
+            offsets.append(total)
+            total += segment_length(len(audio))
+
+        waveform = np.zeros(total, dtype=np.float32)
+        for audio, offset in zip(clips, offsets):
+            waveform[offset:offset + len(audio)] = audio
+
+        _, embeddings, _ = self.yamnet_model(waveform)
+        embeddings = embeddings.numpy()
+
+        results = []
+        for audio, offset in zip(clips, offsets):
+            first = offset // PATCH_HOP_SAMPLES
+            results.append(embeddings[first:first + yamnet_patch_count(len(audio))].mean(axis=0))
+        return results
+
+    def extract(self, items: Iterable[Tuple[str, AudioSource]]) -> Iterator[Tuple[str, Optional[np.ndarray], Optional[str]]]:
+        """
+        Embed clips, yielding results in input order
+
+        Args:
+            items: (key, source) pairs; source is a file path or a decoded 16 kHz array
+
+        Yields:
+            (key, mean_embedding, error) - embedding is None when the clip failed to decode
+        """
+        stats = {"clips": 0, "failed": 0, "batches": 0, "decode_seconds": 0.0,
+                 "inference_seconds": 0.0, "stall_seconds": 0.0}
+        self.stats = stats
+        wall_start = time.perf_counter()
+        pending = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def produce(executor):
+            try:
+                for key, source in items:
+                    if stop.is_set():
+                        break
+                    pending.put((key, executor.submit(self._decode, source)))
+            finally:
+                pending.put(None)
+
+        with ThreadPoolExecutor(max_workers=self.decode_workers) as executor:
+            producer = threading.Thread(target=produce, args=(executor,), daemon=True)
+            producer.start()
+            try:
+                batch_keys, batch_clips = [], []
+                while True:
+                    wait_start = time.perf_counter()
+                    item = pending.get()
+                    if item is not None:
+                        key, future = item
+                        try:
+                            audio, decode_seconds = future.result()
+                        except Exception as e:
+                            stats["failed"] += 1
+                            yield key, None, str(e)
+                            continue
+                        finally:
+                            stats["stall_seconds"] += time.perf_counter() - wait_start
+                        stats["decode_seconds"] += decode_seconds
+                        batch_keys.append(key)
+                        batch_clips.append(audio)
+
+                    if batch_clips and (item is None or len(batch_clips) >= self.batch_size):
+                        infer_start = time.perf_counter()
+                        embeddings = self._embed_batch(batch_clips)
+                        stats["inference_seconds"] += time.perf_counter() - infer_start
+                        stats["batches"] += 1
+                        stats["clips"] += len(batch_clips)
+                        for batch_key, embedding in zip(batch_keys, embeddings):
+                            yield batch_key, embedding, None
+                        batch_keys, batch_clips = [], []
+
+                    if item is None:
+                        break
+            finally:
+                stop.set()
+                # Drain so a producer blocked on a full queue can exit
+                while producer.is_alive():
+                    try:
+                        pending.get_nowait()
+                    except queue.Empty:
+                        producer.join(timeout=0.1)
+
+        stats["wall_seconds"] = time.perf_counter() - wall_start
+
+    def throughput_report(self) -> dict:
+        """Per-stage throughput (clips/s) of the last extract() run"""
+        s = self.stats
+        if not s:
+            return {}
+        decoded = s["clips"] + s["failed"]
+        return {
+            "clips": s["clips"],
+            "failed": s["failed"],
+            "batches": s["batches"],
+            "decode_workers": self.decode_workers,
+            "batch_size": self.batch_size,
+            # Decoder throughput across all workers (CPU-seconds spread over the pool)
+            "decode_clips_per_s": decoded * self.decode_workers / s["decode_seconds"] if s["decode_seconds"] else 0.0,
+            "inference_clips_per_s": s["clips"] / s["inference_seconds"] if s["inference_seconds"] else 0.0,
+            "end_to_end_clips_per_s": s["clips"] / s["wall_seconds"] if s.get("wall_seconds") else 0.0,
+            "inference_stall_seconds": s["stall_seconds"]
+        }
@@ -0,0 +1,102 @@
+"""
+YAMNet Embedding Feature Store for EcoSight
+Caches mean YAMNet embeddings keyed by the audio file's content hash,
+so retraining only runs YAMNet on new or changed files.
+
+Each embedding model version gets its own shard store under FEATURES_DIR:
+    features/
+        yamnet-1-float16/
+            meta.json
+            index.jsonl
+            shard-00000.bin
+"""
+
+import re
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    from src.shard_store import ShardedArrayStore
+except ImportError:
+    from shard_store import ShardedArrayStore
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 1024
+
+
+def _version_slug(model_version: str) -> str:
+    """Turn a model URL/version into a directory-safe name"""
+    slug = re.sub(r"^https?://(tfhub\.dev/)?(google/)?", "", model_version)
+    return re.sub(r"[^A-Za-z0-9]+", "-", slug).strip("-").lower()
+
+
+class EmbeddingFeatureStore:
+    """Content-hash keyed cache of YAMNet embeddings"""
+
+    def __init__(self, features_dir: Path, model_version: str, dtype: str = "float32"):
+        """
+        Open the store for one embedding model version
+
+        Args:
+            features_dir: Root features directory
+            model_version: Embedding model identifier (e.g. the TF Hub URL)
+            dtype: Storage dtype, "float32" or "float16" (half the disk and page cache)
+        """
+        self.model_version = model_version
+        self.store_dir = Path(features_dir) / f"{_version_slug(model_version)}-{np.dtype(dtype).name}"
+        self.store = ShardedArrayStore(self.store_dir, dtype=dtype)
+        logger.info(f"Feature store {self.store_dir}: {len(self.store)} cached embeddings")
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self.store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def get(self, digest: str) -> Optional[np.ndarray]:
+        """Zero-copy embedding view for a content hash, or None if not cached"""
+        return self.store.get(digest)
+
+    def put(self, digest: str, embedding: np.ndarray, **extra) -> bool:
+        """Cache an embedding for a content hash; returns False if already cached"""
+        if embedding.shape[-1] != EMBEDDING_DIM:
+            raise ValueError(f"Expected {EMBEDDING_DIM}-d embedding, got shape {embedding.shape}")
+        return self.store.put(digest, embedding, **extra)
+
+    def load(self, digests: List[str]) -> np.ndarray:
+        """
+        Gather cached embeddings into one float32 matrix
+
+        Args:
+            digests: Content hashes, all of which must be cached
+
+        Returns:
+            Array of shape (len(digests), EMBEDDING_DIM)
+        """
+        X = np.empty((len(digests), EMBEDDING_DIM), dtype=np.float32)
+        for i, digest in enumerate(digests):
+            X[i] = self.store.get(digest)
+        return X
+
+    def flush(self):
+        """Persist appended embeddings"""
+        self.store.flush()
+
+    def watermark(self) -> dict:
+        """
+        Reference to the store's current end, for telling later embeddings apart
+
+        Returns:
+            Dict with the store directory name and its append position
+        """
+        return {"store": self.store_dir.name, "position": self.store.append_position()}
+
+    def added_since(self, digest: str, watermark: dict) -> bool:
+        """Whether an embedding was cached after watermark() was taken (unknown digests count as new)"""
+        if watermark.get("store") != self.store_dir.name:
+            raise ValueError(f"Watermark belongs to feature store {watermark.get('store')}, not {self.store_dir.name}")
+        return self.store.stored_since(digest, watermark["position"]) is not False
@@ -0,0 +1,274 @@
+"""
+Local Filesystem Storage for EcoSight
+The "local" StorageBackend: serves the bucket layout from a local or NFS
+directory (LOCAL_STORAGE_ROOT) with no network round-trips, for
+co-located deployments and tests.
+
+Files are placed with the cheapest safe method:
+    - hardlink: immutable audio (extracted_audio/, shards/), which every
+      writer replaces via rename and never modifies in place
+    - reflink (copy-on-write clone, e.g. XFS/Btrfs): everything else
+    - copy: when neither is supported (e.g. across filesystems)
+
+Models and augmented audio are never hardlinked, because retraining and
+augmentation rewrite those files in place and would change the stored copy.
+"""
+
+import errno
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from src.audio_shards import load_index, read_member, iter_shard_stream, extract_shard, INDEX_FILENAME
+    from src.model_manifest import MODEL_FILES, REQUIRED_MODEL_FILES, load_manifest
+    from src.storage import StorageBackend, S3_SHARDED_DATASETS, SHARD_PREFIX, AUDIO_SUFFIXES
+except ImportError:
+    from audio_shards import load_index, read_member, iter_shard_stream, extract_shard, INDEX_FILENAME
+    from model_manifest import MODEL_FILES, REQUIRED_MODEL_FILES, load_manifest
+    from storage import StorageBackend, S3_SHARDED_DATASETS, SHARD_PREFIX, AUDIO_SUFFIXES
+
+logger = logging.getLogger(__name__)
+
+FICLONE = 0x40049409  # Linux ioctl: clone a file's extents (reflink)
+IMMUTABLE_PREFIXES = ("extracted_audio/", SHARD_PREFIX)
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    """Copy-on-write clone of src to dst; False if the filesystem does not support it"""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        if dst.exists():
+            dst.unlink()
+        return False
+
+
+def place_file(src: Path, dst: Path, allow_hardlink: bool = True) -> str:
+    """
+    Atomically make dst a copy of src using the cheapest available method
+
+    Args:
+        src: Existing file
+        dst: Destination (replaced atomically if it exists)
+        allow_hardlink: Share the inode; only for files nobody modifies in place
+
+    Returns:
+        Method used: "hardlink", "reflink" or "copy"
+    """
+    src, dst = Path(src), Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    method = None
+    if allow_hardlink:
+        try:
+            os.link(src, tmp_path)
+            method = "hardlink"
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+                raise
+    if method is None and _reflink(src, tmp_path):
+        method = "reflink"
+    if method is None:
+        shutil.copy2(src, tmp_path)
+        method = "copy"
+    os.replace(tmp_path, dst)
+    return method
+
+
+def _same_file(src: Path, dst: Path) -> bool:
+    """dst already holds src: same inode, or same size and mtime"""
+    try:
+        src_stat, dst_stat = src.stat(), dst.stat()
+    except OSError:
+        return False
+    if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+        return True
+    return src_stat.st_size == dst_stat.st_size and src_stat.st_mtime == dst_stat.st_mtime
+
+
+class LocalStorage(StorageBackend):
+    """Storage backend on a local or NFS directory with the bucket's key layout"""
+
+    name = "local storage"
+
+    def __init__(self, root_dir: str):
+        """
+        Args:
+            root_dir: Directory standing in for the bucket
+        """
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.place_counts: Dict[str, int] = {"hardlink": 0, "reflink": 0, "copy": 0}
+        self._lock = threading.Lock()
+        logger.info(f"Local storage at {self.root_dir}")
+
+    def _path(self, key: str) -> Path:
+        """Store path for a key (keys may not escape the root)"""
+        path = (self.root_dir / key).resolve()
+        if self.root_dir.resolve() not in path.parents:
+            raise ValueError(f"Key '{key}' is outside the storage root")
+        return path
+
+    def _place(self, src: Path, dst: Path, key: str) -> str:
+        method = place_file(src, dst, allow_hardlink=key.startswith(IMMUTABLE_PREFIXES))
+        with self._lock:
+            self.place_counts[method] += 1
+        return method
+
+    def _sync_tree(self, prefix: str, local_dir: str, max_workers: int) -> Optional[Dict[str, int]]:
+        """Mirror <root>/<prefix>/<class>/<audio> into local_dir, skipping files already there"""
+        source_dir = self._path(prefix)
+        stats = {"listed": 0, "downloaded": 0, "unchanged": 0, "failed": 0, "bytes": 0}
+        if not source_dir.exists():
+            logger.error(f"{source_dir} does not exist")
+            return None
+
+        to_place = []
+        for class_dir in sorted(d for d in source_dir.iterdir() if d.is_dir() and not d.name.startswith(".")):
+            for src in class_dir.iterdir():
+                if not src.is_file() or not src.name.endswith(AUDIO_SUFFIXES):
+                    continue
+                stats["listed"] += 1
+                dst = Path(local_dir) / class_dir.name / src.name
+                if _same_file(src, dst):
+                    stats["unchanged"] += 1
+                else:
+                    to_place.append((src, dst, f"{prefix}{class_dir.name}/{src.name}"))
+
+        def place(item):
+            src, dst, key = item
+            self._place(src, dst, key)
+            return src.stat().st_size
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for (src, _, _), future in zip(to_place, [executor.submit(place, item) for item in to_place]):
+                try:
+                    stats["bytes"] += future.result()
+                    stats["downloaded"] += 1
+                except Exception as e:
+                    logger.error(f"Failed to place {src}: {e}")
+                    stats["failed"] += 1
+
+        logger.info(f"✓ Local sync {prefix}: {stats['downloaded']} placed, "
+                    f"{stats['unchanged']} unchanged, {stats['failed']} failed")
+        return stats
+
+    # ------------------------------------------------------------ primitives
+
+    def upload_file(self, local_file: str, key: str) -> bool:
+        try:
+            self._place(Path(local_file), self._path(key), key)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to store {local_file} as {key}: {e}")
+            return False
+
+    def _read_model_manifest(self) -> Optional[dict]:
+        if not (self._path("models") / "manifest.json").exists():
+            return None
+        return load_manifest(self._path("models"))
+
+    def _fetch_model_file(self, name: str, local_path: Path):
+        self._place(self._path(f"models/{name}"), local_path, f"models/{name}")
+
+    # -------------------------------------------------------------- datasets
+
+    def sync_extracted_audio(self, local_dir: str = "/app/extracted_audio",
+                             max_workers: int = 16) -> Optional[Dict[str, int]]:
+        return self._sync_tree("extracted_audio/", local_dir, max_workers)
+
+    def download_training_data(self, local_dir: str = "/app/augmented_audio",
+                               sharded: bool = S3_SHARDED_DATASETS) -> bool:
+        if sharded:
+            return self.download_shards("augmented_audio", local_dir) is not None
+        stats = self._sync_tree("augmented_audio/", local_dir, max_workers=16)
+        return stats is not None and stats["failed"] == 0
+
+    def upload_training_data(self, local_dir: str = "./augmented_audio",
+                             sharded: bool = S3_SHARDED_DATASETS) -> bool:
+        if sharded:
+            return self._pack_and_upload(local_dir, "augmented_audio")
+        files = [(str(f), f"augmented_audio/{f.relative_to(local_dir)}") for f in Path(local_dir).rglob("*.wav")]
+        return all(self.upload_files(files).values())
+
+    def list_training_files(self) -> List[str]:
+        root = self._path("augmented_audio")
+        if not root.exists():
+            return []
+        return sorted(f"augmented_audio/{f.relative_to(root)}" for f in root.rglob("*.wav"))
+
+    # ---------------------------------------------------------------- shards
+
+    def upload_shards(self, local_dataset_dir: str, dataset: str, max_workers: int = 4) -> bool:
+        index = load_index(local_dataset_dir)
+        prefix = f"{SHARD_PREFIX}{dataset}/"
+        files = [(str(Path(local_dataset_dir) / shard["key"]), prefix + shard["key"]) for shard in index["shards"]]
+        if not all(self.upload_files(files, max_workers=max_workers).values()):
+            return False
+        return self.upload_file(str(Path(local_dataset_dir) / INDEX_FILENAME), prefix + INDEX_FILENAME)
+
+    def get_shard_index(self, dataset: str, refresh: bool = False) -> Optional[dict]:
+        dataset_dir = self._path(f"{SHARD_PREFIX}{dataset}")
+        if not (dataset_dir / INDEX_FILENAME).exists():
+            return None
+        return load_index(dataset_dir)
+
+    def download_shards(self, dataset: str, local_dir: str, class_name: Optional[str] = None,
+                        max_workers: int = 4) -> Optional[int]:
+        index = self.get_shard_index(dataset)
+        if index is None:
+            return None
+        dataset_dir = self._path(f"{SHARD_PREFIX}{dataset}")
+
+        def extract(shard):
+            with open(dataset_dir / shard["key"], "rb") as f:
+                return extract_shard(f, Path(local_dir))
+
+        shards = [s for s in index["shards"] if class_name is None or s["class"] == class_name]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return sum(executor.map(extract, shards))
+
+    def fetch_sample(self, dataset: str, name: str) -> bytes:
+        index = self.get_shard_index(dataset) or {"members": []}
+        member = next((m for m in index["members"] if m["name"] == name), None)
+        if member is None:
+            raise KeyError(name)
+        return read_member(self._path(f"{SHARD_PREFIX}{dataset}"), member)
+
+    def stream_shard_samples(self, dataset: str, class_name: Optional[str] = None) -> Iterator[Tuple[str, bytes]]:
+        index = self.get_shard_index(dataset)
+        if index is None:
+            return
+        dataset_dir = self._path(f"{SHARD_PREFIX}{dataset}")
+        for shard in index["shards"]:
+            if class_name is None or shard["class"] == class_name:
+                with open(dataset_dir / shard["key"], "rb") as f:
+                    yield from iter_shard_stream(f)
+
+    # ---------------------------------------------------------------- models
+
+    def download_model(self, local_dir: str = "/app/models") -> bool:
+        for name in MODEL_FILES:
+            src = self._path(f"models/{name}")
+            if not src.exists():
+                logger.warning(f"File not found in local storage: models/{name}")
+                if name in REQUIRED_MODEL_FILES:
+                    return False
+                continue
+            self._place(src, Path(local_dir) / name, f"models/{name}")
+        return True
@@ -0,0 +1,131 @@
+"""
+Model Artifact Manifest for EcoSight
+Records the version and SHA-256 of every served model artifact in
+models/manifest.json, so startup can tell whether the local models are
+current and intact without re-downloading them.
+
+    {
+        "version": "2025-11-19_10-30-00",
+        "created_at": "2025-11-19T10:31:12",
+        "files": {
+            "yamnet_classifier_v2.keras": {"sha256": "...", "size": 2821338},
+            ...
+        }
+    }
+
+The manifest is written after the files it describes, both locally and in
+S3, so a manifest never points at artifacts that are not there yet.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+MODEL_FILES = [
+    "yamnet_classifier_v2.keras",
+    "class_names.json",
+    "model_metadata.json",
+    "performance_metrics.json",
+    "training_history.pkl",
+]
+REQUIRED_MODEL_FILES = ["yamnet_classifier_v2.keras"]
+CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(models_dir: Path, version: Optional[str] = None,
+                   files: List[str] = MODEL_FILES) -> dict:
+    """
+    Hash the model artifacts present in models_dir
+
+    Args:
+        models_dir: Directory holding the artifacts
+        version: Model version (default: the current timestamp)
+        files: Artifact names to include (missing ones are skipped)
+
+    Returns:
+        Manifest dict
+    """
+    models_dir = Path(models_dir)
+    entries = {}
+    for name in files:
+        path = models_dir / name
+        if path.exists():
+            entries[name] = {"sha256": sha256_file(path), "size": path.stat().st_size}
+    return {
+        "version": version or datetime.now().strftime("%Y-%m-%d_%H-%M-%S"),
+        "created_at": datetime.now().isoformat(),
+        "files": entries
+    }
+
+
+def write_manifest(models_dir: Path, manifest: dict):
+    """Atomically write models_dir/manifest.json"""
+    path = Path(models_dir) / MANIFEST_FILENAME
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(models_dir: Path) -> Optional[dict]:
+    """Local manifest, or None if missing or unreadable"""
+    path = Path(models_dir) / MANIFEST_FILENAME
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unreadable model manifest {path}: {e}")
+        return None
+
+
+def file_matches(path: Path, entry: dict) -> bool:
+    """Whether a file exists with the size and SHA-256 recorded in a manifest entry"""
+    try:
+        if path.stat().st_size != entry["size"]:
+            return False
+    except OSError:
+        return False
+    return sha256_file(path) == entry["sha256"]
+
+
+def stale_files(models_dir: Path, manifest: dict) -> List[str]:
+    """Artifacts of a manifest that are missing locally or differ from it"""
+    return [name for name, entry in manifest["files"].items()
+            if not file_matches(Path(models_dir) / name, entry)]
+
+
+def local_models_current(models_dir: Path, pinned_version: Optional[str] = None) -> bool:
+    """
+    Whether the local artifacts can be served without contacting S3
+
+    True when the local manifest verifies (and matches pinned_version if
+    given). Without a manifest, a complete set of files counts as current
+    unless a version is pinned, as before manifests existed.
+    """
+    models_dir = Path(models_dir)
+    manifest = load_manifest(models_dir)
+    if manifest is None:
+        if pinned_version:
+            return False
+        return all((models_dir / name).exists() for name in MODEL_FILES)
+    if pinned_version and manifest.get("version") != pinned_version:
+        return False
+    return (all(name in manifest["files"] for name in REQUIRED_MODEL_FILES)
+            and not stale_files(models_dir, manifest))
@@ -0,0 +1,171 @@
+"""
+Decoded PCM Cache for EcoSight
+Stores every training clip once as 16 kHz mono PCM in memory-mapped shards
+(ShardedArrayStore), keyed by the content hash of the source file, so
+augmentation and feature extraction read zero-copy slices instead of
+decoding and resampling every MP3/WAV again on each retrain.
+
+Layout:
+    features/
+        pcm-16000-float32/       (or pcm-16000-int16: half the disk and page cache)
+            meta.json
+            index.jsonl
+            shard-00000.bin
+
+Only the retraining process writes (ingest); augmentation worker processes
+open the same directory read-only.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import librosa
+
+try:
+    from src.shard_store import ShardedArrayStore
+except ImportError:
+    from shard_store import ShardedArrayStore
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+PCM_DTYPES = ("float32", "int16")
+INT16_SCALE = 32767.0
+
+
+def decode_audio(audio_path: Path, sr: int = SAMPLE_RATE, duration: Optional[float] = None) -> np.ndarray:
+    """Decode and resample one file to mono float32 at sr"""
+    audio, _ = librosa.load(str(audio_path), sr=sr, mono=True, duration=duration)
+    return audio
+
+
+class PCMCache:
+    """Content-hash keyed store of decoded mono PCM clips"""
+
+    def __init__(self, cache_dir: Path, sample_rate: int = SAMPLE_RATE, dtype: str = "float32"):
+        """
+        Open (or create) the cache for one sample rate and dtype
+
+        Args:
+            cache_dir: Root directory (one subdirectory per sample rate and dtype)
+            sample_rate: Rate every clip is resampled to
+            dtype: "float32" (zero-copy reads) or "int16" (half the size, converted on read)
+        """
+        if np.dtype(dtype).name not in PCM_DTYPES:
+            raise ValueError(f"Unsupported PCM cache dtype '{dtype}' (expected one of {', '.join(PCM_DTYPES)})")
+        self.cache_dir = Path(cache_dir)
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.store_dir = self.cache_dir / f"pcm-{sample_rate}-{self.dtype.name}"
+        self.store = ShardedArrayStore(self.store_dir, dtype=self.dtype.name)
+
+    def __reduce__(self):
+        # Worker processes reopen the cache by path (once per process) instead of pickling memmaps
+        return _open_shared, (str(self.cache_dir), self.sample_rate, self.dtype.name)
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self.store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def get(self, digest: str, duration: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Cached clip for a content hash
+
+        Args:
+            digest: SHA-256 of the source file
+            duration: Only return the first `duration` seconds
+
+        Returns:
+            Read-only float32 view of the shard (a float32 copy for int16
+            caches), or None if the clip is not cached
+        """
+        view = self.store.get(digest)
+        if view is None:
+            return None
+        if duration is not None:
+            view = view[:int(duration * self.sample_rate)]
+        if self.dtype == np.int16:
+            return view.astype(np.float32) / INT16_SCALE
+        return np.asarray(view)
+
+    def load(self, audio_path: Path, digest: Optional[str], sr: int,
+             duration: Optional[float] = None) -> np.ndarray:
+        """
+        Cached clip when available at this sample rate, otherwise decode the file
+
+        Args:
+            audio_path: Source file (decoded on a cache miss)
+            digest: Content hash of audio_path (None skips the cache)
+            sr: Requested sample rate
+            duration: Only return the first `duration` seconds
+
+        Returns:
+            Mono float32 audio at sr
+        """
+        if digest is not None and sr == self.sample_rate:
+            audio = self.get(digest, duration=duration)
+            if audio is not None:
+                return audio
+        return decode_audio(audio_path, sr=sr, duration=duration)
+
+    def _encode(self, audio: np.ndarray) -> np.ndarray:
+        if self.dtype == np.int16:
+            return np.round(np.clip(audio, -1.0, 1.0) * INT16_SCALE).astype(np.int16)
+        return audio
+
+    def ingest(self, files: Iterable[Tuple[str, Path]], workers: int = 4) -> Dict[str, int]:
+        """
+        Decode and store every file whose content hash is not cached yet
+
+        Decoding runs in a thread pool; appends happen in this thread, in
+        input order.
+
+        Args:
+            files: (digest, path) pairs
+            workers: Decoder threads
+
+        Returns:
+            Dict with cached, decoded and failed counts
+        """
+        stats = {"cached": 0, "decoded": 0, "failed": 0}
+        missing, queued = [], set()
+        for digest, audio_path in files:
+            if digest in self.store or digest in queued:
+                stats["cached"] += 1
+            else:
+                missing.append((digest, audio_path))
+                queued.add(digest)
+
+        def decode(item):
+            digest, audio_path = item
+            try:
+                return digest, decode_audio(audio_path, sr=self.sample_rate), None
+            except Exception as e:
+                return digest, None, f"{audio_path}: {e}"
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                for digest, audio, error in executor.map(decode, missing):
+                    if audio is None:
+                        logger.warning(f"PCM cache: could not decode {error}")
+                        stats["failed"] += 1
+                        continue
+                    self.store.put(digest, self._encode(audio))
+                    stats["decoded"] += 1
+            self.store.flush()
+
+        logger.info(f"PCM cache {self.store_dir}: {stats['decoded']} decoded, "
+                    f"{stats['cached']} already cached, {stats['failed']} failed")
+        return stats
+
+
+@lru_cache(maxsize=None)
+def _open_shared(cache_dir: str, sample_rate: int, dtype: str) -> PCMCache:
+    """One PCMCache per process and directory (index loaded once)"""
+    return PCMCache(Path(cache_dir), sample_rate=sample_rate, dtype=dtype)
@@ -1,21 +1,63 @@
 """
 S3 Storage Utilities for EcoSight
 Handles uploading/downloading training data from AWS S3
+(the "s3" StorageBackend, see storage.py)
 """
 
 import os
+import json
+import hashlib
 import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+try:
+    from src.audio_shards import load_index, member_lookup, iter_shard_stream, extract_shard, INDEX_FILENAME
+    from src.model_manifest import MANIFEST_FILENAME
+    from src.storage import StorageBackend, get_storage, S3_SHARDED_DATASETS, SHARD_PREFIX, AUDIO_SUFFIXES
+except ImportError:
+    from audio_shards import load_index, member_lookup, iter_shard_stream, extract_shard, INDEX_FILENAME
+    from model_manifest import MANIFEST_FILENAME
+    from storage import StorageBackend, get_storage, S3_SHARDED_DATASETS, SHARD_PREFIX, AUDIO_SUFFIXES
+
 logger = logging.getLogger(__name__)
 
+# Incremental sync: concurrent downloads over one client, local state per synced directory
+S3_SYNC_WORKERS = int(os.getenv("S3_SYNC_WORKERS", "16"))
+SYNC_STATE_FILENAME = ".s3_sync.json"
+SYNC_STATE_SAVE_EVERY = 100  # Persist sync state every N downloads so interrupted runs resume
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+# Sharded datasets: a few large tar shards + index.json under shards/<dataset>/
+SHARD_TRANSFER_WORKERS = int(os.getenv("SHARD_TRANSFER_WORKERS", "4"))  # shards in flight
+# Shards above the threshold move as parallel multipart uploads / ranged GETs
+SHARD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=int(os.getenv("SHARD_PART_CONCURRENCY", "8"))
+)
+
+
+def _md5_file(path: Path) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-class S3Storage:
+
+class S3Storage(StorageBackend):
     """Handles S3 operations for training data"""
     
+    name = "S3"
+    
     def __init__(self, bucket_name: Optional[str] = None):
         """
         Initialize S3 storage client
@@ -25,19 +67,39 @@ class S3Storage:
         """
         self.bucket_name = bucket_name or os.getenv("S3_BUCKET", "ecosight-training-data")
         self.region = os.getenv("AWS_REGION", "us-east-1")
+        # Point at an S3-compatible stand-in (MinIO, moto server, LocalStack) for local testing
+        self.endpoint_url = os.getenv("S3_ENDPOINT_URL") or None
         
         # Initialize S3 client
         try:
             self.s3_client = boto3.client(
                 's3',
                 region_name=self.region,
+                endpoint_url=self.endpoint_url,
                 aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                # One pooled connection per concurrent transfer
+                config=Config(max_pool_connections=max(10, S3_SYNC_WORKERS))
             )
             logger.info(f"S3 client initialized for bucket: {self.bucket_name}")
         except Exception as e:
             logger.error(f"Failed to initialize S3 client: {e}")
             self.s3_client = None
+        self._shard_indexes: Dict[str, dict] = {}
+    
+    def _read_model_manifest(self) -> Optional[dict]:
+        if not self.s3_client:
+            raise RuntimeError("S3 client not initialized")
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=f"models/{MANIFEST_FILENAME}")
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(response['Body'].read())
+    
+    def _fetch_model_file(self, name: str, local_path: Path):
+        self.s3_client.download_file(Bucket=self.bucket_name, Key=f"models/{name}", Filename=str(local_path))
     
     def download_model(self, local_dir: str = "/app/models") -> bool:
         """
@@ -98,80 +160,198 @@ class S3Storage:
             logger.error(f"Error downloading model from S3: {e}")
             return False
     
-    def download_extracted_audio(self, local_dir: str = "/app/extracted_audio") -> bool:
+    def sync_extracted_audio(self, local_dir: str = "/app/extracted_audio",
+                             max_workers: int = S3_SYNC_WORKERS) -> Optional[Dict[str, int]]:
+        """
+        Incrementally sync extracted_audio/ from S3
+        
+        Returns:
+            Sync statistics (see sync_prefix), or None if the listing failed
+        """
+        return self.sync_prefix("extracted_audio/", local_dir, suffixes=AUDIO_SUFFIXES,
+                                max_workers=max_workers)
+    
+    def _load_sync_state(self, state_path: Path) -> dict:
+        if state_path.exists():
+            try:
+                with open(state_path, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Corrupt sync state {state_path}, re-checking all objects: {e}")
+        return {}
+    
+    def _save_sync_state(self, state_path: Path, state: dict):
+        """Atomically persist the sync state"""
+        tmp_path = state_path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+    
+    def _is_current(self, local_path: Path, obj: dict, entry: Optional[dict]) -> Tuple[bool, Optional[dict]]:
+        """
+        Decide whether a local file already holds an S3 object
+        
+        Returns:
+            (current, state_entry) - state_entry is the entry to record when current
+        """
+        try:
+            stat = local_path.stat()
+        except OSError:
+            return False, None
+        etag = obj['ETag'].strip('"')
+        remote_mtime = obj['LastModified'].timestamp()
+        if stat.st_size != obj['Size']:
+            return False, None
+        
+        recorded = {"etag": etag, "size": stat.st_size, "mtime": stat.st_mtime}
+        if entry is not None and entry.get("mtime") == stat.st_mtime:
+            # The file is the one the state describes: its ETag decides. LastModified
+            # has one-second resolution, so a same-size re-upload can keep the mtime.
+            return (True, recorded) if entry.get("etag") == etag else (False, None)
+        # No (or stale) state: files written by a previous sync carry the object's LastModified,
+        # and single-part ETags are the MD5 of the content (e.g. uploads stored locally first)
+        if stat.st_mtime == remote_mtime:
+            return True, recorded
+        if "-" not in etag and _md5_file(local_path) == etag:
+            return True, recorded
+        return False, None
+    
+    def _download_object(self, s3_key: str, obj: dict, local_path: Path) -> dict:
+        """
+        Download one object via a .part file and an atomic rename
+        
+        A .part file left by an interrupted run of the same object version is
+        resumed with a ranged GET; the object's LastModified becomes the file's
+        mtime so later syncs can recognise it.
+        
+        Returns:
+            State entry for the downloaded file
+        """
+        etag = obj['ETag'].strip('"')
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = local_path.with_name(f".{local_path.name}.{etag[:12]}.part")
+        for stale in local_path.parent.glob(f".{local_path.name}.*.part"):
+            if stale != part_path:
+                stale.unlink()
+        
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        if offset >= obj['Size']:
+            offset = 0
+        request = {"Bucket": self.bucket_name, "Key": s3_key, "IfMatch": obj['ETag']}
+        if offset:
+            request["Range"] = f"bytes={offset}-"
+        try:
+            response = self.s3_client.get_object(**request)
+        except ClientError as e:
+            if not offset or e.response['Error']['Code'] not in ('InvalidRange', '416'):
+                raise
+            offset = 0
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key, IfMatch=obj['ETag'])
+        
+        body = response['Body']
+        with open(part_path, 'ab' if offset else 'wb') as f:
+            for chunk in iter(lambda: body.read(DOWNLOAD_CHUNK_SIZE), b""):
+                f.write(chunk)
+        
+        if part_path.stat().st_size != obj['Size']:
+            part_path.unlink()
+            raise IOError(f"Incomplete download of {s3_key}")
+        remote_mtime = obj['LastModified'].timestamp()
+        os.utime(part_path, (remote_mtime, remote_mtime))
+        os.replace(part_path, local_path)
+        return {"etag": etag, "size": obj['Size'], "mtime": local_path.stat().st_mtime}
+    
+    def sync_prefix(self, prefix: str, local_dir: str, suffixes: Tuple[str, ...] = AUDIO_SUFFIXES,
+                    max_workers: int = S3_SYNC_WORKERS) -> Optional[Dict[str, int]]:
         """
-        Download original/raw audio files from S3 (extracted_audio folder)
+        Incrementally download the objects under a prefix
+        
+        The S3 listing is diffed against a local state file (ETag, size and
+        mtime per key, in local_dir/.s3_sync.json). Only new or changed
+        objects are downloaded, concurrently over this shared client. Local
+        files are never deleted, so uploads not yet in S3 are kept.
         
         Args:
-            local_dir: Local directory to download files to
+            prefix: Key prefix, e.g. "extracted_audio/"
+            local_dir: Local directory mirroring the prefix
+            suffixes: Only sync keys with these suffixes
+            max_workers: Concurrent downloads
             
         Returns:
-            bool: True if successful, False otherwise
+            Dict with listed, downloaded, unchanged, failed and bytes counts,
+            or None if the bucket could not be listed
         """
         if not self.s3_client:
             logger.error("S3 client not initialized")
-            return False
+            return None
+        
+        local_root = Path(local_dir)
+        local_root.mkdir(parents=True, exist_ok=True)
+        state_path = local_root / SYNC_STATE_FILENAME
+        state = self._load_sync_state(state_path)
+        stats = {"listed": 0, "downloaded": 0, "unchanged": 0, "failed": 0, "bytes": 0}
         
+        logger.info(f"Syncing s3://{self.bucket_name}/{prefix} -> {local_root}")
+        to_download = []
+        listed = set()
         try:
-            # Create local directory
-            Path(local_dir).mkdir(parents=True, exist_ok=True)
-            
-            # List all objects in bucket
-            logger.info(f"Downloading extracted audio from s3://{self.bucket_name}/extracted_audio/")
-            
             paginator = self.s3_client.get_paginator('list_objects_v2')
-            pages = paginator.paginate(Bucket=self.bucket_name, Prefix='extracted_audio/')
-            
-            file_count = 0
-            for page in pages:
-                if 'Contents' not in page:
-                    continue
-                
-                for obj in page['Contents']:
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                for obj in page.get('Contents', []):
                     s3_key = obj['Key']
-                    
-                    # Skip directories
-                    if s3_key.endswith('/'):
+                    if s3_key.endswith('/') or not s3_key.endswith(suffixes):
                         continue
-                    
-                    # Process both .wav and .mp3 files
-                    if not (s3_key.endswith('.wav') or s3_key.endswith('.mp3')):
-                        continue
-                    
-                    # Calculate local path
-                    # s3_key format: extracted_audio/dog_bark/file.mp3
-                    relative_path = s3_key.replace('extracted_audio/', '')
-                    local_path = Path(local_dir) / relative_path
-                    
-                    # Create subdirectory if needed
-                    local_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # Download file
-                    logger.debug(f"Downloading: {s3_key} -> {local_path}")
-                    self.s3_client.download_file(
-                        Bucket=self.bucket_name,
-                        Key=s3_key,
-                        Filename=str(local_path)
-                    )
-                    file_count += 1
-            
-            logger.info(f"✓ Downloaded {file_count} extracted audio files from S3")
-            return True
-            
+                    stats["listed"] += 1
+                    listed.add(s3_key)
+                    local_path = local_root / s3_key[len(prefix):]
+                    current, entry = self._is_current(local_path, obj, state.get(s3_key))
+                    if current:
+                        state[s3_key] = entry
+                        stats["unchanged"] += 1
+                    else:
+                        to_download.append((s3_key, obj, local_path))
         except ClientError as e:
-            logger.error(f"S3 download failed: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"Unexpected error downloading from S3: {e}")
-            return False
+            logger.error(f"S3 listing failed: {e}")
+            return None
+        
+        # Forget keys that are gone from S3 (their local files stay)
+        for s3_key in [key for key in state if key not in listed]:
+            del state[s3_key]
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._download_object, s3_key, obj, local_path): (s3_key, obj)
+                for s3_key, obj, local_path in to_download
+            }
+            for future in as_completed(futures):
+                s3_key, obj = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to download {s3_key}: {e}")
+                    stats["failed"] += 1
+                    continue
+                state[s3_key] = entry
+                stats["downloaded"] += 1
+                stats["bytes"] += obj['Size']
+                if stats["downloaded"] % SYNC_STATE_SAVE_EVERY == 0:
+                    self._save_sync_state(state_path, state)
+        
+        self._save_sync_state(state_path, state)
+        logger.info(f"✓ S3 sync {prefix}: {stats['downloaded']} downloaded "
+                    f"({stats['bytes'] / 1e6:.1f} MB), {stats['unchanged']} unchanged, "
+                    f"{stats['failed']} failed")
+        return stats
     
-    def download_training_data(self, local_dir: str = "/app/augmented_audio") -> bool:
+    def download_training_data(self, local_dir: str = "/app/augmented_audio",
+                               sharded: bool = S3_SHARDED_DATASETS) -> bool:
         """
         Download all training audio files from S3 to local directory
         (DEPRECATED: Use download_extracted_audio + augmentation instead)
         
         Args:
             local_dir: Local directory to download files to
+            sharded: Fetch the tar shards under shards/augmented_audio/ instead of single objects
             
         Returns:
             bool: True if successful, False otherwise
@@ -180,6 +360,9 @@ class S3Storage:
             logger.error("S3 client not initialized")
             return False
         
+        if sharded:
+            return self.download_shards("augmented_audio", local_dir) is not None
+        
         try:
             # Create local directory
             Path(local_dir).mkdir(parents=True, exist_ok=True)
@@ -261,12 +444,14 @@ class S3Storage:
             logger.error(f"S3 upload failed: {e}")
             return False
     
-    def upload_training_data(self, local_dir: str = "./augmented_audio") -> bool:
+    def upload_training_data(self, local_dir: str = "./augmented_audio",
+                             sharded: bool = S3_SHARDED_DATASETS) -> bool:
         """
         Upload all training audio files from local directory to S3
         
         Args:
             local_dir: Local directory containing audio files
+            sharded: Pack into tar shards under shards/augmented_audio/ instead of single objects
             
         Returns:
             bool: True if successful
@@ -275,6 +460,9 @@ class S3Storage:
             logger.error("S3 client not initialized")
             return False
         
+        if sharded:
+            return self._pack_and_upload(local_dir, "augmented_audio")
+        
         try:
             local_path = Path(local_dir)
             if not local_path.exists():
@@ -300,6 +488,159 @@ class S3Storage:
             logger.error(f"Upload failed: {e}")
             return False
     
+    # ------------------------------------------------------------------
+    # Sharded datasets (see audio_shards.py)
+    # ------------------------------------------------------------------
+    
+    def upload_shards(self, local_dataset_dir: str, dataset: str,
+                      max_workers: int = SHARD_TRANSFER_WORKERS) -> bool:
+        """
+        Upload a packed dataset: shards in parallel (multipart), then the index
+        
+        The index goes last, so readers never see it reference a missing shard.
+        
+        Args:
+            local_dataset_dir: Directory written by audio_shards.pack_directory
+            dataset: Dataset name, e.g. "augmented_audio"
+            max_workers: Shards uploaded concurrently
+            
+        Returns:
+            bool: True if every shard and the index were uploaded
+        """
+        if not self.s3_client:
+            logger.error("S3 client not initialized")
+            return False
+        
+        index = load_index(local_dataset_dir)
+        prefix = f"{SHARD_PREFIX}{dataset}/"
+        
+        def upload(shard):
+            self.s3_client.upload_file(
+                Filename=str(Path(local_dataset_dir) / shard["key"]),
+                Bucket=self.bucket_name,
+                Key=prefix + shard["key"],
+                Config=SHARD_TRANSFER_CONFIG
+            )
+            return shard
+        
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(upload, shard) for shard in index["shards"]]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Shard upload failed: {e}")
+                    failed += 1
+        if failed:
+            logger.error(f"{failed} of {len(index['shards'])} shards failed; index not updated")
+            return False
+        
+        if not self.upload_file(str(Path(local_dataset_dir) / INDEX_FILENAME), prefix + INDEX_FILENAME):
+            return False
+        self._shard_indexes[dataset] = index
+        total_mb = sum(shard["size"] for shard in index["shards"]) / 1e6
+        logger.info(f"✓ Uploaded {len(index['members'])} files as {len(index['shards'])} shards "
+                    f"({total_mb:.1f} MB) to s3://{self.bucket_name}/{prefix}")
+        return True
+    
+    def get_shard_index(self, dataset: str, refresh: bool = False) -> Optional[dict]:
+        """Fetch (and cache) a dataset's shard index; None if the dataset has no shards"""
+        if refresh or dataset not in self._shard_indexes:
+            try:
+                response = self.s3_client.get_object(
+                    Bucket=self.bucket_name, Key=f"{SHARD_PREFIX}{dataset}/{INDEX_FILENAME}"
+                )
+                self._shard_indexes[dataset] = load_index(response['Body'].read())
+            except ClientError as e:
+                logger.error(f"Could not fetch shard index for {dataset}: {e}")
+                return None
+        return self._shard_indexes[dataset]
+    
+    def download_shards(self, dataset: str, local_dir: str, class_name: Optional[str] = None,
+                        max_workers: int = SHARD_TRANSFER_WORKERS) -> Optional[int]:
+        """
+        Download a sharded dataset and extract it into local_dir/<class>/
+        
+        Shards are fetched concurrently, each as parallel ranged GETs, into a
+        temporary file that is removed once extracted.
+        
+        Args:
+            dataset: Dataset name, e.g. "augmented_audio"
+            local_dir: Extraction directory
+            class_name: Only fetch this class's shards
+            max_workers: Shards downloaded concurrently
+            
+        Returns:
+            Number of files extracted, or None on failure
+        """
+        if not self.s3_client:
+            logger.error("S3 client not initialized")
+            return None
+        index = self.get_shard_index(dataset, refresh=True)
+        if index is None:
+            return None
+        
+        shards = [s for s in index["shards"] if class_name is None or s["class"] == class_name]
+        prefix = f"{SHARD_PREFIX}{dataset}/"
+        Path(local_dir).mkdir(parents=True, exist_ok=True)
+        
+        def fetch(shard):
+            with tempfile.NamedTemporaryFile(dir=local_dir, prefix=".shard-", suffix=".tar") as tmp:
+                self.s3_client.download_file(
+                    Bucket=self.bucket_name, Key=prefix + shard["key"],
+                    Filename=tmp.name, Config=SHARD_TRANSFER_CONFIG
+                )
+                with open(tmp.name, "rb") as f:
+                    return extract_shard(f, Path(local_dir))
+        
+        extracted, failed = 0, 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for future in as_completed([executor.submit(fetch, shard) for shard in shards]):
+                try:
+                    extracted += future.result()
+                except Exception as e:
+                    logger.error(f"Shard download failed: {e}")
+                    failed += 1
+        
+        logger.info(f"✓ Extracted {extracted} files from {len(shards) - failed}/{len(shards)} shards")
+        return None if failed else extracted
+    
+    def fetch_sample(self, dataset: str, name: str) -> bytes:
+        """
+        Fetch one sample ("<class>/<file>") from its shard with a single ranged GET
+        
+        Raises:
+            KeyError: if the sample is not in the dataset's index
+        """
+        index = self.get_shard_index(dataset)
+        member = member_lookup(index or {"members": []})[name]
+        response = self.s3_client.get_object(
+            Bucket=self.bucket_name,
+            Key=f"{SHARD_PREFIX}{dataset}/{member['shard']}",
+            Range=f"bytes={member['offset']}-{member['offset'] + member['size'] - 1}"
+        )
+        return response['Body'].read()
+    
+    def stream_shard_samples(self, dataset: str, class_name: Optional[str] = None):
+        """
+        Yield (name, bytes) for every sample, streaming each shard without local storage
+        
+        Args:
+            dataset: Dataset name
+            class_name: Only stream this class's shards
+        """
+        index = self.get_shard_index(dataset)
+        if index is None:
+            return
+        for shard in index["shards"]:
+            if class_name is not None and shard["class"] != class_name:
+                continue
+            response = self.s3_client.get_object(
+                Bucket=self.bucket_name, Key=f"{SHARD_PREFIX}{dataset}/{shard['key']}"
+            )
+            yield from iter_shard_stream(response['Body'])
+    
     def list_training_files(self) -> List[str]:
         """
         List all training audio files in S3
@@ -330,12 +671,6 @@ class S3Storage:
             return []
 
 
-# Singleton instance
-_s3_storage = None
-
-def get_s3_storage() -> S3Storage:
-    """Get or create S3Storage singleton instance"""
-    global _s3_storage
-    if _s3_storage is None:
-        _s3_storage = S3Storage()
-    return _s3_storage
+def get_s3_storage() -> StorageBackend:
+    """Configured storage backend (kept for existing callers; see storage.get_storage)"""
+    return get_storage()
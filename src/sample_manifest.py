@@ -0,0 +1,312 @@
+"""
+Training Sample Manifest for EcoSight
+SQLite database with one row per training sample, so retraining triggers,
+per-class counts and "new since last training" checks are indexed queries
+instead of globbing every class directory.
+
+Rows are written by /upload (source "upload"), the S3 sync ("s3"),
+augmentation ("augmentation") and a one-off adoption of files already on
+disk ("local"). Sample ids are never reused, so the highest id at the
+start of a training run is a watermark: every sample with a larger id
+arrived after that run.
+
+Layout:
+    extracted_audio/
+        .manifest.db         (samples + state tables, WAL mode)
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from src.audio_store import hash_file, AUDIO_EXTENSIONS
+except ImportError:
+    from audio_store import hash_file, AUDIO_EXTENSIONS
+
+try:
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except (ImportError, OSError):
+    SOUNDFILE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = ".manifest.db"
+SOURCES = ("upload", "s3", "augmentation", "local")
+ORIGINAL_SOURCES = ("upload", "s3", "local")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    sha256 TEXT NOT NULL,
+    class_name TEXT NOT NULL,
+    source TEXT NOT NULL,
+    duration REAL,
+    sample_rate INTEGER,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_source_class ON samples (source, class_name, id);
+CREATE INDEX IF NOT EXISTS samples_sha256 ON samples (sha256);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def probe_audio(path: Path) -> tuple:
+    """
+    Read duration and sample rate from the file header (no decoding)
+
+    Returns:
+        (duration_seconds, sample_rate), or (None, None) if the header is unreadable
+    """
+    if not SOUNDFILE_AVAILABLE:
+        return None, None
+    try:
+        info = sf.info(str(path))
+        return float(info.duration), int(info.samplerate)
+    except Exception:
+        return None, None
+
+
+def default_manifest_path(extracted_audio_dir: Path) -> Path:
+    """Manifest location: SAMPLE_MANIFEST_PATH, else alongside the original audio"""
+    return Path(os.getenv("SAMPLE_MANIFEST_PATH", str(Path(extracted_audio_dir) / MANIFEST_FILENAME)))
+
+
+class SampleManifest:
+    """Indexed record of every training sample (thread-safe, multi-process via WAL)"""
+
+    def __init__(self, db_path: Path):
+        """
+        Open (or create) the manifest
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------------------------------------------------------------- writes
+
+    def record(self, path: Path, sha256: str, class_name: str, source: str,
+               duration: Optional[float] = None, sample_rate: Optional[int] = None) -> int:
+        """
+        Add or refresh one sample; returns its id
+
+        A path that is already recorded keeps its id (and so its place
+        relative to the training watermark) even if its contents change.
+        Duration and sample rate are probed from the header when not given.
+        """
+        if source not in SOURCES:
+            raise ValueError(f"Unknown sample source '{source}' (expected one of {', '.join(SOURCES)})")
+        path = Path(path).resolve()
+        stat = path.stat()
+        if duration is None and sample_rate is None:
+            duration, sample_rate = probe_audio(path)
+
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO samples (path, sha256, class_name, source, duration, sample_rate,
+                                     size, mtime, ingested_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    sha256 = excluded.sha256, class_name = excluded.class_name,
+                    duration = excluded.duration, sample_rate = excluded.sample_rate,
+                    size = excluded.size, mtime = excluded.mtime
+                RETURNING id
+                """,
+                (str(path), sha256, class_name, source, duration, sample_rate,
+                 stat.st_size, stat.st_mtime, datetime.now().isoformat())
+            )
+            sample_id = cursor.fetchone()[0]
+            self._conn.commit()
+        return sample_id
+
+    def sync_directory(self, root_dir: Path, source: str,
+                       extensions: Iterable[str] = AUDIO_EXTENSIONS) -> Dict[str, int]:
+        """
+        Reconcile the manifest with the files under root_dir/<class>/
+
+        Files whose size and mtime match their row are skipped without
+        hashing; new or changed files are hashed and probed, and rows for
+        files that no longer exist are removed.
+
+        Args:
+            root_dir: Directory holding one subdirectory per class
+            source: Source recorded for newly seen files
+            extensions: Audio file extensions to include
+
+        Returns:
+            Dict with added, updated, removed and unchanged counts
+        """
+        root_dir = Path(root_dir)
+        extensions = tuple(ext.lower() for ext in extensions)
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        if not root_dir.exists():
+            return stats
+
+        prefix = str(root_dir.resolve()) + os.sep
+        with self._lock:
+            known = {
+                row["path"]: (row["size"], row["mtime"])
+                for row in self._conn.execute(
+                    "SELECT path, size, mtime FROM samples WHERE path >= ? AND path < ?",
+                    (prefix, prefix[:-1] + chr(ord(os.sep) + 1))
+                )
+            }
+
+        seen = set()
+        for class_entry in sorted(os.scandir(root_dir), key=lambda e: e.name):
+            if not class_entry.is_dir() or class_entry.name.startswith("."):
+                continue
+            for entry in os.scandir(class_entry.path):
+                if not entry.is_file() or not entry.name.lower().endswith(extensions):
+                    continue
+                path = str(Path(entry.path).resolve())
+                seen.add(path)
+                stat = entry.stat()
+                previous = known.get(path)
+                if previous == (stat.st_size, stat.st_mtime):
+                    stats["unchanged"] += 1
+                    continue
+                self.record(path, hash_file(Path(path)), class_entry.name, source)
+                stats["updated" if previous is not None else "added"] += 1
+
+        removed = [path for path in known if path not in seen]
+        if removed:
+            with self._lock:
+                self._conn.executemany("DELETE FROM samples WHERE path = ?", [(p,) for p in removed])
+                self._conn.commit()
+            stats["removed"] = len(removed)
+
+        if stats["added"] or stats["updated"] or stats["removed"]:
+            logger.info(f"Manifest sync {root_dir} ({source}): {stats}")
+        return stats
+
+    def mark_trained(self, watermark: int):
+        """Record the watermark (max sample id) of the data the last model was trained on"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO state (key, value) VALUES ('trained_watermark', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (str(int(watermark)),)
+            )
+            self._conn.commit()
+
+    # ----------------------------------------------------------------- reads
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+    def watermark(self) -> int:
+        """Highest sample id recorded so far (0 for an empty manifest)"""
+        with self._lock:
+            row = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'samples'").fetchone()
+        return int(row[0]) if row else 0
+
+    def trained_watermark(self) -> Optional[int]:
+        """Watermark stored by mark_trained(), or None before the first recorded training"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = 'trained_watermark'").fetchone()
+        return int(row[0]) if row else None
+
+    def has_source(self, sources: Iterable[str]) -> bool:
+        """Whether any sample from the given sources is recorded"""
+        sources = list(sources)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT 1 FROM samples WHERE source IN ({','.join('?' * len(sources))}) LIMIT 1",
+                sources
+            ).fetchone()
+        return row is not None
+
+    def class_counts(self, sources: Iterable[str] = ORIGINAL_SOURCES,
+                     since: Optional[int] = None) -> Dict[str, int]:
+        """
+        Per-class sample counts
+
+        Args:
+            sources: Sources to count
+            since: Only count samples with an id above this watermark
+
+        Returns:
+            Dict of class name -> count
+        """
+        sources = list(sources)
+        query = (f"SELECT class_name, COUNT(*) FROM samples "
+                 f"WHERE source IN ({','.join('?' * len(sources))})")
+        params = list(sources)
+        if since is not None:
+            query += " AND id > ?"
+            params.append(int(since))
+        with self._lock:
+            rows = self._conn.execute(query + " GROUP BY class_name", params).fetchall()
+        return {class_name: count for class_name, count in rows}
+
+    def digest_for(self, path: Path) -> Optional[str]:
+        """Recorded SHA-256 of a file if its size and mtime are unchanged (saves re-hashing)"""
+        path = Path(path).resolve()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, size, mtime FROM samples WHERE path = ?", (str(path),)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return row["sha256"] if (row["size"], row["mtime"]) == (stat.st_size, stat.st_mtime) else None
+
+    def paths_for_digest(self, sha256: str, class_name: Optional[str] = None,
+                         sources: Iterable[str] = ORIGINAL_SOURCES) -> List[Path]:
+        """Recorded paths of samples with this SHA-256 (optionally of one class), oldest first"""
+        sources = list(sources)
+        query = f"SELECT path FROM samples WHERE sha256 = ? AND source IN ({','.join('?' * len(sources))})"
+        params = [sha256] + sources
+        if class_name is not None:
+            query += " AND class_name = ?"
+            params.append(class_name)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [Path(row["path"]) for row in rows]
+
+    def samples(self, class_name: Optional[str] = None, sources: Iterable[str] = SOURCES,
+                since: Optional[int] = None) -> List[dict]:
+        """Sample rows (optionally for one class and/or newer than a watermark), oldest first"""
+        sources = list(sources)
+        query = f"SELECT * FROM samples WHERE source IN ({','.join('?' * len(sources))})"
+        params = list(sources)
+        if class_name is not None:
+            query += " AND class_name = ?"
+            params.append(class_name)
+        if since is not None:
+            query += " AND id > ?"
+            params.append(int(since))
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [dict(row) for row in rows]
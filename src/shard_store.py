@@ -0,0 +1,227 @@
+"""
+Append-Only Sharded Array Store for EcoSight
+Stores 1-D numeric arrays (embeddings, decoded PCM) in raw binary shard
+files that are read back through numpy memory maps, so lookups are
+zero-copy slices of the page cache.
+
+Layout:
+    root/
+        meta.json            (dtype and format version)
+        index.jsonl          (one JSON line per array: key, shard, offset, length)
+        shard-00000.bin
+        shard-00001.bin
+        ...
+
+Arrays are only ever appended. The index line is written after the data,
+so a crash can at worst leave unreferenced bytes at the end of a shard.
+The writer keeps the active shard and the index open between puts; shard
+writes are unbuffered (visible to memory maps at once), index lines are
+buffered until flush().
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+DEFAULT_MAX_SHARD_BYTES = 256 * 1024 * 1024  # Roll over to a new shard after 256 MB
+
+
+class ShardedArrayStore:
+    """Single-writer, multi-reader store of 1-D arrays in memory-mapped shards"""
+
+    def __init__(self, root_dir: Path, dtype: str = "float32",
+                 max_shard_bytes: int = DEFAULT_MAX_SHARD_BYTES):
+        """
+        Open (or create) a store
+
+        Args:
+            root_dir: Directory holding the shards and index
+            dtype: Element dtype for new stores (existing stores keep theirs)
+            max_shard_bytes: Size at which a new shard file is started
+        """
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.max_shard_bytes = max_shard_bytes
+        self._lock = threading.Lock()
+        self._maps: Dict[int, np.memmap] = {}
+        self._index: Dict[str, dict] = {}
+
+        meta_path = self.root_dir / "meta.json"
+        if meta_path.exists():
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            self.dtype = np.dtype(meta["dtype"])
+        else:
+            self.dtype = np.dtype(dtype)
+            with open(meta_path, 'w') as f:
+                json.dump({"dtype": self.dtype.name, "format_version": FORMAT_VERSION}, f, indent=2)
+
+        self._index_path = self.root_dir / "index.jsonl"
+        self._load_index()
+
+        # Appends go to the newest shard until it is full
+        shard_ids = [int(p.stem.split("-")[1]) for p in self.root_dir.glob("shard-*.bin")]
+        self._active_shard = max(shard_ids) if shard_ids else 0
+        shard_path = self._shard_path(self._active_shard)
+        self._active_bytes = shard_path.stat().st_size if shard_path.exists() else 0
+
+        # Append handles, opened on the first put (readers never open them)
+        self._shard_file = None
+        self._index_file = None
+
+    def _shard_path(self, shard_id: int) -> Path:
+        return self.root_dir / f"shard-{shard_id:05d}.bin"
+
+    def _load_index(self):
+        """Read index.jsonl, dropping torn lines and entries past the end of their shard"""
+        if not self._index_path.exists():
+            return
+
+        shard_sizes = {}
+        with open(self._index_path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                shard_id = entry["shard"]
+                if shard_id not in shard_sizes:
+                    shard_path = self._shard_path(shard_id)
+                    shard_sizes[shard_id] = (
+                        shard_path.stat().st_size // self.dtype.itemsize if shard_path.exists() else 0
+                    )
+                if entry["offset"] + entry["length"] <= shard_sizes[shard_id]:
+                    self._index[entry["key"]] = entry
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def keys(self) -> List[str]:
+        """All keys in insertion order"""
+        return list(self._index.keys())
+
+    def metadata(self, key: str) -> Optional[dict]:
+        """Index entry (including any extra metadata) for a key"""
+        return self._index.get(key)
+
+    def append_position(self) -> List[int]:
+        """
+        [shard, offset] the next append will be written at
+
+        Arrays are appended in key insertion order, so every array stored
+        after this call has a (shard, offset) at or beyond it.
+        """
+        with self._lock:
+            return [self._active_shard, self._active_bytes // self.dtype.itemsize]
+
+    def stored_since(self, key: str, position: List[int]) -> Optional[bool]:
+        """Whether a key was appended at or after an append_position() (None if unknown)"""
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        return (entry["shard"], entry["offset"]) >= tuple(position)
+
+    def _memmap(self, shard_id: int, end: int) -> np.memmap:
+        """Memory map of a shard covering at least `end` elements (remapped as the shard grows)"""
+        mapped = self._maps.get(shard_id)
+        if mapped is None or len(mapped) < end:
+            mapped = np.memmap(self._shard_path(shard_id), dtype=self.dtype, mode='r')
+            self._maps[shard_id] = mapped
+        return mapped
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Zero-copy view of a stored array
+
+        Args:
+            key: Array key
+
+        Returns:
+            Read-only memmap slice, or None if the key is unknown
+        """
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        start = entry["offset"]
+        end = start + entry["length"]
+        with self._lock:
+            mapped = self._memmap(entry["shard"], end)
+        return mapped[start:end]
+
+    def get_many(self, keys: Iterable[str]) -> List[Optional[np.ndarray]]:
+        """Zero-copy views for several keys (None for unknown keys)"""
+        return [self.get(key) for key in keys]
+
+    def put(self, key: str, array: np.ndarray, **extra) -> bool:
+        """
+        Append an array unless the key is already stored
+
+        Args:
+            key: Array key (e.g. content hash)
+            array: 1-D array; cast to the store dtype
+            **extra: JSON-serialisable metadata kept in the index entry
+
+        Returns:
+            True if the array was written, False if the key already existed
+        """
+        data = np.ascontiguousarray(np.asarray(array).ravel(), dtype=self.dtype)
+        with self._lock:
+            if key in self._index:
+                return False
+
+            if self._active_bytes > 0 and self._active_bytes + data.nbytes > self.max_shard_bytes:
+                if self._shard_file is not None:
+                    # The full shard is never written again: make it durable once
+                    os.fsync(self._shard_file.fileno())
+                    self._shard_file.close()
+                    self._shard_file = None
+                self._active_shard += 1
+                self._active_bytes = 0
+
+            if self._shard_file is None:
+                self._shard_file = open(self._shard_path(self._active_shard), 'ab', buffering=0)
+            if self._index_file is None:
+                self._index_file = open(self._index_path, 'a')
+
+            self._shard_file.write(data.tobytes())
+            entry = {
+                "key": key,
+                "shard": self._active_shard,
+                "offset": self._active_bytes // self.dtype.itemsize,
+                "length": int(data.size),
+                **extra
+            }
+            self._index_file.write(json.dumps(entry) + "\n")
+            self._active_bytes += data.nbytes
+            self._index[key] = entry
+        return True
+
+    def flush(self):
+        """Fsync the newest shard and the index so appended data survives a crash"""
+        with self._lock:
+            if self._shard_file is not None:
+                os.fsync(self._shard_file.fileno())
+            if self._index_file is not None:
+                self._index_file.flush()
+                os.fsync(self._index_file.fileno())
+
+    def close(self):
+        """Flush and close the append handles (the next put reopens them)"""
+        self.flush()
+        with self._lock:
+            for handle in (self._shard_file, self._index_file):
+                if handle is not None:
+                    handle.close()
+            self._shard_file = None
+            self._index_file = None
@@ -0,0 +1,260 @@
+"""
+Similar-Sound Search for EcoSight
+Persistent approximate nearest-neighbour index (ann_index.IVFIndex) over
+the YAMNet embeddings of training originals and past prediction clips, so
+the API can answer "which recordings sound like this one?" without
+scanning every stored embedding.
+
+Layout:
+    search_index/
+        ivf.json, centroids.npy, vectors.f32, lists.i32   (IVFIndex.save)
+        items.jsonl         (one line per vector: source, label, name, key, ...)
+
+Inserts are appended to the files as they happen. When the index has grown
+to REBUILD_GROWTH times the size its lists were clustered on, rebuild()
+re-clusters it and rewrites the directory (swapped in by rename).
+"""
+
+import json
+import logging
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from src.ann_index import IVFIndex, DEFAULT_NPROBE
+except ImportError:
+    from ann_index import IVFIndex, DEFAULT_NPROBE
+
+logger = logging.getLogger(__name__)
+
+ITEMS_FILENAME = "items.jsonl"
+REBUILD_GROWTH = 2.0  # re-cluster once the index doubles
+MIN_CLUSTERED_SIZE = 256  # below this the index is a single list (exact search)
+SOURCES = ("training", "prediction")
+
+
+class SoundSearchIndex:
+    """Thread-safe, disk-backed similar-sound index with a label per embedding"""
+
+    def __init__(self, index_dir: Path, dim: int = 1024, nprobe: int = DEFAULT_NPROBE):
+        """
+        Open (or create) the index in index_dir
+
+        Args:
+            index_dir: Directory holding the saved index
+            dim: Embedding dimension
+            nprobe: IVF lists scanned per query
+        """
+        self.index_dir = Path(index_dir)
+        self.dim = dim
+        self.nprobe = nprobe
+        self.items: List[dict] = []
+        self.keys = set()
+        self._source_codes = bytearray()  # SOURCES index of every item, for filtered search
+        self.index: Optional[IVFIndex] = None
+        self._clustered_size = 0
+        self._saved = 0
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys
+
+    def _load(self):
+        items_path = self.index_dir / ITEMS_FILENAME
+        if not items_path.exists():
+            return
+        try:
+            items = []
+            with open(items_path) as f:
+                for line in f:
+                    try:
+                        items.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break  # partially written last line
+            index = IVFIndex.load(self.index_dir, limit=len(items))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Search index at {self.index_dir} is unreadable, starting empty: {e}")
+            return
+        if index.dim != self.dim:
+            # Different embedding model: the first insert rewrites the directory
+            logger.warning(f"Search index has {index.dim}-d vectors, expected {self.dim}; starting empty")
+            return
+        index.nprobe = self.nprobe
+        self.index, self.items = index, items[:len(index)]
+        self.keys = {item["key"] for item in self.items if item.get("key")}
+        self._source_codes = bytearray(self._source_code(item.get("source")) for item in self.items)
+        self._clustered_size = len(index)
+        self._saved = len(index)
+        if len(items) != len(index):
+            # Interrupted append: rewrite a consistent copy
+            self._save_all()
+        logger.info(f"Search index {self.index_dir}: {len(self.items):,} embeddings, {index.nlist} lists")
+
+    @staticmethod
+    def _source_code(source: Optional[str]) -> int:
+        return SOURCES.index(source) if source in SOURCES else len(SOURCES)
+
+    def _save_all(self):
+        """Rewrite the whole directory (new centroids) and swap it in"""
+        tmp_dir = self.index_dir.with_name(self.index_dir.name + ".tmp")
+        old_dir = self.index_dir.with_name(self.index_dir.name + ".old")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        if self.index is not None:
+            self.index.save(tmp_dir)
+        with open(tmp_dir / ITEMS_FILENAME, "w") as f:
+            f.writelines(json.dumps(item) + "\n" for item in self.items)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if self.index_dir.exists():
+            self.index_dir.rename(old_dir)
+        tmp_dir.rename(self.index_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        self._saved = len(self.items)
+
+    def _save_new(self):
+        """Append vectors and items added since the last save"""
+        if self._saved == 0:
+            self._save_all()
+            return
+        self.index.save(self.index_dir, start=self._saved)
+        with open(self.index_dir / ITEMS_FILENAME, "a") as f:
+            f.writelines(json.dumps(item) + "\n" for item in self.items[self._saved:])
+        self._saved = len(self.items)
+
+    def add(self, embeddings: np.ndarray, items: List[dict]) -> int:
+        """
+        Insert embeddings and persist them
+
+        Args:
+            embeddings: Array of shape (n, dim) (or one (dim,) vector)
+            items: Metadata per embedding; "source", "label" and "key"
+                (content hash, used to skip re-inserts) are expected
+
+        Returns:
+            Number of embeddings inserted
+        """
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if len(embeddings) != len(items):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(items)} items")
+        if len(items) == 0:
+            return 0
+        added_at = datetime.now().isoformat()
+        with self._lock:
+            if self.index is None:
+                self.index = IVFIndex(self.dim, nlist=1, nprobe=self.nprobe)
+            self.index.add(embeddings)
+            for item in items:
+                self.items.append({"added_at": added_at, **item})
+                self._source_codes.append(self._source_code(item.get("source")))
+                if item.get("key"):
+                    self.keys.add(item["key"])
+            self._save_new()
+        return len(items)
+
+    def needs_rebuild(self) -> bool:
+        """True once the index has outgrown the lists it was clustered with"""
+        size = len(self)
+        return size >= MIN_CLUSTERED_SIZE and size >= REBUILD_GROWTH * max(self._clustered_size, 1)
+
+    def rebuild(self):
+        """
+        Re-cluster every stored embedding into a fresh IVF index
+
+        k-means runs outside the lock, so searches and inserts continue;
+        embeddings inserted meanwhile are filed into the new lists before
+        the swap.
+        """
+        with self._rebuild_lock:
+            with self._lock:
+                if self.index is None:
+                    return
+                vectors = self.index.vectors.copy()
+            fresh = IVFIndex(self.dim, nprobe=self.nprobe)
+            fresh.add(vectors)
+            with self._lock:
+                fresh.add(self.index.vectors[len(vectors):])
+                self.index = fresh
+                self._clustered_size = len(fresh)
+                self._save_all()
+            logger.info(f"Search index rebuilt: {len(fresh):,} embeddings in {fresh.nlist} lists")
+
+    def search(self, embedding: np.ndarray, k: int = 10, source: Optional[str] = None,
+               nprobe: Optional[int] = None) -> List[dict]:
+        """
+        Most similar stored clips
+
+        Args:
+            embedding: Query embedding (dim,)
+            k: Number of matches
+            source: Only return "training" or "prediction" clips (optional)
+            nprobe: Lists scanned (default: the index's nprobe)
+
+        Returns:
+            Item dicts with "similarity" (cosine) and "rank", best first
+        """
+        with self._lock:
+            if self.index is None or len(self.index) == 0:
+                return []
+            allowed = None
+            if source is not None:
+                allowed = np.frombuffer(bytes(self._source_codes), dtype=np.uint8) == self._source_code(source)
+            sims, ids = self.index.search(embedding, k=k, nprobe=nprobe, allowed=allowed)
+            matches = []
+            for similarity, item_id in zip(sims[0], ids[0]):
+                if item_id < 0:
+                    break
+                matches.append({**self.items[item_id], "similarity": round(float(similarity), 4),
+                                "rank": len(matches) + 1})
+        return matches
+
+    def index_samples(self, samples: Iterable[dict], embed: Callable[[Path], np.ndarray],
+                      batch_size: int = 256) -> dict:
+        """
+        Embed and insert training originals that are not indexed yet
+
+        Args:
+            samples: Sample manifest rows (path, sha256, class_name)
+            embed: Returns the embedding for an audio path
+            batch_size: Embeddings inserted (and persisted) per batch
+
+        Returns:
+            Dict with indexed, skipped and failed counts
+        """
+        stats = {"indexed": 0, "skipped": 0, "failed": 0}
+        embeddings, items = [], []
+
+        def insert():
+            stats["indexed"] += self.add(np.stack(embeddings), items)
+            embeddings.clear()
+            items.clear()
+
+        for row in samples:
+            if row["sha256"] in self:
+                stats["skipped"] += 1
+                continue
+            try:
+                embeddings.append(embed(Path(row["path"])))
+            except Exception as e:
+                logger.warning(f"Search index: could not embed {row['path']}: {e}")
+                stats["failed"] += 1
+                continue
+            items.append({"source": "training", "label": row["class_name"],
+                          "name": Path(row["path"]).name, "key": row["sha256"]})
+            if len(items) == batch_size:
+                insert()
+        if items:
+            insert()
+
+        if self.needs_rebuild():
+            self.rebuild()
+        return stats
@@ -0,0 +1,244 @@
+"""
+SpecAugment-style Augmentation for EcoSight
+Augments YAMNet's log-mel patches instead of the waveform, so each clip is
+decoded and turned into log-mel patches once and every variant only costs
+a pass through YAMNet's embedding layers.
+
+Augmentations (applied per 96x64 patch):
+    - Frequency masking: mel bands replaced by the patch mean
+    - Time masking: frames replaced by the patch mean
+    - Time warping: piecewise-linear stretch around a random frame
+    - Gain jitter: constant offset in the log domain (+/- a few dB)
+
+The TF Hub YAMNet only accepts a waveform, so this mode needs the Keras
+YAMNet from tensorflow/models (research/audioset/yamnet): a directory with
+yamnet.py, params.py, features.py and the yamnet.h5 weights, pointed to by
+YAMNET_KERAS_DIR (and optionally YAMNET_WEIGHTS).
+"""
+
+import os
+import sys
+import logging
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import tensorflow as tf
+    TF_AVAILABLE = True
+except ImportError:
+    TF_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Bump when the variants generated for a given seed change (invalidates cached variant embeddings)
+SPEC_AUGMENT_VERSION = 1
+
+YAMNET_KERAS_DIR = os.getenv("YAMNET_KERAS_DIR", "")
+YAMNET_WEIGHTS = os.getenv("YAMNET_WEIGHTS", "")
+
+# Default SpecAugment policy for 96-frame x 64-band YAMNet patches
+DEFAULT_POLICY = {
+    "freq_masks": 2,
+    "max_freq_width": 8,
+    "time_masks": 2,
+    "max_time_width": 10,
+    "max_warp": 5,
+    "max_gain_db": 6.0,
+}
+
+
+def spec_variant_names(augmentations_per_file: int) -> List[str]:
+    """Variant names produced per clip: 'original' plus one per augmentation"""
+    return ['original'] + [f"specaug_{i + 1}" for i in range(augmentations_per_file)]
+
+
+def _span_mask(rng, num_patches: int, size: int, num_masks: int, max_width: int) -> np.ndarray:
+    """Boolean (num_patches, size) mask with num_masks random spans per patch"""
+    mask = np.zeros((num_patches, size), dtype=bool)
+    positions = np.arange(size)[None, :]
+    for _ in range(num_masks):
+        widths = rng.randint(0, max_width + 1, size=num_patches)
+        starts = rng.randint(0, size - widths + 1)
+        mask |= (positions >= starts[:, None]) & (positions < (starts + widths)[:, None])
+    return mask
+
+
+def time_warp(patches: np.ndarray, rng, max_warp: int) -> np.ndarray:
+    """
+    Warp each patch along time: frame `center` moves to `center + shift`
+    and both sides are linearly resampled to fit
+
+    Args:
+        patches: Array of shape (num_patches, frames, bands)
+        rng: np.random.RandomState
+        max_warp: Maximum shift of the warp point in frames
+
+    Returns:
+        Warped patches (same shape)
+    """
+    num_patches, frames, _ = patches.shape
+    if max_warp <= 0 or frames <= 2 * max_warp + 1:
+        return patches
+
+    centers = rng.randint(max_warp + 1, frames - max_warp - 1, size=num_patches).astype(np.float64)
+    shifts = rng.randint(-max_warp, max_warp + 1, size=num_patches).astype(np.float64)
+    warped_centers = centers + shifts
+
+    # Source position for every output frame (piecewise linear through the warp point)
+    t = np.arange(frames, dtype=np.float64)[None, :]
+    left = t * centers[:, None] / warped_centers[:, None]
+    right = centers[:, None] + (t - warped_centers[:, None]) * \
+        (frames - 1 - centers[:, None]) / (frames - 1 - warped_centers[:, None])
+    source = np.clip(np.where(t <= warped_centers[:, None], left, right), 0, frames - 1)
+
+    lower = np.floor(source).astype(np.int64)
+    upper = np.minimum(lower + 1, frames - 1)
+    frac = (source - lower)[:, :, None]
+    rows = np.arange(num_patches)[:, None]
+    return patches[rows, lower] * (1 - frac) + patches[rows, upper] * frac
+
+
+def spec_augment_patches(patches: np.ndarray, rng, freq_masks: int = 2, max_freq_width: int = 8,
+                         time_masks: int = 2, max_time_width: int = 10, max_warp: int = 5,
+                         max_gain_db: float = 6.0) -> np.ndarray:
+    """
+    Apply SpecAugment to a batch of log-mel patches (vectorized across patches)
+
+    Args:
+        patches: Log-mel patches, shape (num_patches, frames, bands)
+        rng: np.random.RandomState
+        freq_masks: Frequency masks per patch
+        max_freq_width: Maximum mel bands per frequency mask
+        time_masks: Time masks per patch
+        max_time_width: Maximum frames per time mask
+        max_warp: Maximum time-warp shift in frames (0 disables warping)
+        max_gain_db: Maximum gain jitter in dB (0 disables it)
+
+    Returns:
+        Augmented float32 patches (same shape)
+    """
+    augmented = time_warp(np.asarray(patches, dtype=np.float64), rng, max_warp)
+    num_patches, frames, bands = augmented.shape
+
+    if max_gain_db > 0:
+        # Log mel of a magnitude spectrogram: g dB of gain adds g/20 * ln(10)
+        gain_db = rng.uniform(-max_gain_db, max_gain_db, size=num_patches)
+        augmented = augmented + (gain_db * np.log(10) / 20)[:, None, None]
+
+    # Masked cells take the patch mean, i.e. "no information" rather than silence
+    fill = augmented.mean(axis=(1, 2), keepdims=True)
+    freq_mask = _span_mask(rng, num_patches, bands, freq_masks, max_freq_width)[:, None, :]
+    time_mask = _span_mask(rng, num_patches, frames, time_masks, max_time_width)[:, :, None]
+    augmented = np.where(freq_mask | time_mask, fill, augmented)
+
+    return augmented.astype(np.float32)
+
+
+def _import_keras_yamnet(keras_dir: Path):
+    """Import yamnet.py / params.py / features.py from a tensorflow/models checkout"""
+    for name in ("yamnet.py", "params.py", "features.py"):
+        if not (keras_dir / name).exists():
+            raise FileNotFoundError(
+                f"{keras_dir / name} not found; set YAMNET_KERAS_DIR to the "
+                f"tensorflow/models research/audioset/yamnet directory"
+            )
+    # yamnet.py imports its siblings as top-level modules
+    if str(keras_dir) not in sys.path:
+        sys.path.insert(0, str(keras_dir))
+    import params as yamnet_params
+    import features as yamnet_features
+    import yamnet as yamnet_lib
+    return yamnet_params, yamnet_features, yamnet_lib
+
+
+def keras_yamnet_available(keras_dir: Optional[str] = None) -> bool:
+    """Whether TensorFlow and the Keras YAMNet sources/weights are present"""
+    keras_dir = keras_dir or YAMNET_KERAS_DIR
+    if not TF_AVAILABLE or not keras_dir:
+        return False
+    keras_dir = Path(keras_dir)
+    weights = Path(YAMNET_WEIGHTS) if YAMNET_WEIGHTS else keras_dir / "yamnet.h5"
+    return all((keras_dir / name).exists() for name in ("yamnet.py", "params.py", "features.py")) \
+        and weights.exists()
+
+
+class SpecAugmentEmbedder:
+    """Compute log-mel patches once per clip and embed SpecAugment variants of them"""
+
+    def __init__(self, keras_dir: Optional[str] = None, weights_path: Optional[str] = None,
+                 policy: Optional[dict] = None):
+        """
+        Load the Keras YAMNet split at its log-mel patches
+
+        Args:
+            keras_dir: Directory with yamnet.py, params.py, features.py (default: YAMNET_KERAS_DIR)
+            weights_path: yamnet.h5 weights (default: YAMNET_WEIGHTS or keras_dir/yamnet.h5)
+            policy: SpecAugment parameters (default: DEFAULT_POLICY)
+        """
+        if not TF_AVAILABLE:
+            raise ImportError("TensorFlow is required for SpecAugment mode")
+        keras_dir = keras_dir or YAMNET_KERAS_DIR
+        if not keras_dir:
+            raise FileNotFoundError("YAMNET_KERAS_DIR is not set")
+        keras_dir = Path(keras_dir)
+        weights_path = Path(weights_path or YAMNET_WEIGHTS or keras_dir / "yamnet.h5")
+        if not weights_path.exists():
+            raise FileNotFoundError(f"YAMNet weights not found: {weights_path}")
+
+        yamnet_params, self._features, yamnet_lib = _import_keras_yamnet(keras_dir)
+        self.params = yamnet_params.Params()
+        self.policy = {**DEFAULT_POLICY, **(policy or {})}
+
+        # Patches in, (scores, embeddings) out: the part of YAMNet after feature extraction
+        patches_input = tf.keras.layers.Input(
+            shape=(self.params.patch_frames, self.params.patch_bands), dtype=tf.float32
+        )
+        scores, embeddings = yamnet_lib.yamnet(patches_input, self.params)
+        self.model = tf.keras.Model(inputs=patches_input, outputs=[scores, embeddings])
+        self.model.load_weights(str(weights_path))
+        logger.info(f"Loaded Keras YAMNet from {keras_dir} ({weights_path.name})")
+
+    def log_mel_patches(self, waveform: np.ndarray) -> np.ndarray:
+        """YAMNet's log-mel patches for a 16 kHz waveform, shape (num_patches, 96, 64)"""
+        waveform = tf.convert_to_tensor(np.asarray(waveform, dtype=np.float32))
+        if hasattr(self._features, "pad_waveform"):
+            waveform = self._features.pad_waveform(waveform, self.params)
+        _, patches = self._features.waveform_to_log_mel_spectrogram_patches(waveform, self.params)
+        return patches.numpy()
+
+    def embed_clips(self, clips: Sequence[Tuple[np.ndarray, int]],
+                    augmentations_per_file: int) -> List[List[np.ndarray]]:
+        """
+        Embed each clip and its SpecAugment variants in a single YAMNet call
+
+        Args:
+            clips: (waveform, seed) pairs; the seed makes each clip's variants reproducible
+            augmentations_per_file: SpecAugment variants per clip
+
+        Returns:
+            Per clip, mean embeddings in spec_variant_names() order
+        """
+        blocks = []
+        counts = []
+        for waveform, seed in clips:
+            patches = self.log_mel_patches(waveform)
+            rng = np.random.RandomState(seed)
+            blocks.append(patches.astype(np.float32))
+            for _ in range(augmentations_per_file):
+                blocks.append(spec_augment_patches(patches, rng, **self.policy))
+            counts.append(len(patches))
+
+        _, embeddings = self.model(np.concatenate(blocks), training=False)
+        embeddings = embeddings.numpy()
+
+        results = []
+        offset = 0
+        for num_patches in counts:
+            variants = []
+            for _ in range(1 + augmentations_per_file):
+                variants.append(embeddings[offset:offset + num_patches].mean(axis=0))
+                offset += num_patches
+            results.append(variants)
+        return results
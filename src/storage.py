@@ -0,0 +1,283 @@
+"""
+Storage Backends for EcoSight
+Dataset and model operations used by the API and the retraining pipeline,
+independent of where the bucket lives.
+
+Backends (STORAGE_BACKEND):
+    - "s3" (default): S3Storage, an S3 bucket (or S3-compatible endpoint)
+    - "local": LocalStorage, a local or NFS directory laid out like the
+      bucket (LOCAL_STORAGE_ROOT), with no network round-trips
+
+Both use the same key layout:
+    extracted_audio/<class>/<file>     original training audio
+    augmented_audio/<class>/<file>     augmented audio (legacy)
+    models/<artifact>, models/manifest.json
+    shards/<dataset>/index.json, shards/<dataset>/<class>/shard-NNNNN.tar
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from src.model_manifest import build_manifest, write_manifest, stale_files, file_matches, MANIFEST_FILENAME
+    from src.audio_shards import pack_directory
+except ImportError:
+    from model_manifest import build_manifest, write_manifest, stale_files, file_matches, MANIFEST_FILENAME
+    from audio_shards import pack_directory
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "s3")
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "/data/ecosight")
+S3_SHARDED_DATASETS = os.getenv("S3_SHARDED_DATASETS", "false").lower() == "true"
+SHARD_PREFIX = "shards/"
+AUDIO_SUFFIXES = ('.wav', '.mp3')
+
+
+class StorageBackend(ABC):
+    """Dataset and model operations shared by every storage backend"""
+
+    name = "storage"
+
+    # ------------------------------------------------------------ primitives
+
+    @abstractmethod
+    def upload_file(self, local_file: str, key: str) -> bool:
+        """Store one local file under key"""
+
+    @abstractmethod
+    def _read_model_manifest(self) -> Optional[dict]:
+        """The stored models/manifest.json, or None if there is none (raises on other errors)"""
+
+    @abstractmethod
+    def _fetch_model_file(self, name: str, local_path: Path):
+        """Copy models/<name> to local_path"""
+
+    # -------------------------------------------------------------- datasets
+
+    @abstractmethod
+    def sync_extracted_audio(self, local_dir: str, max_workers: int = 16) -> Optional[Dict[str, int]]:
+        """
+        Incrementally bring local_dir up to date with extracted_audio/
+
+        Returns:
+            Dict with listed, downloaded, unchanged, failed and bytes counts,
+            or None if the store could not be listed
+        """
+
+    def download_extracted_audio(self, local_dir: str = "/app/extracted_audio") -> bool:
+        """Sync original audio into local_dir; True if nothing failed"""
+        stats = self.sync_extracted_audio(local_dir)
+        return stats is not None and stats["failed"] == 0
+
+    @abstractmethod
+    def download_training_data(self, local_dir: str = "/app/augmented_audio",
+                               sharded: bool = S3_SHARDED_DATASETS) -> bool:
+        """Fetch augmented_audio/ (single files, or its tar shards when sharded)"""
+
+    @abstractmethod
+    def upload_training_data(self, local_dir: str = "./augmented_audio",
+                             sharded: bool = S3_SHARDED_DATASETS) -> bool:
+        """Store a local augmented_audio directory (single files, or packed into shards)"""
+
+    @abstractmethod
+    def list_training_files(self) -> List[str]:
+        """Keys of the .wav files under augmented_audio/"""
+
+    def upload_files(self, files: List[Tuple[str, str]], max_workers: int = 8) -> Dict[str, bool]:
+        """
+        Store a batch of files concurrently
+
+        Args:
+            files: List of (local_file, key) pairs
+            max_workers: Number of concurrent uploads
+
+        Returns:
+            Dict mapping key to upload success
+        """
+        if not files:
+            return {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda pair: self.upload_file(*pair), files)
+            outcome = {key: ok for (_, key), ok in zip(files, results)}
+        logger.info(f"✓ Batch uploaded {sum(outcome.values())}/{len(files)} files to {self.name}")
+        return outcome
+
+    # ---------------------------------------------------------------- shards
+
+    @abstractmethod
+    def upload_shards(self, local_dataset_dir: str, dataset: str, max_workers: int = 4) -> bool:
+        """Store a packed dataset: all shards first, then its index"""
+
+    @abstractmethod
+    def get_shard_index(self, dataset: str, refresh: bool = False) -> Optional[dict]:
+        """A dataset's shard index, or None if the dataset has no shards"""
+
+    @abstractmethod
+    def download_shards(self, dataset: str, local_dir: str, class_name: Optional[str] = None,
+                        max_workers: int = 4) -> Optional[int]:
+        """Extract a sharded dataset into local_dir/<class>/; returns files written or None"""
+
+    @abstractmethod
+    def fetch_sample(self, dataset: str, name: str) -> bytes:
+        """Bytes of one sample ("<class>/<file>") read from its shard by offset"""
+
+    @abstractmethod
+    def stream_shard_samples(self, dataset: str, class_name: Optional[str] = None) -> Iterator[Tuple[str, bytes]]:
+        """Yield (name, bytes) for every sample of a sharded dataset"""
+
+    def list_shard_samples(self, dataset: str, class_name: Optional[str] = None) -> List[dict]:
+        """Index entries (name, class, shard, offset, size) of a sharded dataset's samples"""
+        index = self.get_shard_index(dataset)
+        if index is None:
+            return []
+        return [m for m in index["members"] if class_name is None or m["class"] == class_name]
+
+    def _pack_and_upload(self, local_dir: str, dataset: str) -> bool:
+        """Pack a class-structured directory into shards and store them"""
+        with tempfile.TemporaryDirectory(prefix="ecosight-shards-") as tmp_dir:
+            pack_directory(Path(local_dir), Path(tmp_dir))
+            return self.upload_shards(tmp_dir, dataset)
+
+    # ---------------------------------------------------------------- models
+
+    @abstractmethod
+    def download_model(self, local_dir: str = "/app/models") -> bool:
+        """Fetch every model artifact into local_dir (no manifest, no verification)"""
+
+    def sync_model(self, local_dir: str = "/app/models", max_workers: int = 8) -> bool:
+        """
+        Bring local model artifacts up to the version in the stored models/manifest.json
+
+        Only files that are missing locally or whose SHA-256 differs from the
+        manifest are fetched, in parallel, into a staging directory. Every
+        file is verified before it is renamed into place; the local manifest
+        is replaced last and marks the switch as complete. Stores without a
+        manifest fall back to download_model().
+
+        Args:
+            local_dir: Live models directory
+            max_workers: Concurrent file fetches
+
+        Returns:
+            bool: True if local_dir now matches the stored manifest
+        """
+        start = time.perf_counter()
+        try:
+            remote = self._read_model_manifest()
+        except Exception as e:
+            logger.error(f"Could not fetch model manifest from {self.name}: {e}")
+            return False
+        if remote is None:
+            logger.warning(f"No model manifest in {self.name}, downloading all model files")
+            return self.download_model(local_dir)
+
+        local_dir = Path(local_dir)
+        local_dir.mkdir(parents=True, exist_ok=True)
+        version = remote.get("version", "unknown")
+        stale = stale_files(local_dir, remote)
+        if not stale:
+            write_manifest(local_dir, remote)
+            logger.info(f"✓ Local models already at version {version}")
+            return True
+
+        logger.info(f"Fetching {len(stale)} of {len(remote['files'])} model files for version {version}: {stale}")
+        staging_dir = local_dir / f".staging-{version}"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        staging_dir.mkdir(parents=True)
+
+        def fetch(name):
+            file_start = time.perf_counter()
+            staged_path = staging_dir / name
+            self._fetch_model_file(name, staged_path)
+            if not file_matches(staged_path, remote["files"][name]):
+                raise IOError(f"checksum mismatch for {name}")
+            return time.perf_counter() - file_start
+
+        failed = []
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(fetch, name): name for name in stale}
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        seconds = future.result()
+                        size_mb = remote["files"][name]["size"] / 1e6
+                        logger.info(f"✓ {name}: {size_mb:.2f} MB in {seconds:.2f}s")
+                    except Exception as e:
+                        logger.error(f"✗ {name}: {e}")
+                        failed.append(name)
+
+            if failed:
+                logger.error(f"Model sync aborted, keeping the current files ({len(failed)} failed)")
+                return False
+
+            # Switch: per-file atomic renames, then the manifest as the commit point
+            for name in stale:
+                os.replace(staging_dir / name, local_dir / name)
+            write_manifest(local_dir, remote)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        logger.info(f"✓ Models at version {version} ({time.perf_counter() - start:.2f}s cold start)")
+        return True
+
+    def upload_model(self, local_dir: str = "/app/models", version: Optional[str] = None,
+                     max_workers: int = 8) -> bool:
+        """
+        Store model artifacts in parallel, then a manifest describing them
+
+        Args:
+            local_dir: Models directory
+            version: Model version recorded in the manifest (default: timestamp)
+            max_workers: Concurrent uploads
+
+        Returns:
+            bool: True if every file and the manifest were stored
+        """
+        manifest = build_manifest(Path(local_dir), version=version)
+        files = [(str(Path(local_dir) / name), f"models/{name}") for name in manifest["files"]]
+        if not all(self.upload_files(files, max_workers=max_workers).values()):
+            return False
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_manifest(Path(tmp_dir), manifest)
+            return self.upload_file(str(Path(tmp_dir) / MANIFEST_FILENAME), f"models/{MANIFEST_FILENAME}")
+
+
+def storage_configured() -> bool:
+    """Whether the configured backend has what it needs (bucket credentials or a local root)"""
+    if STORAGE_BACKEND == "local":
+        return Path(LOCAL_STORAGE_ROOT).exists()
+    return bool(os.getenv("S3_BUCKET") and os.getenv("AWS_ACCESS_KEY_ID"))
+
+
+# Singleton instance
+_storage = None
+
+
+def get_storage() -> StorageBackend:
+    """Get or create the configured storage backend (STORAGE_BACKEND=s3|local)"""
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "local":
+            try:
+                from src.local_storage import LocalStorage
+            except ImportError:
+                from local_storage import LocalStorage
+            _storage = LocalStorage(LOCAL_STORAGE_ROOT)
+        elif STORAGE_BACKEND == "s3":
+            try:
+                from src.s3_storage import S3Storage
+            except ImportError:
+                from s3_storage import S3Storage
+            _storage = S3Storage()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}' (expected 's3' or 'local')")
+    return _storage
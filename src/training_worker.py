@@ -0,0 +1,398 @@
+"""
+Persistent Retraining Worker for EcoSight
+Runs retraining jobs in one long-lived child process that keeps TensorFlow
+and YAMNet loaded between jobs, instead of a fresh subprocess per /retrain.
+
+    API process                               worker process
+    -----------                               --------------
+    TrainingWorker.submit() -> job record     import retrain_model, load YAMNet once
+    dispatch (one job at a time) --job-->     run_retraining(progress_callback, cancel_check)
+    listener thread <------- events ------    started / progress / completed / failed / cancelled
+
+Progress events carry the stage, overall percent and an ETA. Cancellation
+of a running job sets a shared event that the pipeline checks between
+batches; queued jobs are simply dropped from the queue.
+"""
+
+import os
+import sys
+import atexit
+import time
+import uuid
+import logging
+import threading
+import multiprocessing
+import queue
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Share of the overall progress bar taken by each pipeline stage
+STAGE_WEIGHTS = [
+    ("preparing", 5),
+    ("extracting_features", 55),
+    ("training", 35),
+    ("saving", 5),
+]
+TERMINAL_STATUSES = ("completed", "skipped", "failed", "cancelled")
+PROGRESS_INTERVAL_SECONDS = 0.5
+MAX_EVENTS_PER_JOB = 2000
+
+
+class ProgressReporter:
+    """Turn per-stage fractions into overall percent + ETA events (throttled)"""
+
+    def __init__(self, emit: Callable[[dict], None], interval: float = PROGRESS_INTERVAL_SECONDS):
+        self.emit = emit
+        self.interval = interval
+        self.start = time.monotonic()
+        self.last_emit = 0.0
+        self.last_stage = None
+        self.offsets = {}
+        offset = 0
+        for stage, weight in STAGE_WEIGHTS:
+            self.offsets[stage] = (offset, weight)
+            offset += weight
+
+    def __call__(self, stage: str, fraction: float, message: str = ""):
+        offset, weight = self.offsets.get(stage, (0, 0))
+        percent = min(100.0, offset + weight * max(0.0, fraction))
+        now = time.monotonic()
+        if stage == self.last_stage and fraction < 1.0 and now - self.last_emit < self.interval:
+            return
+        self.last_stage = stage
+        self.last_emit = now
+
+        elapsed = now - self.start
+        eta = elapsed * (100.0 - percent) / percent if percent > 0 else None
+        self.emit({
+            "type": "progress",
+            "stage": stage,
+            "stage_percent": round(100.0 * min(1.0, fraction), 1),
+            "percent": round(percent, 1),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "elapsed_seconds": round(elapsed, 1),
+            "message": message
+        })
+
+
+def _serve_jobs(job_queue, event_queue, cancel_event, run_job: Callable, cancelled_error=()):
+    """
+    Child process job loop: run jobs until a None job arrives
+
+    Args:
+        job_queue: Jobs from the API process
+        event_queue: Events back to the API process
+        cancel_event: Set by the API process to cancel the running job
+        run_job: Called as run_job(job, progress_callback, cancel_check); returns the result dict
+        cancelled_error: Exception type(s) run_job raises when cancelled
+    """
+    event_queue.put({"type": "ready", "pid": os.getpid()})
+
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        job_id = job["job_id"]
+
+        def emit(event, job_id=job_id):
+            event_queue.put({**event, "job_id": job_id, "time": datetime.now().isoformat()})
+
+        emit({"type": "started"})
+        try:
+            result = run_job(job, ProgressReporter(emit), cancel_event.is_set)
+            emit({"type": result.get("status", "completed"), "result": result})
+        except cancelled_error as e:
+            emit({"type": "cancelled", "message": str(e)})
+        except Exception as e:
+            logger.exception("Retraining job failed")
+            emit({"type": "failed", "error": f"{type(e).__name__}: {e}"})
+
+
+def _worker_main(job_queue, event_queue, cancel_event):
+    """Child process: load retraining code and YAMNet once, then serve jobs"""
+    project_dir = Path(__file__).resolve().parent.parent
+    sys.path.insert(0, str(project_dir / "src"))
+    sys.path.insert(0, str(project_dir / "scripts"))
+
+    try:
+        import retrain_model
+        import tensorflow_hub as hub
+        yamnet_model = hub.load(retrain_model.YAMNET_MODEL_URL)
+    except Exception as e:
+        event_queue.put({"type": "worker_failed", "error": f"{type(e).__name__}: {e}"})
+        return
+
+    def run_job(job, progress_callback, cancel_check):
+        return retrain_model.run_retraining(
+            yamnet_model=yamnet_model,
+            min_new_samples=job.get("min_new_samples", retrain_model.MIN_NEW_SAMPLES),
+            progress_callback=progress_callback,
+            cancel_check=cancel_check
+        )
+
+    _serve_jobs(job_queue, event_queue, cancel_event, run_job, retrain_model.RetrainingCancelled)
+
+
+class TrainingWorker:
+    """API-side handle: job records, dispatch to the worker process and event collection"""
+
+    def __init__(self, on_model_updated: Optional[Callable[[], None]] = None,
+                 target: Callable = _worker_main):
+        """
+        Args:
+            on_model_updated: Called (in the listener thread) after a job completes,
+                              e.g. to reload the classifier
+            target: Worker process entry point, called with (job_queue, event_queue, cancel_event)
+        """
+        self.on_model_updated = on_model_updated
+        self.target = target
+        self._ctx = multiprocessing.get_context("spawn")  # TensorFlow is not fork-safe
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, dict] = {}
+        self._pending = deque()
+        self._running_job: Optional[str] = None
+        self._process = None
+        self._ready = False
+        self._listener = None
+        self._stopping = False
+        self._atexit_registered = False
+
+    # ---------------------------------------------------------------- process
+
+    def start(self):
+        """Start (or restart) the worker process; YAMNet loads in the background"""
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                return
+            self._job_queue = self._ctx.Queue()
+            self._event_queue = self._ctx.Queue()
+            self._cancel_event = self._ctx.Event()
+            self._ready = False
+            # Not daemonic: daemonic processes may not start children, and the
+            # retraining pipeline augments in a process pool. stop() (called on
+            # API shutdown and at exit) terminates and joins it instead.
+            self._process = self._ctx.Process(
+                target=self.target,
+                args=(self._job_queue, self._event_queue, self._cancel_event),
+                name="ecosight-training-worker",
+                daemon=False
+            )
+            self._process.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+            logger.info(f"Training worker started (pid {self._process.pid})")
+            self._stopping = False
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="training-worker-events", daemon=True)
+                self._listener.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Ask the worker to exit after its current job (terminates it after timeout) and join it"""
+        with self._lock:
+            self._stopping = True
+            process = self._process
+            if process is None:
+                return
+            self._process = None
+            self._job_queue.put(None)
+        process.join(timeout)
+        if process.is_alive():
+            logger.warning(f"Training worker (pid {process.pid}) did not exit, terminating it")
+            process.terminate()
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        with self._lock:
+            self._fail_running("worker stopped")
+
+    @property
+    def ready(self) -> bool:
+        """Whether the worker process has YAMNet loaded"""
+        return self._ready and self._process is not None and self._process.is_alive()
+
+    @property
+    def busy(self) -> bool:
+        return self._running_job is not None
+
+    # ------------------------------------------------------------------- jobs
+
+    def submit(self, **params) -> dict:
+        """Queue a retraining job; returns its record"""
+        job_id = uuid.uuid4().hex[:12]
+        record = {
+            "job_id": job_id,
+            "status": "queued",
+            "stage": "queued",
+            "percent": 0.0,
+            "eta_seconds": None,
+            "message": "",
+            "params": params,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "events": [],
+            "next_seq": 1
+        }
+        with self._lock:
+            self._jobs[job_id] = record
+            self._pending.append(job_id)
+            self._append_event(record, {"type": "queued", "time": record["created_at"]})
+        self.start()
+        self._dispatch()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Job record without its event log (None if unknown)"""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return None
+            summary = {k: v for k, v in record.items() if k not in ("events", "next_seq")}
+            summary["queue_position"] = (
+                list(self._pending).index(job_id) + 1 if job_id in self._pending else None
+            )
+            return summary
+
+    def events_since(self, job_id: str, after_seq: int = 0) -> List[dict]:
+        """Events of a job with a sequence number greater than after_seq"""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return []
+            return [event for event in record["events"] if event["seq"] > after_seq]
+
+    def list_jobs(self) -> List[dict]:
+        """All known jobs, newest first"""
+        with self._lock:
+            job_ids = list(self._jobs.keys())
+        return [self.get(job_id) for job_id in reversed(job_ids)]
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Cancel a queued job immediately or signal a running one; returns the record"""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return None
+            if job_id in self._pending:
+                self._pending.remove(job_id)
+                self._finish(record, "cancelled", {"type": "cancelled", "message": "Cancelled before start"})
+            elif job_id == self._running_job:
+                self._cancel_event.set()
+                record["message"] = "Cancellation requested"
+                self._append_event(record, {"type": "cancelling", "time": datetime.now().isoformat()})
+        return self.get(job_id)
+
+    # --------------------------------------------------------------- internal
+
+    def _append_event(self, record: dict, event: dict):
+        record["events"].append({**event, "seq": record["next_seq"]})
+        record["next_seq"] += 1
+        if len(record["events"]) > MAX_EVENTS_PER_JOB:
+            # Keep the first events (queued/started) and the most recent progress
+            del record["events"][2:len(record["events"]) - MAX_EVENTS_PER_JOB + 2]
+
+    def _finish(self, record: dict, status: str, event: dict):
+        record["status"] = status
+        record["finished_at"] = datetime.now().isoformat()
+        if status != "completed":
+            record["eta_seconds"] = None
+        self._append_event(record, {**event, "type": status, "time": record["finished_at"]})
+
+    def _dispatch(self):
+        """Hand the next queued job to the worker when it is idle"""
+        with self._lock:
+            if self._running_job is not None or not self._pending or self._process is None:
+                return
+            job_id = self._pending.popleft()
+            self._running_job = job_id
+            self._cancel_event.clear()
+            self._job_queue.put({"job_id": job_id, **self._jobs[job_id]["params"]})
+            record = self._jobs[job_id]
+            record["status"] = "running"
+            record["stage"] = "loading" if not self._ready else "starting"
+
+    def _listen(self):
+        """Apply worker events to job records; restart the worker if it dies"""
+        while not self._stopping:
+            try:
+                event = self._event_queue.get(timeout=1.0)
+            except queue.Empty:
+                if self._process is not None and not self._process.is_alive() and not self._stopping:
+                    self._handle_worker_exit(f"worker exited with code {self._process.exitcode}")
+                continue
+            except (EOFError, OSError):
+                continue
+            self._handle_event(event)
+
+    def _handle_event(self, event: dict):
+        completed = False
+        with self._lock:
+            kind = event.get("type")
+            if kind == "ready":
+                self._ready = True
+                logger.info(f"Training worker ready (pid {event.get('pid')})")
+                return
+            if kind == "worker_failed":
+                logger.error(f"Training worker failed to start: {event.get('error')}")
+                self._fail_running(f"worker failed to start: {event.get('error')}")
+                for job_id in list(self._pending):
+                    self._pending.remove(job_id)
+                    self._finish(self._jobs[job_id], "failed", {"error": event.get("error")})
+                return
+
+            record = self._jobs.get(event.get("job_id"))
+            if record is None:
+                return
+            if kind == "started":
+                record["status"] = "running"
+                record["stage"] = "preparing"
+                record["started_at"] = event.get("time")
+                self._append_event(record, event)
+            elif kind == "progress":
+                record["stage"] = event["stage"]
+                record["percent"] = event["percent"]
+                record["eta_seconds"] = event["eta_seconds"]
+                record["message"] = event.get("message", "")
+                self._append_event(record, event)
+            elif kind in TERMINAL_STATUSES:
+                if kind == "completed":
+                    record["percent"] = 100.0
+                    record["eta_seconds"] = 0.0
+                record["stage"] = kind
+                record["result"] = event.get("result")
+                record["error"] = event.get("error")
+                record["message"] = event.get("message", record["message"])
+                self._finish(record, kind, event)
+                self._running_job = None
+                completed = kind == "completed"
+
+        if completed and self.on_model_updated is not None:
+            try:
+                self.on_model_updated()
+            except Exception as e:
+                logger.error(f"Error reloading model after retraining: {e}")
+        self._dispatch()
+
+    def _fail_running(self, error: str):
+        if self._running_job is not None:
+            record = self._jobs[self._running_job]
+            record["error"] = error
+            self._finish(record, "failed", {"error": error})
+            self._running_job = None
+
+    def _handle_worker_exit(self, reason: str):
+        logger.error(f"Training worker died: {reason}")
+        with self._lock:
+            self._fail_running(reason)
+            self._process = None
+        if self._pending:
+            self.start()
+            self._dispatch()
@@ -0,0 +1,82 @@
+"""
+Tests for the content-addressed audio store (src/audio_store.py)
+
+Run with: python -m pytest tests/
+"""
+
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from audio_store import ContentAddressedAudioStore, hash_file
+from sample_manifest import SampleManifest
+
+WAV_BYTES = b"RIFF\x24\x00\x00\x00WAVEfmt " + bytes(range(64))
+
+
+def test_duplicate_stored_by_another_process_is_detected(tmp_path):
+    # Two stores on one directory stand in for two API workers
+    first = ContentAddressedAudioStore(tmp_path)
+    second = ContentAddressedAudioStore(tmp_path)
+    assert not second.contains("bird", "0" * 64)  # caches the (empty) index
+
+    stored = first.save_stream(io.BytesIO(WAV_BYTES), "bird", "a.wav")
+    again = second.save_stream(io.BytesIO(WAV_BYTES), "bird", "b.wav")
+
+    assert stored["is_new"]
+    assert not again["is_new"]
+    assert again["path"] == stored["path"]
+    assert second.contains("bird", stored["sha256"])
+    assert len(list((tmp_path / "bird").glob("*.wav"))) == 1
+
+
+def test_both_processes_entries_survive_in_the_index(tmp_path):
+    first = ContentAddressedAudioStore(tmp_path)
+    second = ContentAddressedAudioStore(tmp_path)
+    first.save_stream(io.BytesIO(WAV_BYTES), "bird", "seed.wav")
+    assert not second.contains("bird", "0" * 64)  # caches the index before the next write
+    a = first.save_stream(io.BytesIO(WAV_BYTES + b"a"), "bird", "a.wav")
+    b = second.save_stream(io.BytesIO(WAV_BYTES + b"b"), "bird", "b.wav")
+
+    fresh = ContentAddressedAudioStore(tmp_path)
+    assert fresh.contains("bird", a["sha256"])
+    assert fresh.contains("bird", b["sha256"])
+
+
+def test_file_recorded_only_in_the_manifest_is_a_duplicate(tmp_path):
+    root = tmp_path / "extracted_audio"
+    manifest = SampleManifest(tmp_path / "manifest.db")
+    store = ContentAddressedAudioStore(root, manifest=manifest)
+    store.save_stream(io.BytesIO(WAV_BYTES + b"x"), "bird", "x.wav")  # index now exists
+
+    # A file written by the S3 sync under its S3 name, recorded in the manifest only
+    synced = root / "bird" / "from_s3.wav"
+    synced.write_bytes(WAV_BYTES)
+    manifest.record(synced, hash_file(synced), "bird", "s3")
+
+    result = store.save_stream(io.BytesIO(WAV_BYTES), "bird", "upload.wav")
+
+    assert not result["is_new"]
+    assert result["path"] == synced.resolve()
+    assert len(list((root / "bird").glob("*.wav"))) == 2  # the earlier upload and from_s3.wav only
+    manifest.close()
+
+
+def test_files_stored_before_the_index_are_adopted_by_build_indexes(tmp_path):
+    legacy = tmp_path / "bird" / "bird_20250101_120000.wav"
+    legacy.parent.mkdir()
+    legacy.write_bytes(WAV_BYTES)
+    store = ContentAddressedAudioStore(tmp_path)
+
+    # Uploads never hash the class directory themselves
+    new = store.save_stream(io.BytesIO(WAV_BYTES + b"n"), "bird", "n.wav")
+    assert not store.contains("bird", hash_file(legacy))
+
+    assert store.build_indexes() == {"bird": 1}
+    assert store.build_indexes() == {"bird": 0}  # listed files are not hashed again
+
+    again = store.save_stream(io.BytesIO(WAV_BYTES), "bird", "again.wav")
+    assert not again["is_new"]
+    assert again["path"] == legacy
+    assert ContentAddressedAudioStore(tmp_path).contains("bird", new["sha256"])
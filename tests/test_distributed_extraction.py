@@ -0,0 +1,159 @@
+"""
+Tests for the shard lease table of distributed feature extraction (src/distributed_extraction.py)
+
+Two LeaseTable instances on one directory stand in for two workers (or
+hosts); leases are a fraction of a second so expiry can be observed.
+
+Run with: python -m pytest tests/
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from distributed_extraction import LeaseTable, process_shard, extract_distributed, MAX_ATTEMPTS
+from embedding_pipeline import PipelinedEmbeddingExtractor, PATCH_HOP_SAMPLES, SAMPLE_RATE
+from feature_store import EmbeddingFeatureStore, EMBEDDING_DIM
+
+MODEL_VERSION = "test-yamnet"
+LEASE = 0.3
+
+
+class FakeYamnet:
+    """Deterministic stand-in for the TF Hub model: one embedding per 0.48 s patch hop"""
+
+    def __init__(self, fail_above=None):
+        self.fail_above = fail_above  # raise on batches whose peak amplitude exceeds this
+
+    class Embeddings:
+        def __init__(self, array):
+            self.array = array
+
+        def numpy(self):
+            return self.array
+
+    def __call__(self, waveform):
+        waveform = np.asarray(waveform, dtype=np.float32)
+        if self.fail_above is not None and np.abs(waveform).max() > self.fail_above:
+            raise RuntimeError("model failure")
+        patch_rms = np.sqrt((waveform.reshape(-1, PATCH_HOP_SAMPLES) ** 2).mean(axis=1))
+        return None, self.Embeddings(np.repeat(patch_rms[:, None], EMBEDDING_DIM, axis=1)), None
+
+
+def make_clips(root, amplitudes):
+    """One 1 s clip per amplitude; returns (key, path) items"""
+    root.mkdir(parents=True, exist_ok=True)
+    items = []
+    for i, amplitude in enumerate(amplitudes):
+        path = root / f"clip{i}.wav"
+        sf.write(str(path), np.full(SAMPLE_RATE, amplitude, dtype=np.float32), SAMPLE_RATE)
+        items.append((f"key{i}", path))
+    return items
+
+
+@pytest.fixture
+def tables(tmp_path):
+    work_dir = tmp_path / "distributed"
+    first, second = LeaseTable(work_dir), LeaseTable(work_dir)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_worker_that_stops_renewing_loses_its_shard(tables, tmp_path):
+    first, second = tables
+    job_id = first.create_job(make_clips(tmp_path / "audio", [0.1]), tmp_path / "audio", MODEL_VERSION)
+
+    shard = first.claim("worker-a", lease_seconds=LEASE)
+    assert shard["attempts"] == 1
+    assert second.claim("worker-b", lease_seconds=LEASE) is None  # leased, not expired
+
+    time.sleep(LEASE + 0.1)  # worker-a stalls without renewing
+    reclaimed = second.claim("worker-b", lease_seconds=10)
+
+    assert (reclaimed["job_id"], reclaimed["shard_id"]) == (job_id, shard["shard_id"])
+    assert reclaimed["attempts"] == 2
+    assert not first.renew(job_id, shard["shard_id"], "worker-a", LEASE)
+    assert first.progress(job_id)["leased"] == 1
+
+
+def test_complete_returns_false_after_the_lease_is_lost(tables, tmp_path):
+    first, second = tables
+    job_id = first.create_job(make_clips(tmp_path / "audio", [0.1, 0.2]), tmp_path / "audio", MODEL_VERSION)
+    shard = first.claim("worker-a", lease_seconds=LEASE)
+    time.sleep(LEASE + 0.1)
+    reclaimed = second.claim("worker-b", lease_seconds=10)
+
+    assert not first.complete(job_id, shard["shard_id"], "worker-a", embedded=2, errors=0)
+    # The stalled worker resumes and still writes its result, but does not complete the shard
+    assert not process_shard(first, shard, FakeYamnet(), lease_seconds=LEASE)
+    assert first.progress(job_id)["done"] == 0
+
+    assert process_shard(second, reclaimed, FakeYamnet(), lease_seconds=10)
+    counts = first.progress(job_id)
+    assert counts["done"] == 1 and counts["embedded"] == 2
+
+
+def test_shard_fails_after_max_attempts(tables, tmp_path):
+    first, second = tables
+    job_id = first.create_job(make_clips(tmp_path / "audio", [0.1]), tmp_path / "audio", MODEL_VERSION)
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        table = first if attempt % 2 else second
+        shard = table.claim(f"worker-{attempt}", lease_seconds=0.05)
+        assert shard["attempts"] == attempt
+        time.sleep(0.1)  # every holder dies with the lease
+
+    assert second.claim("worker-last", lease_seconds=LEASE) is None
+    counts = first.progress(job_id)
+    assert counts["failed"] == 1
+    assert counts["leased"] == counts["pending"] == 0
+
+
+def test_released_shard_fails_after_max_attempts(tables, tmp_path):
+    first, second = tables
+    job_id = first.create_job(make_clips(tmp_path / "audio", [0.1]), tmp_path / "audio", MODEL_VERSION)
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        shard = (first if attempt % 2 else second).claim(f"worker-{attempt}", lease_seconds=10)
+        assert shard is not None
+        with pytest.raises(RuntimeError):
+            process_shard(first, shard, FakeYamnet(fail_above=0.0), lease_seconds=10)
+
+    counts = first.progress(job_id)
+    assert counts["failed"] == 1
+    assert first.claim("worker-last", lease_seconds=10) is None
+
+
+def test_coordinator_embeds_leftovers_locally(tmp_path):
+    # Shard 1 (clips 2 and 3) always crashes the model; the rest embed normally
+    items = make_clips(tmp_path / "audio", [0.1, 0.2, 0.9, 0.9, 0.3, 0.4])
+    store = EmbeddingFeatureStore(tmp_path / "features", MODEL_VERSION)
+
+    report = extract_distributed(
+        tmp_path / "distributed", items, tmp_path / "audio", MODEL_VERSION,
+        FakeYamnet(fail_above=0.5), store,
+        shard_size=2, lease_seconds=10, poll_seconds=0.05, decode_workers=1
+    )
+
+    assert report["shards"]["done"] == 2
+    assert report["shards"]["failed"] == 1
+    assert report["merged"] == 4
+    assert [key for key, _ in report["remaining"]] == ["key2", "key3"]
+    assert not (tmp_path / "distributed" / "jobs" / report["job_id"]).exists()
+
+    # What retrain_model does with the leftovers: embed them in-process
+    extractor = PipelinedEmbeddingExtractor(FakeYamnet(), decode_workers=1)
+    for key, embedding, error in extractor.extract(report["remaining"]):
+        assert error is None
+        store.put(key, embedding)
+    store.flush()
+
+    assert all(key in store for key, _ in items)
+    assert np.allclose(store.get("key2"), store.get("key3"))
+    assert not np.allclose(store.get("key0"), store.get("key2"))
@@ -0,0 +1,177 @@
+"""
+Tests for the incremental S3 sync (S3Storage.sync_prefix) against a local S3 stand-in
+
+By default a moto server is started on a free port (pip install "moto[server]").
+To run against MinIO or LocalStack instead, export S3_ENDPOINT_URL,
+AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY before running pytest.
+
+Run with: python -m pytest tests/
+"""
+
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("boto3")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from s3_storage import S3Storage
+
+PREFIX = "extracted_audio/"
+
+
+@pytest.fixture(scope="module")
+def endpoint_url():
+    if os.getenv("S3_ENDPOINT_URL"):
+        yield os.environ["S3_ENDPOINT_URL"]
+        return
+    server_module = pytest.importorskip("moto.server")
+    server = server_module.ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def storage(endpoint_url, monkeypatch):
+    monkeypatch.setenv("S3_ENDPOINT_URL", endpoint_url)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", os.getenv("AWS_ACCESS_KEY_ID", "testing"))
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", os.getenv("AWS_SECRET_ACCESS_KEY", "testing"))
+    storage = S3Storage(bucket_name=f"ecosight-test-{uuid.uuid4().hex[:8]}")
+    storage.s3_client.create_bucket(Bucket=storage.bucket_name)
+    yield storage
+    listing = storage.s3_client.list_objects_v2(Bucket=storage.bucket_name)
+    for obj in listing.get("Contents", []):
+        storage.s3_client.delete_object(Bucket=storage.bucket_name, Key=obj["Key"])
+    storage.s3_client.delete_bucket(Bucket=storage.bucket_name)
+
+
+def put(storage, name, data):
+    storage.s3_client.put_object(Bucket=storage.bucket_name, Key=PREFIX + name, Body=data)
+
+
+def head(storage, name):
+    """The object as a listing reports it"""
+    listing = storage.s3_client.list_objects_v2(Bucket=storage.bucket_name, Prefix=PREFIX + name)
+    return listing["Contents"][0]
+
+
+def record_get_object(storage, monkeypatch, before=None):
+    """Record get_object keyword arguments (optionally running before() ahead of each call)"""
+    calls = []
+    real_get_object = storage.s3_client.get_object
+
+    def get_object(**kwargs):
+        calls.append(kwargs)
+        if before is not None:
+            before()
+        return real_get_object(**kwargs)
+
+    monkeypatch.setattr(storage.s3_client, "get_object", get_object)
+    return calls
+
+
+def test_unchanged_object_is_skipped(storage, tmp_path, monkeypatch):
+    put(storage, "bird/a.wav", b"a" * 1000)
+    first = storage.sync_prefix(PREFIX, str(tmp_path), max_workers=2)
+    assert first["downloaded"] == 1
+    assert (tmp_path / "bird" / "a.wav").read_bytes() == b"a" * 1000
+
+    calls = record_get_object(storage, monkeypatch)
+    second = storage.sync_prefix(PREFIX, str(tmp_path), max_workers=2)
+
+    assert second["downloaded"] == 0
+    assert second["unchanged"] == 1
+    assert calls == []
+
+
+def test_changed_etag_is_downloaded_again(storage, tmp_path):
+    put(storage, "bird/a.wav", b"a" * 1000)
+    storage.sync_prefix(PREFIX, str(tmp_path), max_workers=2)
+
+    # Same size, new content: only the ETag differs (LastModified may fall in the same second)
+    put(storage, "bird/a.wav", b"b" * 1000)
+    stats = storage.sync_prefix(PREFIX, str(tmp_path), max_workers=2)
+
+    assert stats["downloaded"] == 1
+    assert stats["unchanged"] == 0
+    assert (tmp_path / "bird" / "a.wav").read_bytes() == b"b" * 1000
+
+
+def test_part_file_is_resumed_with_a_ranged_conditional_get(storage, tmp_path, monkeypatch):
+    data = bytes(range(256)) * 40
+    put(storage, "bird/a.wav", data)
+    obj = head(storage, "bird/a.wav")
+    etag = obj["ETag"].strip('"')
+
+    # Left behind by an interrupted run of this object version
+    part_path = tmp_path / "bird" / f".a.wav.{etag[:12]}.part"
+    part_path.parent.mkdir(parents=True)
+    part_path.write_bytes(data[:4000])
+    # ... and one of an older version, which must not be appended to
+    stale_path = tmp_path / "bird" / ".a.wav.0123456789ab.part"
+    stale_path.write_bytes(b"x" * 100)
+
+    calls = record_get_object(storage, monkeypatch)
+    stats = storage.sync_prefix(PREFIX, str(tmp_path), max_workers=1)
+
+    assert stats["downloaded"] == 1
+    assert len(calls) == 1
+    assert calls[0]["Range"] == "bytes=4000-"
+    assert calls[0]["IfMatch"] == obj["ETag"]
+    assert (tmp_path / "bird" / "a.wav").read_bytes() == data
+    assert not part_path.exists()
+    assert not stale_path.exists()
+
+
+def test_failed_download_never_replaces_the_destination(storage, tmp_path, monkeypatch):
+    put(storage, "bird/a.wav", b"a" * 1000)
+    storage.sync_prefix(PREFIX, str(tmp_path), max_workers=1)
+    destination = tmp_path / "bird" / "a.wav"
+
+    # The object changes again between the listing and the GET: IfMatch fails
+    put(storage, "bird/a.wav", b"b" * 2000)
+    record_get_object(storage, monkeypatch, before=lambda: put(storage, "bird/a.wav", b"c" * 3000))
+    stats = storage.sync_prefix(PREFIX, str(tmp_path), max_workers=1)
+
+    assert stats["failed"] == 1
+    assert stats["downloaded"] == 0
+    assert destination.read_bytes() == b"a" * 1000
+    assert list(destination.parent.glob(".a.wav.*.part")) == []
+
+    # The next sync picks up the current version
+    monkeypatch.undo()
+    stats = storage.sync_prefix(PREFIX, str(tmp_path), max_workers=1)
+    assert stats["downloaded"] == 1
+    assert destination.read_bytes() == b"c" * 3000
+
+
+def test_truncated_body_never_replaces_the_destination(storage, tmp_path, monkeypatch):
+    put(storage, "bird/a.wav", b"a" * 1000)
+    storage.sync_prefix(PREFIX, str(tmp_path), max_workers=1)
+    destination = tmp_path / "bird" / "a.wav"
+    put(storage, "bird/a.wav", b"b" * 2000)
+
+    real_get_object = storage.s3_client.get_object
+
+    class Truncated:
+        def __init__(self, body):
+            self.remaining = body.read()[:500]
+
+        def read(self, size=-1):
+            chunk, self.remaining = self.remaining[:size], self.remaining[size:]
+            return chunk
+
+    def get_object(**kwargs):
+        response = real_get_object(**kwargs)
+        return {**response, "Body": Truncated(response["Body"])}
+
+    monkeypatch.setattr(storage.s3_client, "get_object", get_object)
+    stats = storage.sync_prefix(PREFIX, str(tmp_path), max_workers=1)
+
+    assert stats["failed"] == 1
+    assert destination.read_bytes() == b"a" * 1000
+    assert list(destination.parent.glob(".a.wav.*.part")) == []
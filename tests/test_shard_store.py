@@ -0,0 +1,50 @@
+"""
+Tests for the append-only sharded array store (src/shard_store.py)
+
+Run with: python -m pytest tests/
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+import shard_store
+from shard_store import ShardedArrayStore
+
+
+def test_puts_reuse_the_append_handles(tmp_path, monkeypatch):
+    store = ShardedArrayStore(tmp_path, max_shard_bytes=3 * 16)
+    opened = []
+    real_open = open
+    monkeypatch.setattr(shard_store, "open", lambda path, *args, **kwargs: (
+        opened.append(Path(path).name) or real_open(path, *args, **kwargs)), raising=False)
+
+    for i in range(5):
+        assert store.put(f"k{i}", np.full(4, i, dtype=np.float32))
+        assert np.array_equal(store.get(f"k{i}"), np.full(4, i))  # readable before flush()
+    assert not store.put("k0", np.zeros(4))
+
+    # One shard handle per shard (rolled over after 3 arrays) and one index handle
+    assert opened == ["shard-00000.bin", "index.jsonl", "shard-00001.bin"]
+    assert store.append_position() == [1, 8]
+    assert store.metadata("k4") == {"key": "k4", "shard": 1, "offset": 4, "length": 4}
+
+
+def test_flushed_puts_survive_reopening(tmp_path):
+    store = ShardedArrayStore(tmp_path, max_shard_bytes=3 * 16)
+    for i in range(4):
+        store.put(f"k{i}", np.full(4, i, dtype=np.float32), source="test")
+    store.flush()
+
+    reopened = ShardedArrayStore(tmp_path, max_shard_bytes=3 * 16)
+    assert reopened.keys() == ["k0", "k1", "k2", "k3"]
+    assert np.array_equal(reopened.get("k3"), np.full(4, 3))
+    assert reopened.append_position() == store.append_position() == [1, 4]
+
+    # Appends continue at the end of the active shard
+    reopened.put("k4", np.full(4, 4, dtype=np.float32))
+    reopened.close()
+    assert ShardedArrayStore(tmp_path).metadata("k4")["offset"] == 4
+    store.close()
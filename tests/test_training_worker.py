@@ -0,0 +1,77 @@
+"""
+Tests for the persistent retraining worker (src/training_worker.py)
+
+Run with: python -m pytest tests/
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from training_worker import TrainingWorker, TERMINAL_STATUSES, _serve_jobs
+
+SAMPLE_RATE = 16000
+
+
+def _augmenting_worker_main(job_queue, event_queue, cancel_event):
+    """Worker entry point whose jobs augment a directory in a process pool, like retrain_model does"""
+    from audio_augmentation import augment_directory
+
+    def run_job(job, progress_callback, cancel_check):
+        results = augment_directory(
+            input_dir=Path(job["input_dir"]),
+            output_dir=Path(job["output_dir"]),
+            sr=SAMPLE_RATE,
+            augmentations_per_file=2,
+            workers=job["workers"],
+            seed=42
+        )
+        return {"status": "completed", "augmented_files": sum(s["augmented_files"] for s in results.values())}
+
+    _serve_jobs(job_queue, event_queue, cancel_event, run_job)
+
+
+def _wait_for(worker, job_id, timeout=180.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = worker.get(job_id)
+        if job["status"] in TERMINAL_STATUSES:
+            return job
+        time.sleep(0.2)
+    raise AssertionError(f"Job {job_id} did not finish within {timeout}s: {worker.get(job_id)}")
+
+
+def test_job_can_use_a_process_pool(tmp_path):
+    # Force a multi-process pool regardless of this machine's core count
+    input_dir = tmp_path / "audio"
+    rng = np.random.default_rng(0)
+    for class_name in ("bird", "frog"):
+        (input_dir / class_name).mkdir(parents=True)
+        for i in range(2):
+            sf.write(str(input_dir / class_name / f"clip{i}.wav"),
+                     0.1 * rng.standard_normal(SAMPLE_RATE // 2).astype(np.float32), SAMPLE_RATE)
+
+    worker = TrainingWorker(target=_augmenting_worker_main)
+    try:
+        job = worker.submit(input_dir=str(input_dir), output_dir=str(tmp_path / "augmented"), workers=2)
+        job = _wait_for(worker, job["job_id"])
+    finally:
+        worker.stop()
+
+    assert job["status"] == "completed", job["error"]
+    assert job["result"]["augmented_files"] == 4 * 3  # original + 2 variants per clip
+
+
+def test_stop_joins_the_worker(tmp_path):
+    worker = TrainingWorker(target=_augmenting_worker_main)
+    worker.start()
+    process = worker._process
+    worker.stop(timeout=30)
+
+    assert not process.is_alive()
+    assert process.exitcode is not None
+    assert not worker.ready